@@ -0,0 +1,140 @@
+"""Content negotiation and HTTP validators shared by both simulator apps.
+
+Responses are encoded as ``application/msgpack`` when the client's Accept
+header prefers it over JSON, and request bodies sent as msgpack are decoded
+before FastAPI validates them. msgpack is optional: without it the apps keep
+speaking JSON and reject msgpack request bodies with 415.
+
+``conditional`` adds ETag/Last-Modified validators so clients with a local
+cache can revalidate and get a bodyless 304 instead of re-downloading.
+"""
+
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _quality(accept: str, media_types) -> float:
+    best = 0.0
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if media_type not in media_types:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True if msgpack is available and the Accept header ranks it above JSON."""
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    msgpack_q = _quality(accept, MSGPACK_TYPES)
+    return msgpack_q > 0 and msgpack_q >= _quality(accept, ("application/json", "*/*"))
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def negotiated(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Encode ``content`` as msgpack or JSON depending on the request's Accept header."""
+    response_class = MsgpackResponse if wants_msgpack(request) else JSONResponse
+    return response_class(content, status_code=status_code, headers={"Vary": "Accept"})
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: float) -> bool:
+    try:
+        return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def conditional(request: Request, load: Callable[[], Any], version: Optional[str] = None,
+                last_modified: Optional[float] = None) -> Response:
+    """Negotiated response with validators, or 304 when the client's copy is current.
+
+    ``version`` is a cheap fingerprint of the resource (e.g. file mtime and
+    size); when given, a matching If-None-Match is answered without calling
+    ``load``. Without it the ETag is a hash of the encoded body.
+    """
+    representation = "msgpack" if wants_msgpack(request) else "json"
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+
+    if version is not None:
+        headers["ETag"] = f'"{version}-{representation}"'
+        if if_none_match is not None:
+            if _etag_matches(if_none_match, headers["ETag"]):
+                return Response(status_code=304, headers=headers)
+        elif if_modified_since and last_modified is not None and _not_modified_since(if_modified_since, last_modified):
+            return Response(status_code=304, headers=headers)
+
+    response = negotiated(request, load())
+    if version is None:
+        headers["ETag"] = f'"{hashlib.sha1(response.body).hexdigest()}"'
+        if if_none_match is not None and _etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+class MsgpackRequest(Request):
+    """Request whose ``json()`` decodes a msgpack body."""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+
+class MsgpackRoute(APIRoute):
+    """Route class that lets endpoints accept msgpack request bodies.
+
+    FastAPI only parses JSON content types into the body model, so msgpack
+    requests are presented to it as JSON backed by a msgpack decoder.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip()
+            if content_type in MSGPACK_TYPES:
+                if msgpack is None:
+                    raise HTTPException(status_code=415, detail="msgpack is not installed on this server")
+                headers = [(k, v) for k, v in request.scope["headers"] if k != b"content-type"]
+                headers.append((b"content-type", b"application/json"))
+                request = MsgpackRequest(dict(request.scope, headers=headers), request.receive)
+            return await handler(request)
+
+        return route_handler
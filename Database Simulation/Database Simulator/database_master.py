@@ -7,15 +7,20 @@ def start_servers():
     db_other = subprocess.Popen([
         "python3", "-m", "uvicorn", "movemend_record_database.app:app", "--port", "8002"
     ])
+    db_gateway = subprocess.Popen([
+        "python3", "-m", "uvicorn", "linked_record_gateway.app:app", "--port", "8003"
+    ])
 
     print("Servers started.")
     try:
         db_medical_records.wait()
         db_other.wait()
+        db_gateway.wait()
     except KeyboardInterrupt:
         print("Shutting down...")
         db_medical_records.terminate()
         db_other.terminate()
+        db_gateway.terminate()
 
 
 if __name__ == "__main__":
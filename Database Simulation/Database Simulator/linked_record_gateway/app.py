@@ -0,0 +1,163 @@
+"""Join gateway for the two simulators.
+
+Consumers used to fetch a patient list and then one MoveMend dossier per
+patient (N+1 round trips from every process). ``/linked_patients`` does that
+join next to the simulators and streams the joined records back as NDJSON,
+one patient per line in completion order, so each consumer makes one request
+and can start on the first patient while the rest are still in flight.
+
+Projection options keep the stream small: ``include`` drops a source
+entirely (it is then never fetched), ``resource_types`` filters the FHIR
+bundle entries and ``sessions_limit`` keeps only the newest MoveMend sessions.
+Unfiltered bundles are passed through as the medical simulator's JSON bytes
+instead of being decoded and re-encoded.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+# The simulator client lives in "Database Simulation", two levels up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from client_medicaldataretrieval import AsyncSimulatorClient, SimulatorError, MEDICAL_URL, MOVEMEND_URL
+from content_negotiation import MsgpackRoute, negotiated
+from response_cache import default_cache
+
+# Optional: orjson encodes the (large) FHIR bundles several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NDJSON = "application/x-ndjson"
+SOURCES = {"medical", "movemend"}
+MAX_CONCURRENCY = int(os.getenv("GATEWAY_MAX_CONCURRENCY", "32"))
+
+app = FastAPI()
+app.router.route_class = MsgpackRoute
+
+# Upstream calls speak msgpack where available; gateway_url=None so the client never loops back here.
+# Bundles and dossiers are revalidated against the shared disk cache (MOVEMEND_CACHE_DIR, "" disables it),
+# so unchanged records cost a 304 instead of a full transfer and survive a simulator outage.
+upstream = AsyncSimulatorClient(os.getenv("MEDICAL_DB_URL", MEDICAL_URL), os.getenv("MOVEMEND_DB_URL", MOVEMEND_URL),
+                                max_concurrency=MAX_CONCURRENCY, use_msgpack=True, gateway_url=None,
+                                cache=default_cache())
+
+@app.on_event("shutdown")
+async def close_upstream():
+    await upstream.aclose()
+
+@app.get("/db_id")
+def ping(request: Request):
+    return negotiated(request, {"db_id": "linked_record_gateway"})
+
+@app.get("/stats")
+def upstream_stats(request: Request):
+    """Breaker state, p95 latency and hedge rates of the gateway's upstream endpoints."""
+    return negotiated(request, upstream.stats())
+
+
+def _csv(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+def _encode_line(record: Dict[str, Any], medical_body: Optional[bytes] = None) -> bytes:
+    """One NDJSON line. ``medical_body`` is the simulator's raw ``{"id", "data"}`` object, spliced in as is."""
+    if medical_body is None:
+        return _dumps(record) + b"\n"
+    rest = _dumps({k: v for k, v in record.items() if k != "id"})
+    if rest == b"{}":
+        return medical_body + b"\n"
+    return medical_body.rstrip()[:-1] + b"," + rest[1:] + b"\n"
+
+def project(record: Dict[str, Any], resource_types: Set[str], sessions_limit: Optional[int]) -> Dict[str, Any]:
+    """Apply the entry filter and session limit to a joined record."""
+    bundle = record.get("data")
+    if bundle and resource_types:
+        entries = [e for e in bundle.get("entry", []) if e.get("resource", {}).get("resourceType") in resource_types]
+        record["data"] = dict(bundle, entry=entries)
+    dossier = record.get("movemend_data")
+    if dossier and sessions_limit is not None:
+        sessions = sorted(dossier.get("sessions", []), key=lambda s: s.get("date", ""), reverse=True)
+        record["movemend_data"] = dict(dossier, sessions=sessions[:sessions_limit])
+    return record
+
+async def join(patient_id: str, include: Set[str], raw_medical: bool) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """Fetch both sides of one patient concurrently; a failed side becomes None plus an error.
+
+    With ``raw_medical`` the bundle is returned as the simulator's JSON bytes rather than in the record.
+    """
+    record: Dict[str, Any] = {"id": patient_id}
+    medical_body = None
+
+    async def medical():
+        nonlocal medical_body
+        try:
+            if raw_medical:
+                _, medical_body = await upstream.get_body(f"{upstream.medical_url}/patient/{patient_id}",
+                                                          headers={"Accept": "application/json"})
+            else:
+                record["data"] = (await upstream.patient(patient_id))["data"]
+        except SimulatorError as e:
+            record["data"] = None
+            record["medical_error"] = str(e)
+
+    async def movemend():
+        try:
+            record["movemend_data"] = await upstream.movemend_dossier(patient_id)
+        except SimulatorError as e:
+            record["movemend_data"] = None
+            record["movemend_error"] = str(e)
+
+    await asyncio.gather(*[fetch() for source, fetch in (("medical", medical), ("movemend", movemend))
+                           if source in include])
+    return record, medical_body
+
+async def stream_linked(patient_ids: List[str], include: Set[str], resource_types: Set[str],
+                        sessions_limit: Optional[int]):
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    raw_medical = "medical" in include and not resource_types
+
+    async def one(patient_id):
+        async with semaphore:
+            record, medical_body = await join(patient_id, include, raw_medical)
+        return _encode_line(project(record, resource_types, sessions_limit), medical_body)
+
+    tasks = [asyncio.ensure_future(one(patient_id)) for patient_id in patient_ids]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away or a line failed: don't leave upstream requests running
+        for task in tasks:
+            task.cancel()
+
+@app.get("/linked_patients")
+async def linked_patients(count: int = Query(10, ge=1, le=1000),
+                          ids: Optional[str] = Query(None, description="Comma-separated patient ids instead of a random pick"),
+                          include: str = Query("medical,movemend", description="Sources to join: medical, movemend"),
+                          resource_types: Optional[str] = Query(None, description="Keep only these FHIR resource types"),
+                          sessions_limit: Optional[int] = Query(None, ge=0, description="Keep the newest N sessions")):
+    sources = set(_csv(include))
+    if not sources or not sources <= SOURCES:
+        raise HTTPException(status_code=400, detail=f"include must be a subset of {sorted(SOURCES)}")
+
+    patient_ids = _csv(ids)
+    if not patient_ids:
+        try:
+            patient_ids = await upstream.random_patient_ids(count)
+        except SimulatorError as e:
+            raise HTTPException(status_code=502, detail=f"Medical simulator unavailable: {e}")
+
+    print(f"Joining {len(patient_ids)} patients ({','.join(sorted(sources))})")
+    return StreamingResponse(stream_linked(patient_ids, sources, set(_csv(resource_types)), sessions_limit),
+                             media_type=NDJSON)
@@ -1,14 +1,19 @@
-from fastapi import FastAPI, HTTPException
-from medical_record_database.db_services import get_random_patient_record, reset_patient_selection, _available_patient_files
+import os
+
+from fastapi import FastAPI, HTTPException, Request
+from medical_record_database.db_services import (get_random_patient_record, reset_patient_selection, _available_patient_files,
+                                                 get_random_patient_ids, get_patient_file, get_patient_record)
+from content_negotiation import MsgpackRoute, negotiated, conditional
 
 app = FastAPI()
+app.router.route_class = MsgpackRoute
 
 @app.get("/db_id")
-def ping():
-    return {"db_id": "synthea_database"}
+def ping(request: Request):
+    return negotiated(request, {"db_id": "synthea_database"})
 
 @app.get("/random_patient_list/{count}")
-def read_random_patient_records(count: int):
+def read_random_patient_records(count: int, request: Request):
     records = []
     # First check if we have enough patients available
     if len(_available_patient_files) < count:
@@ -29,4 +34,19 @@ def read_random_patient_records(count: int):
                 records.append(record)
     
     print(f"Returning {len(records)} patient records")
-    return records
+    return negotiated(request, records)
+
+@app.get("/random_patient_ids/{count}")
+def read_random_patient_ids(count: int, request: Request):
+    """Random patient ids only, so clients can fetch (and cache) each bundle via /patient/{id}."""
+    return negotiated(request, get_random_patient_ids(count))
+
+@app.get("/patient/{patient_id}")
+def read_patient_record(patient_id: str, request: Request):
+    path = get_patient_file(patient_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown patient {patient_id}")
+    # Bundle files are immutable in practice, so mtime and size make a cheap validator
+    stat = os.stat(path)
+    return conditional(request, lambda: get_patient_record(patient_id),
+                       version=f"{stat.st_mtime_ns:x}-{stat.st_size:x}", last_modified=stat.st_mtime)
@@ -8,26 +8,42 @@ database_path = os.path.join(base_dir, "synthea_sample_data_fhir_latest")
 _available_patient_files = []
 _used_patient_files = set()
 
+# patient id -> bundle file name, built on first use
+_patient_file_index = {}
+
+def _list_patient_files():
+    # Patient bundles are named First_Last_<id>.json; hospital/practitioner bundles have no underscore
+    return [f for f in os.listdir(database_path) if f.endswith('.json') and '_' in f]
+
+def _patient_id_from_filename(filename):
+    return filename[:-len('.json')].rsplit('_', 1)[1]
+
 def _initialize_patient_files():
     """Initialize the list of available patient files if empty"""
     global _available_patient_files
     if not _available_patient_files:
-        _available_patient_files = [f for f in os.listdir(database_path) if f.endswith('.json')]
+        _available_patient_files = _list_patient_files()
 
-def get_random_patient_record():
-    """
-    Returns a random patient record from the database without duplicates.
-    Returns None if all patients have been used.
-    """
+def _pick_random_patient_file():
+    """Select and remove a random file from the available files, or None if all were used."""
     _initialize_patient_files()
     
     if not _available_patient_files:
         return None
         
-    # Select and remove a random file from available files
     random_file = random.choice(_available_patient_files)
     _available_patient_files.remove(random_file)
     _used_patient_files.add(random_file)
+    return random_file
+
+def get_random_patient_record():
+    """
+    Returns a random patient record from the database without duplicates.
+    Returns None if all patients have been used.
+    """
+    random_file = _pick_random_patient_file()
+    if random_file is None:
+        return None
     
     # Read and return the patient data
     file_path = os.path.join(database_path, random_file)
@@ -36,10 +52,38 @@ def get_random_patient_record():
         print(data["entry"][0]["resource"]["id"])
         return {"id": data["entry"][0]["resource"]["id"], "data": data}
 
+def get_random_patient_ids(count: int):
+    """Like repeated get_random_patient_record() calls, but returns only the ids."""
+    ids = []
+    for _ in range(count):
+        random_file = _pick_random_patient_file()
+        if random_file is None:
+            reset_patient_selection()
+            random_file = _pick_random_patient_file()
+        if random_file is None:
+            break
+        ids.append(_patient_id_from_filename(random_file))
+    return ids
+
+def get_patient_file(patient_id: str):
+    """Return the bundle path for a patient id, or None if unknown."""
+    if not _patient_file_index:
+        _patient_file_index.update({_patient_id_from_filename(f): f for f in _list_patient_files()})
+    filename = _patient_file_index.get(patient_id)
+    return os.path.join(database_path, filename) if filename else None
+
+def get_patient_record(patient_id: str):
+    """Return a specific patient as an {"id", "data"} record, or None if unknown."""
+    path = get_patient_file(patient_id)
+    if path is None:
+        return None
+    with open(path) as f:
+        return {"id": patient_id, "data": json.load(f)}
+
 def reset_patient_selection():
     """Reset the patient selection, making all patients available again"""
     global _available_patient_files, _used_patient_files
     _initialize_patient_files()  # Ensure files are initialized
-    _available_patient_files = [f for f in os.listdir(database_path) if f.endswith('.json')]
+    _available_patient_files = _list_patient_files()
     _used_patient_files.clear()
     print(f"Patient selection reset. {len(_available_patient_files)} patients available.")
\ No newline at end of file
@@ -1,13 +1,61 @@
-from fastapi import FastAPI, HTTPException
-from movemend_record_database.db_services import get_from_patient_id
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from movemend_record_database.db_services import get_from_patient_id, append_sessions, session_log, events
+from content_negotiation import MsgpackRoute, negotiated, conditional
 
 app = FastAPI()
+app.router.route_class = MsgpackRoute
+
+class SessionIn(BaseModel):
+    gameId: str
+    date: Optional[str] = None
+    score: int
+    duration_minutes: int
+    quality: int
+    notes: str = ""
+
+@app.on_event("shutdown")
+def close_session_log():
+    session_log.close()
 
 @app.get("/db_id")
-def ping():
-    return {"db_id": "movemend_database"}
+def ping(request: Request):
+    return negotiated(request, {"db_id": "movemend_database"})
 
 @app.get("/patient_dossier/{patient_id}")
-def read_patient_dossier(patient_id: str):
-    return get_from_patient_id(patient_id)
+def read_patient_dossier(patient_id: str, request: Request):
+    # Records change with every appended session, so the ETag hashes the encoded body
+    return conditional(request, lambda: get_from_patient_id(patient_id))
+
+@app.post("/patient_dossier/{patient_id}/sessions", status_code=201)
+def append_patient_sessions(patient_id: str, sessions: Union[SessionIn, List[SessionIn]], request: Request, durable: bool = False):
+    """Append one or more sessions (JSON or msgpack body); pass durable=true to wait for fsync before returning."""
+    if not isinstance(sessions, list):
+        sessions = [sessions]
+    if not sessions:
+        raise HTTPException(status_code=400, detail="No sessions provided")
+    now = datetime.now(timezone.utc).isoformat() + "Z"
+    payload = [dict(s.model_dump(), date=s.date or now) for s in sessions]
+    seqs = append_sessions(patient_id, payload, durable)
+    return negotiated(request, {"patient_id": patient_id, "appended": len(seqs), "last_seq": seqs[-1]}, status_code=201)
+
+@app.get("/events")
+async def stream_events(request: Request,
+                        last_event_id: Optional[str] = None,
+                        types: Optional[str] = None,
+                        last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")):
+    """Server-Sent Events feed of session_appended and record_generated events.
 
+    Resume with the standard Last-Event-ID header or the last_event_id query
+    parameter; types is an optional comma-separated filter.
+    """
+    event_types = set(types.split(",")) if types else None
+    return StreamingResponse(
+        events.stream(last_event_id_header or last_event_id, request.is_disconnected, event_types),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
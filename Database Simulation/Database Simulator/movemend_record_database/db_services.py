@@ -1,19 +1,57 @@
 import os, json
+import copy
 import random
 import os.path
 import datetime
+from typing import Any, Dict, List
+
+from movemend_record_database.session_log import SessionLog
+from movemend_record_database.events import EventBus
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = os.path.join(base_dir, "movemend_patient_records")
+session_log_path = os.path.join(base_dir, "session_log")
 
-def get_from_patient_id(patient_id: str):
-    path = f"{database_path}/{patient_id}.json"
-    if not os.path.exists(path):
+# Feeds the /events SSE stream
+events = EventBus()
+# patient_id -> simulated record, generated once so repeated reads agree
+_generated: Dict[str, Dict[str, Any]] = {}
+
+def _simulated_record(patient_id: str):
+    record = _generated.get(patient_id)
+    if record is None:
         print(f"Patient record not found for {patient_id}, generating simulated data")
         # Generate simulated Movemend data using patient ID as seed
-        return generate_movemend_data(patient_id)
+        record = _generated[patient_id] = generate_movemend_data(patient_id)
+        events.publish("record_generated", {"patient_id": patient_id, "sessions": len(record["sessions"])})
+    return copy.deepcopy(record)
+
+def _load_record(patient_id: str):
+    path = f"{database_path}/{patient_id}.json"
+    if not os.path.exists(path):
+        return _simulated_record(patient_id)
     with open(path) as f:
-        return json.load(f)
+        record = json.load(f)
+    if record.pop("simulated", False):
+        # Only appended sessions were compacted into this file: keep serving them on the simulated base
+        simulated = _simulated_record(patient_id)
+        sessions = simulated["sessions"] + record["sessions"]
+        simulated.update(record)
+        simulated["sessions"] = sorted(sessions, key=lambda s: s.get("date", ""), reverse=True)
+        return simulated
+    return record
+
+# New sessions are appended here and compacted into the record files in the background
+session_log = SessionLog(database_path, session_log_path)
+
+def get_from_patient_id(patient_id: str):
+    return session_log.read_record(patient_id, _load_record)
+
+def append_sessions(patient_id: str, sessions: List[Dict[str, Any]], durable: bool = False) -> List[int]:
+    """Append new sessions for a patient; they are visible to readers immediately."""
+    seqs = session_log.append_many(patient_id, sessions, durable)
+    events.publish("session_appended", {"patient_id": patient_id, "last_seq": seqs[-1], "sessions": sessions})
+    return seqs
 
 def generate_movemend_data(patient_id: str):
     """Generate simulated Movemend data for patients without records"""
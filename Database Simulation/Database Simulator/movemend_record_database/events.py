@@ -0,0 +1,94 @@
+"""In-process event bus backing the MoveMend ``/events`` Server-Sent Events feed.
+
+Events are kept in a bounded ring buffer so consumers can resume from the last
+id they saw. Ids have the form ``{boot}-{n}``; when a consumer presents an id
+from another process lifetime, or one that has already fallen out of the
+buffer, it receives a ``reset`` event telling it to reload everything.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+HEARTBEAT_SECONDS = 15.0
+
+
+class EventBus:
+    """Thread-safe publish side, asyncio subscribe side."""
+
+    def __init__(self, history: int = 10000):
+        self.boot = str(int(time.time()))
+        self._lock = threading.Lock()
+        self._events: deque = deque(maxlen=history)  # (n, event_type, data)
+        self._next = 1
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> str:
+        """Record an event and wake every connected stream. Returns the event id."""
+        with self._lock:
+            n = self._next
+            self._next += 1
+            self._events.append((n, event_type, data))
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The stream's loop has already shut down
+                pass
+        return f"{self.boot}-{n}"
+
+    def since(self, last_event_id: str) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """Return events after ``last_event_id`` and whether the consumer must reset."""
+        with self._lock:
+            boot, _, n = last_event_id.partition("-")
+            if boot != self.boot or not n.isdigit():
+                return [], True
+            last = int(n)
+            oldest = self._events[0][0] if self._events else self._next
+            if last + 1 < oldest or last >= self._next:
+                return [], True
+            return [e for e in self._events if e[0] > last], False
+
+    def latest_id(self) -> str:
+        with self._lock:
+            return f"{self.boot}-{self._next - 1}"
+
+    async def stream(self, last_event_id: Optional[str],
+                     is_disconnected: Callable[[], Awaitable[bool]],
+                     event_types: Optional[Set[str]] = None) -> AsyncIterator[str]:
+        """Yield SSE-formatted frames until the client disconnects."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            cursor = last_event_id or self.latest_id()
+            yield "retry: 3000\n\n"
+            while not await is_disconnected():
+                # Clear before reading so a publish racing with since() still wakes us
+                waiter[1].clear()
+                events, reset = self.since(cursor)
+                if reset:
+                    cursor = self.latest_id()
+                    yield _frame(cursor, "reset", {"reason": "history unavailable, reload all records"})
+                    continue
+                if not events:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                    continue
+                for n, event_type, data in events:
+                    cursor = f"{self.boot}-{n}"
+                    if event_types is None or event_type in event_types:
+                        yield _frame(cursor, event_type, data)
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+def _frame(event_id: str, event_type: str, data: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
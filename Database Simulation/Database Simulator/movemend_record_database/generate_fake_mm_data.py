@@ -1,9 +1,20 @@
 import json
+import re
 import uuid
 from datetime import datetime, timedelta, timezone
 import random
 import os
 import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# Optional: ijson gives a true streaming parser; otherwise fall back to incremental raw_decode
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+_ENTRY_ARRAY = re.compile(r'"entry"\s*:\s*\[\s*')
 
 game_ids = [
     "apple_picking",
@@ -24,14 +35,71 @@ def random_date_within_last_year():
     random_date = now - timedelta(days=delta_days)
     return random_date
 
-def save_record_to_file(record, output_dir="database/records"):
+def save_record_to_file(record, output_dir="database/records", indent=None):
     os.makedirs(output_dir, exist_ok=True)
     file_path = os.path.join(output_dir, f"{record['id']}.json")
     with open(file_path, "w") as f:
-        json.dump(record, f, indent=2)
-    print(f"Saved record to {file_path}")
+        if indent is None:
+            json.dump(record, f, separators=(",", ":"))
+        else:
+            json.dump(record, f, indent=indent)
+    return file_path
+
+def read_first_entry(bundle_file, chunk_size=16384):
+    """Parse only the first entry of a FHIR bundle, without loading the whole file.
+
+    Returns None if the file has no entries.
+    """
+    if ijson is not None:
+        with open(bundle_file, "rb") as f:
+            return next(ijson.items(f, "entry.item"), None)
 
-def process_synthea_records(synthea_dir, output_dir):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    start = None
+    with open(bundle_file, "r") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            if start is None:
+                match = _ENTRY_ARRAY.search(buffer)
+                if match:
+                    start = match.end()
+            if start is not None and start < len(buffer):
+                if buffer[start] == "]":
+                    return None
+                try:
+                    entry, _ = decoder.raw_decode(buffer, start)
+                    return entry
+                except json.JSONDecodeError:
+                    # First entry not complete yet, read another chunk
+                    pass
+            if not chunk:
+                return None
+
+def extract_patient_id(bundle_file):
+    """Return the Patient id from the first bundle entry, or None for non-patient bundles."""
+    entry = read_first_entry(bundle_file)
+    if not isinstance(entry, dict):
+        return None
+    resource = entry.get("resource", {})
+    if resource.get("resourceType") != "Patient":
+        return None
+    return resource.get("id")
+
+def _process_patient_file(args):
+    patient_file, output_dir = args
+    try:
+        patient_id = extract_patient_id(patient_file)
+    except (OSError, ValueError) as e:
+        return patient_file, None, str(e)
+    if not patient_id:
+        return patient_file, None, "no Patient resource in first entry"
+    record = generate_patient_record(patient_id)
+    save_record_to_file(record, output_dir)
+    return patient_file, patient_id, None
+
+def process_synthea_records(synthea_dir, output_dir, workers=None):
     # Validate synthea directory exists
     if not os.path.isdir(synthea_dir):
         raise ValueError(f"Synthea directory '{synthea_dir}' does not exist")
@@ -41,21 +109,19 @@ def process_synthea_records(synthea_dir, output_dir):
     # Get all patient JSON files from Synthea directory
     patient_files = glob.glob(os.path.join(synthea_dir, "*.json"))
     
-    for patient_file in patient_files:
-        with open(patient_file, 'r') as f:
-            patient_data = json.load(f)
-            
-        # Extract patient ID from the Synthea record
-        if isinstance(patient_data, dict) and "id" in patient_data["entry"][0]["resource"]:
-            patient_id = patient_data["entry"][0]["resource"]["id"]
-        else:
-            # Skip if patient ID cannot be found
-            print(f"Patient ID not found in {patient_file}")
-            break
-            
-        # Generate and save Movemend record
-        record = generate_patient_record(patient_id)
-        save_record_to_file(record, output_dir)
+    # Each worker reseeds from os.urandom so forked processes don't share a random stream
+    generated = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=random.seed) as executor:
+        tasks = [(patient_file, output_dir) for patient_file in patient_files]
+        for patient_file, patient_id, error in executor.map(_process_patient_file, tasks, chunksize=16):
+            if error:
+                # Skip files without a patient (e.g. hospital/practitioner bundles) instead of stopping
+                print(f"Skipping {os.path.basename(patient_file)}: {error}")
+                continue
+            generated += 1
+
+    print(f"Saved {generated} records to {output_dir}")
+    return generated
 
 def generate_patient_record(patient_id):
     record = {
@@ -83,7 +149,10 @@ def generate_patient_record(patient_id):
 
 
 if __name__ == "__main__":
-    synthea_dir = "../medical_record_database/synthea_sample_data_fhir_latest"
-    output_dir = "movemend_patient_records"
+    parser = argparse.ArgumentParser(description="Generate fake MoveMend records for Synthea patients")
+    parser.add_argument("--synthea-dir", default="../medical_record_database/synthea_sample_data_fhir_latest")
+    parser.add_argument("--output-dir", default="movemend_patient_records")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
     
-    process_synthea_records(synthea_dir, output_dir)
\ No newline at end of file
+    process_synthea_records(args.synthea_dir, args.output_dir, args.workers)
\ No newline at end of file
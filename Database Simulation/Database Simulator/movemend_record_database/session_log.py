@@ -0,0 +1,281 @@
+"""Append-only write path for new MoveMend sessions.
+
+Incoming sessions are appended to a JSON-lines log and kept in an in-memory
+overlay, so readers see them as soon as ``append`` returns. A background thread
+fsyncs the log in batches (group commit) and periodically compacts the overlay
+into the per-patient record files, which are then rewritten once per
+compaction instead of once per session.
+
+Every log entry carries a monotonically increasing ``seq``. Compacted records
+remember the highest ``seq`` merged into them (``compacted_seq``), which makes
+replaying a half-finished compaction after a crash idempotent.
+"""
+
+import os
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+LOG_FILENAME = "sessions.log"
+COMPACTING_FILENAME = "sessions.log.compacting"
+
+
+class SessionLog:
+    """Append-only session log with batched fsync and periodic compaction."""
+
+    def __init__(self, records_dir: str, log_dir: str,
+                 fsync_interval: float = 0.05,
+                 fsync_batch: int = 512,
+                 compact_threshold: int = 50000,
+                 compact_interval: float = 300.0):
+        """
+        Args:
+            records_dir: Directory holding the per-patient ``{id}.json`` records
+            log_dir: Directory for the append-only log files
+            fsync_interval: Maximum seconds an appended entry waits for fsync
+            fsync_batch: Number of pending entries that triggers an early fsync
+            compact_threshold: Number of logged entries that triggers compaction
+            compact_interval: Seconds after which a non-empty log is compacted anyway
+        """
+        self.records_dir = records_dir
+        self.log_dir = log_dir
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.compact_threshold = compact_threshold
+        self.compact_interval = compact_interval
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._compact_lock = threading.Lock()
+        # patient_id -> [(seq, session)] for entries in the live log
+        self._overlay: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        # Same shape, for entries being folded into records by a running compaction
+        self._compacting: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        self._seq = 0
+        self._durable_seq = 0
+        self._logged = 0
+        self._pending = 0
+        self._durable_waiters = 0
+        self._last_compaction = time.monotonic()
+        self._closed = False
+        self.stats = {"appended": 0, "fsyncs": 0, "compactions": 0}
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._log_path = os.path.join(self.log_dir, LOG_FILENAME)
+        self._compacting_path = os.path.join(self.log_dir, COMPACTING_FILENAME)
+        self._recover()
+        if self._compacting:
+            # A previous process died mid-compaction; finish it before serving
+            self.compact()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="movemend-session-log", daemon=True)
+        self._flusher.start()
+
+    # ------------------------------------------------------------------ writes
+
+    def append(self, patient_id: str, session: Dict[str, Any], durable: bool = False) -> int:
+        """Append a session for a patient and return its sequence number.
+
+        The session is visible to readers immediately. With ``durable=True`` the
+        call also waits for the batch containing it to be fsynced.
+        """
+        return self.append_many(patient_id, [session], durable)[-1]
+
+    def append_many(self, patient_id: str, sessions: List[Dict[str, Any]], durable: bool = False) -> List[int]:
+        """Append several sessions for one patient with a single write."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Session log is closed")
+            seqs = []
+            lines = []
+            entries = self._overlay.setdefault(patient_id, [])
+            for session in sessions:
+                self._seq += 1
+                seqs.append(self._seq)
+                entries.append((self._seq, session))
+                lines.append(json.dumps({"seq": self._seq, "patient_id": patient_id, "session": session},
+                                        separators=(",", ":")))
+            self._file.write("\n".join(lines) + "\n")
+            self._pending += len(sessions)
+            self._logged += len(sessions)
+            self.stats["appended"] += len(sessions)
+            if durable:
+                # Wake the flusher now; concurrent durable writers share its fsync
+                self._durable_waiters += 1
+                self._cond.notify_all()
+                while self._durable_seq < seqs[-1] and not self._closed:
+                    self._cond.wait()
+                self._durable_waiters -= 1
+            elif self._pending >= self.fsync_batch:
+                self._cond.notify_all()
+            return seqs
+
+    # ------------------------------------------------------------------- reads
+
+    def read_record(self, patient_id: str, load_record: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """Load a patient's record and merge in sessions not yet compacted into it.
+
+        The pending entries are captured before the record is loaded, so a
+        compaction finishing in between can only produce overlap, which the
+        record's ``compacted_seq`` filters out, never a gap.
+        """
+        with self._lock:
+            entries = self._compacting.get(patient_id, []) + self._overlay.get(patient_id, [])
+        record = load_record(patient_id)
+        compacted_seq = record.pop("compacted_seq", 0)
+        pending = [session for seq, session in entries if seq > compacted_seq]
+        if pending:
+            record["sessions"] = _sorted_sessions(pending + record.get("sessions", []))
+        return record
+
+    # -------------------------------------------------------------- durability
+
+    def flush(self) -> None:
+        """Write and fsync everything appended so far."""
+        with self._cond:
+            self._fsync_locked()
+
+    def _fsync_locked(self) -> None:
+        if self._pending == 0:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._durable_seq = self._seq
+        self._pending = 0
+        self.stats["fsyncs"] += 1
+        self._cond.notify_all()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                if self._pending < self.fsync_batch and not self._durable_waiters:
+                    self._cond.wait(self.fsync_interval)
+                if self._closed:
+                    return
+                self._fsync_locked()
+                due = self._logged and (
+                    self._logged >= self.compact_threshold
+                    or time.monotonic() - self._last_compaction >= self.compact_interval
+                )
+            if due:
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"Session log compaction failed: {e}")
+
+    # -------------------------------------------------------------- compaction
+
+    def compact(self) -> int:
+        """Fold logged sessions into the per-patient records.
+
+        Returns the number of records rewritten. Appends continue into a fresh
+        log while the previous one is merged.
+        """
+        with self._compact_lock:
+            with self._cond:
+                if not self._logged and not self._compacting:
+                    self._last_compaction = time.monotonic()
+                    return 0
+                self._fsync_locked()
+                if not self._compacting:
+                    self._file.close()
+                    os.replace(self._log_path, self._compacting_path)
+                    self._compacting = self._overlay
+                    self._overlay = {}
+                    self._logged = 0
+                    self._open_log()
+                batch = self._compacting
+
+            for patient_id, entries in batch.items():
+                self._merge_into_record(patient_id, entries)
+
+            with self._cond:
+                self._compacting = {}
+                os.remove(self._compacting_path)
+                self._last_compaction = time.monotonic()
+                self.stats["compactions"] += 1
+            return len(batch)
+
+    def stored_record(self, patient_id: str) -> Dict[str, Any]:
+        """The patient's record file, or an empty one if there is none yet.
+
+        Compaction starts from this, never from a record the caller would
+        simulate for a patient without a file: only real sessions get written.
+        Such records are marked ``simulated`` so readers can keep merging the
+        same simulated base they served before compaction.
+        """
+        path = os.path.join(self.records_dir, f"{patient_id}.json")
+        if not os.path.exists(path):
+            return {"resourceType": "MovemendRecord", "id": patient_id, "sessions": [], "simulated": True}
+        with open(path) as f:
+            return json.load(f)
+
+    def _merge_into_record(self, patient_id: str, entries: List[Tuple[int, Dict[str, Any]]]) -> None:
+        record = self.stored_record(patient_id)
+        compacted_seq = record.get("compacted_seq", 0)
+        new_sessions = [session for seq, session in entries if seq > compacted_seq]
+        if not new_sessions:
+            return
+        record["sessions"] = _sorted_sessions(new_sessions + record.get("sessions", []))
+        record["compacted_seq"] = max(seq for seq, _ in entries)
+
+        path = os.path.join(self.records_dir, f"{patient_id}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    # ---------------------------------------------------------------- lifecycle
+
+    def close(self) -> None:
+        """Fsync outstanding entries and stop the background thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._fsync_locked()
+            self._closed = True
+            self._file.close()
+            self._cond.notify_all()
+        self._flusher.join()
+
+    def _open_log(self) -> None:
+        self._file = open(self._log_path, "a", buffering=1024 * 1024)
+        if self._file.tell() == 0:
+            # The header carries the sequence high-water mark across compactions
+            self._file.write(json.dumps({"base_seq": self._seq}) + "\n")
+            self._file.flush()
+
+    def _recover(self) -> None:
+        """Rebuild the overlay from log files left by a previous process."""
+        for path, target in ((self._compacting_path, self._compacting), (self._log_path, self._overlay)):
+            if not os.path.exists(path):
+                continue
+            valid_end = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write at the tail of the log
+                        break
+                    valid_end += len(line)
+                    if "base_seq" in entry:
+                        self._seq = max(self._seq, entry["base_seq"])
+                        continue
+                    self._seq = max(self._seq, entry["seq"])
+                    target.setdefault(entry["patient_id"], []).append((entry["seq"], entry["session"]))
+                    if target is self._overlay:
+                        self._logged += 1
+            if os.path.getsize(path) != valid_end:
+                os.truncate(path, valid_end)
+        self._durable_seq = self._seq
+        self._open_log()
+
+
+def _sorted_sessions(sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(sessions, key=lambda s: s.get("date", ""), reverse=True)
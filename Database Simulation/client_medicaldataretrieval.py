@@ -1,56 +1,793 @@
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterator, List, Optional, Sequence, Tuple
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def ping_dbs():
-    base_url = "http://127.0.0.1:8001"
-    endpoint = f"/db_id"
+from resilience import EndpointHealth
+from response_cache import ResponseCache, default_cache
+
+# Optional: msgpack responses are smaller and faster to decode than JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Optional: httpx powers the asyncio fan-out client
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+MSGPACK = "application/msgpack"
+MEDICAL_URL = "http://127.0.0.1:8001"
+MOVEMEND_URL = "http://127.0.0.1:8002"
+GATEWAY_URL = "http://127.0.0.1:8003"
+
+# Statuses worth retrying: the simulator is restarting or shedding load
+RETRY_STATUSES = {429, 502, 503, 504}
+
+def _accept_header(use_msgpack: bool):
+    if use_msgpack and msgpack is not None:
+        return {"Accept": f"{MSGPACK}, application/json;q=0.5"}
+    return {"Accept": "application/json"}
+
+def _backoff_delay(attempt: int, base: float, cap: float, response=None) -> float:
+    if response is not None and response.headers.get("retry-after", "").isdigit():
+        return min(float(response.headers["retry-after"]), cap)
+    # "Full jitter": spreads retries from many clients instead of synchronizing them
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def decode_body(content_type: str, body: bytes):
+    if content_type.startswith(MSGPACK):
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+def decode_response(response):
+    """Decode a simulator response body (requests or httpx), whether it was sent as msgpack or JSON."""
+    return decode_body(response.headers.get("content-type", ""), response.content)
+
+def _validators(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Conditional request headers for a cached entry."""
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def _cacheable(response) -> bool:
+    return response.status_code == 200 and bool(response.headers.get("etag") or response.headers.get("last-modified"))
+
+
+def _replica_groups(primaries: Dict[str, str], replicas: Dict[str, Optional[Sequence[str]]]) -> Dict[str, List[str]]:
+    """Map each primary base URL to itself plus its replicas (default: the *_DB_REPLICAS env vars)."""
+    groups = {}
+    for name, primary in primaries.items():
+        extra = replicas.get(name)
+        if extra is None:
+            extra = [u for u in os.getenv(f"{name.upper()}_DB_REPLICAS", "").split(",") if u.strip()]
+        groups[primary] = [primary] + [u.strip().rstrip("/") for u in extra if u.strip().rstrip("/") != primary]
+    return groups
+
+def _alternatives(groups: Dict[str, List[str]], url: str) -> List[str]:
+    """The same URL on every replica of its simulator, primary first."""
+    for primary, group in groups.items():
+        if url == primary or url.startswith(primary + "/"):
+            return [replica + url[len(primary):] for replica in group]
+    return [url]
+
+def _by_health(health: EndpointHealth, urls: List[str]) -> List[str]:
+    """Replicas with a closed breaker first, then by median latency, so a persistently slow one is only hedged to."""
+    def rank(url):
+        endpoint = health.endpoint(url)
+        return endpoint.breaker.is_open, endpoint.latency.percentile(0.5) or 0.0
+    return sorted(urls, key=rank)
+
+def _is_outage(error: "SimulatorError") -> bool:
+    """Connection failures, timeouts and 5xx/429 mean the simulator is unhealthy; other 4xx do not."""
+    return error.status_code is None or error.status_code >= 500 or error.status_code in RETRY_STATUSES
+
+def _projection_params(count: int, patient_ids: Optional[List[str]], include: Optional[List[str]],
+                       resource_types: Optional[List[str]], sessions_limit: Optional[int]) -> Dict[str, Any]:
+    """Query parameters for the gateway's /linked_patients."""
+    params: Dict[str, Any] = {"count": count}
+    if patient_ids:
+        params["ids"] = ",".join(patient_ids)
+    if include:
+        params["include"] = ",".join(include)
+    if resource_types:
+        params["resource_types"] = ",".join(resource_types)
+    if sessions_limit is not None:
+        params["sessions_limit"] = sessions_limit
+    return params
+
+def _check_linked(record: Dict[str, Any], return_exceptions: bool) -> Dict[str, Any]:
+    """Raise for failures the gateway reported inline, the way the client-side join would."""
+    if record.get("medical_error") and not return_exceptions:
+        raise SimulatorError(f"Patient {record['id']}: {record['medical_error']}", status_code=502)
+    if record.get("movemend_error") and not return_exceptions:
+        raise SimulatorError(f"Patient {record['id']}: {record['movemend_error']}", status_code=502)
+    return record
+
+
+class SimulatorError(Exception):
+    """Raised when a simulator request fails after all retries."""
+
+    def __init__(self, message: str, url: Optional[str] = None, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.url = url
+        self.status_code = status_code
+
+
+class CircuitOpenError(SimulatorError):
+    """Raised without a network call while an endpoint's circuit breaker is open."""
+
+
+class SimulatorClient:
+    """Client for the medical record and MoveMend simulators.
+
+    All requests share one pooled keep-alive ``requests.Session``, use separate
+    connect/read timeouts, and retry connection errors and 429/5xx responses
+    with jittered exponential backoff. Methods return parsed data or raise
+    ``SimulatorError``.
+
+    With a ``ResponseCache``, GETs revalidate cached bodies with
+    If-None-Match / If-Modified-Since and read them from disk on 304, and
+    ``linked_patients`` fetches patients individually so their bundles can be
+    served from the cache.
+
+    ``linked_patients`` asks the join gateway first (one streamed request)
+    and only joins client-side when the gateway is not running.
+
+    Each endpoint (host + first path segment) has a circuit breaker: after
+    ``failure_threshold`` consecutive outages calls fail fast with
+    ``CircuitOpenError`` for ``reset_timeout`` seconds, and ``get_json``
+    serves the stale cached body, if any, while the simulator recovers. When
+    a simulator has replicas (``medical_replicas`` / ``movemend_replicas`` or
+    the MEDICAL_DB_REPLICAS / MOVEMEND_DB_REPLICAS env vars), GETs are hedged:
+    if the first replica hasn't answered within that endpoint's p95 latency
+    the request is also sent to the next one and the first answer wins.
+    ``stats()`` reports breaker states and hedge rates.
+    """
+
+    def __init__(self, medical_url: str = MEDICAL_URL, movemend_url: str = MOVEMEND_URL,
+                 pool_maxsize: int = 32, connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.2, backoff_max: float = 5.0,
+                 use_msgpack: bool = False, cache: Optional[ResponseCache] = None,
+                 gateway_url: Optional[str] = GATEWAY_URL,
+                 medical_replicas: Optional[Sequence[str]] = None, movemend_replicas: Optional[Sequence[str]] = None,
+                 hedge: bool = True, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.cache = cache
+        self.gateway_url = gateway_url.rstrip("/") if gateway_url else None
+        self.medical_url = medical_url.rstrip("/")
+        self.movemend_url = movemend_url.rstrip("/")
+        self.replicas = _replica_groups({"medical": self.medical_url, "movemend": self.movemend_url},
+                                        {"medical": medical_replicas, "movemend": movemend_replicas})
+        self.hedge = hedge
+        self.health = EndpointHealth(failure_threshold, reset_timeout)
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.use_msgpack = use_msgpack
+
+        self.session = requests.Session()
+        # One pool per simulator host; pool_maxsize bounds concurrent sockets per host
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(_accept_header(use_msgpack))
+
+    # ------------------------------------------------------------------ transport
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        return _backoff_delay(attempt, self.backoff_base, self.backoff_max, response)
+
+    def request(self, method: str, url: str, idempotent: bool = True, retries: Optional[int] = None,
+                **kwargs) -> requests.Response:
+        """Send a request with timeouts and retries through the endpoint's circuit breaker."""
+        endpoint = self.health.endpoint(url)
+        if not endpoint.breaker.allow():
+            raise CircuitOpenError(f"{method} {url} not sent: circuit open for {endpoint.key}", url)
+        endpoint.count("requests")
+        started = time.perf_counter()
+        try:
+            response = self._send(method, url, idempotent, retries, **kwargs)
+        except SimulatorError as e:
+            endpoint.count("errors")
+            if _is_outage(e):
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.record_success()
+            raise
+        endpoint.latency.record(time.perf_counter() - started)
+        endpoint.breaker.record_success()
+        return response
+
+    def _send(self, method: str, url: str, idempotent: bool, retries: Optional[int], **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            last_attempt = attempt == retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # Safe to retry even non-idempotent requests only if we never connected
+                if last_attempt or not (idempotent or isinstance(e, requests.exceptions.ConnectTimeout)):
+                    raise SimulatorError(f"{method} {url} failed: {e}", url) from e
+                time.sleep(self._backoff(attempt))
+                continue
+            except requests.exceptions.Timeout as e:
+                if last_attempt or not idempotent:
+                    raise SimulatorError(f"{method} {url} timed out: {e}", url) from e
+                time.sleep(self._backoff(attempt))
+                continue
+            except requests.exceptions.RequestException as e:
+                raise SimulatorError(f"{method} {url} failed: {e}", url) from e
+
+            if response.status_code in RETRY_STATUSES and idempotent and not last_attempt:
+                time.sleep(self._backoff(attempt, response))
+                continue
+            if response.status_code >= 400:
+                raise SimulatorError(f"{method} {url} returned {response.status_code}: {response.text[:200]}",
+                                     url, response.status_code)
+            return response
+        raise SimulatorError(f"{method} {url} failed after {retries + 1} attempts", url)
+
+    def fetch(self, url: str, **kwargs) -> requests.Response:
+        """GET ``url``, hedged across the simulator's replicas when it has any."""
+        urls = _alternatives(self.replicas, url)
+        if len(urls) == 1 or not self.hedge:
+            return self.request("GET", url, **kwargs)
+
+        urls = _by_health(self.health, urls)
+        primary = self.health.endpoint(url)
+        primary.count("hedgeable")
+        delay = self.health.endpoint(urls[0]).latency.hedge_delay()
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=self.pool_maxsize, thread_name_prefix="hedge")
+
+        first = self._hedge_pool.submit(self.request, "GET", urls[0], **kwargs)
+        pending, errors, launched = {first}, [], 1
+        while pending:
+            done, pending = wait(pending, timeout=delay if launched < len(urls) else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except SimulatorError as e:
+                    errors.append(e)
+                    continue
+                if future is not first:
+                    primary.count("hedge_wins")
+                # The losing request can't be interrupted; it finishes in the background
+                return response
+            if launched < len(urls) and (not done or not pending):
+                # Timer fired (hedge) or every attempt so far failed (fail over)
+                if not done:
+                    primary.count("hedged")
+                pending.add(self._hedge_pool.submit(self.request, "GET", urls[launched], **kwargs))
+                launched += 1
+        raise errors[0]
+
+    def _stale(self, url: str, key: Optional[str], entry: Optional[Dict[str, Any]], error: SimulatorError) -> Any:
+        """The cached body for ``url`` if the failure is an outage, else re-raise ``error``."""
+        body = self.cache.read(key, entry) if entry is not None and _is_outage(error) else None
+        if body is None:
+            raise error
+        self.health.endpoint(url).count("stale_served")
+        print(f"Serving stale cached copy of {url}: {error}")
+        return decode_body(entry["content_type"], body)
+
+    def get_json(self, url: str, **kwargs) -> Any:
+        """GET a simulator URL and decode the body (msgpack or JSON), revalidating any cached copy.
+
+        If the simulator is down (or its breaker is open) a cached copy is returned instead.
+        """
+        if self.cache is None:
+            return decode_response(self.fetch(url, **kwargs))
+
+        headers = kwargs.pop("headers", {})
+        key = ResponseCache.key(url, headers.get("Accept", self.session.headers["Accept"]))
+        entry = self.cache.lookup(key)
+        try:
+            response = self.fetch(url, headers=dict(headers, **_validators(entry)), **kwargs)
+        except SimulatorError as e:
+            return self._stale(url, key, entry, e)
+        if response.status_code == 304:
+            body = self.cache.read(key, entry)
+            if body is not None:
+                return decode_body(entry["content_type"], body)
+            # Evicted between lookup and read: fetch the full body
+            response = self.fetch(url, headers=headers, **kwargs)
+        if _cacheable(response):
+            self.cache.store(key, url, response.content, response.headers.get("content-type", ""),
+                             response.headers.get("etag"), response.headers.get("last-modified"))
+        return decode_response(response)
+
+    # ------------------------------------------------------------------ simulator API
+
+    def ping(self) -> Dict[str, Dict[str, Any]]:
+        """Return the /db_id answer of both simulators."""
+        return {
+            "medical": self.get_json(f"{self.medical_url}/db_id"),
+            "movemend": self.get_json(f"{self.movemend_url}/db_id"),
+        }
+
+    def random_patients(self, count: int) -> List[Dict[str, Any]]:
+        """Fetch ``count`` random patients as ``{"id", "data"}`` records."""
+        return self.get_json(f"{self.medical_url}/random_patient_list/{count}")
+
+    def random_patient_ids(self, count: int) -> List[str]:
+        """Pick ``count`` random patient ids without downloading their bundles."""
+        return self.get_json(f"{self.medical_url}/random_patient_ids/{count}")
+
+    def patient(self, patient_id: str) -> Dict[str, Any]:
+        """Fetch one patient as an ``{"id", "data"}`` record (cacheable)."""
+        return self.get_json(f"{self.medical_url}/patient/{patient_id}")
+
+    def movemend_dossier(self, patient_id: str) -> Dict[str, Any]:
+        """Fetch a patient's MoveMend record."""
+        return self.get_json(f"{self.movemend_url}/patient_dossier/{patient_id}")
+
+    def append_sessions(self, patient_id: str, sessions: Any, use_msgpack: Optional[bool] = None) -> Dict[str, Any]:
+        """Append one session or a list of sessions to a patient's MoveMend record."""
+        url = f"{self.movemend_url}/patient_dossier/{patient_id}/sessions"
+        if use_msgpack is None:
+            use_msgpack = self.use_msgpack
+        if use_msgpack and msgpack is not None:
+            response = self.request("POST", url, idempotent=False,
+                                    data=msgpack.packb(sessions, use_bin_type=True),
+                                    headers=dict(_accept_header(True), **{"Content-Type": MSGPACK}))
+        else:
+            response = self.request("POST", url, idempotent=False, json=sessions)
+        return decode_response(response)
+
+    def stream_linked_patients(self, count: int = 10, patient_ids: Optional[List[str]] = None,
+                               include: Optional[List[str]] = None, resource_types: Optional[List[str]] = None,
+                               sessions_limit: Optional[int] = None,
+                               retries: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream joined patients from the gateway's /linked_patients, in completion order.
+
+        ``include`` picks "medical" and/or "movemend", ``resource_types`` keeps
+        only those FHIR entries in ``data`` and ``sessions_limit`` keeps the
+        newest MoveMend sessions. A part the gateway could not fetch is None,
+        with the reason in ``medical_error`` / ``movemend_error``.
+        """
+        if self.gateway_url is None:
+            raise SimulatorError("No gateway_url configured")
+        params = _projection_params(count, patient_ids, include, resource_types, sessions_limit)
+        response = self.request("GET", f"{self.gateway_url}/linked_patients", params=params, stream=True,
+                                retries=retries, headers={"Accept": "application/x-ndjson"})
+        with response:
+            try:
+                # Lines carry whole FHIR bundles (MBs); small chunks make iter_lines re-copy them endlessly
+                for line in response.iter_lines(chunk_size=1 << 16):
+                    if line:
+                        yield json.loads(line)
+            except requests.exceptions.RequestException as e:
+                raise SimulatorError(f"Linked patient stream broke off: {e}", response.url) from e
+
+    def linked_patients(self, count: int) -> List[Dict[str, Any]]:
+        """Fetch random patients with their MoveMend record attached as ``movemend_data``."""
+        if self.gateway_url is not None:
+            try:
+                return [_check_linked(record, False) for record in self.stream_linked_patients(count, retries=0)]
+            except SimulatorError as e:
+                if e.status_code is not None:
+                    raise
+                print(f"Linked patient gateway unavailable ({e}); joining client-side")
+        if self.cache is not None:
+            records = [self.patient(patient_id) for patient_id in self.random_patient_ids(count)]
+        else:
+            records = self.random_patients(count)
+        for record in records:
+            record["movemend_data"] = self.movemend_dossier(record["id"])
+        return records
+
+    def iter_movemend_events(self, last_event_id: Optional[str] = None,
+                             types: Optional[List[str]] = None) -> Iterator[Tuple[Optional[str], str, Dict[str, Any]]]:
+        """Follow the MoveMend /events SSE feed, yielding (event_id, event_type, data) tuples.
+
+        A "reset" event means history was lost and the consumer should reload everything.
+        """
+        params = {"types": ",".join(types)} if types else {}
+        headers = {"Accept": "text/event-stream"}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        # The server sends a keep-alive comment every 15s, so a 60s read timeout means a dead stream
+        response = self.request("GET", f"{self.movemend_url}/events", params=params, headers=headers,
+                                stream=True, timeout=(self.timeout[0], 60))
+        with response:
+            event_id, event_type, data = None, "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    field, _, value = line.partition(":")
+                    value = value[1:] if value.startswith(" ") else value
+                    if field == "id":
+                        event_id = value
+                    elif field == "event":
+                        event_type = value
+                    elif field == "data":
+                        data.append(value)
+                    continue
+                if data:
+                    yield event_id, event_type, json.loads("\n".join(data))
+                event_type, data = "message", []
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-endpoint request/error counts, p95 latency, hedge rate and breaker state."""
+        stats: Dict[str, Any] = {"endpoints": self.health.stats()}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncSimulatorClient:
+    """asyncio counterpart of SimulatorClient built on ``httpx.AsyncClient``.
+
+    Used to fan out per-patient MoveMend requests concurrently: loading N
+    linked patients costs the patient-list round trip plus roughly one dossier
+    round trip, instead of 1 + N sequential calls. Caching works as in
+    SimulatorClient; disk I/O runs in worker threads. As in SimulatorClient,
+    ``iter_linked_patients`` prefers the join gateway when it is running, and
+    requests go through per-endpoint circuit breakers and are hedged across
+    replicas (the losing request is cancelled).
+    """
+
+    def __init__(self, medical_url: str = MEDICAL_URL, movemend_url: str = MOVEMEND_URL,
+                 max_concurrency: int = 16, connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.2, backoff_max: float = 5.0,
+                 use_msgpack: bool = False, cache: Optional[ResponseCache] = None,
+                 gateway_url: Optional[str] = GATEWAY_URL,
+                 medical_replicas: Optional[Sequence[str]] = None, movemend_replicas: Optional[Sequence[str]] = None,
+                 hedge: bool = True, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        if httpx is None:
+            raise ImportError("AsyncSimulatorClient requires httpx (pip install httpx)")
+        self.cache = cache
+        self.gateway_url = gateway_url.rstrip("/") if gateway_url else None
+        self.medical_url = medical_url.rstrip("/")
+        self.movemend_url = movemend_url.rstrip("/")
+        self.replicas = _replica_groups({"medical": self.medical_url, "movemend": self.movemend_url},
+                                        {"medical": medical_replicas, "movemend": movemend_replicas})
+        self.hedge = hedge
+        self.health = EndpointHealth(failure_threshold, reset_timeout)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            headers=_accept_header(use_msgpack),
+        )
+
+    async def request(self, method: str, url: str, idempotent: bool = True, retries: Optional[int] = None,
+                      stream: bool = False, **kwargs):
+        """Send a request with retries and jittered backoff through the endpoint's circuit breaker.
+
+        With ``stream=True`` the body is not read; the caller must close the response.
+        """
+        endpoint = self.health.endpoint(url)
+        if not endpoint.breaker.allow():
+            raise CircuitOpenError(f"{method} {url} not sent: circuit open for {endpoint.key}", url)
+        endpoint.count("requests")
+        started = time.perf_counter()
+        try:
+            response = await self._send(method, url, idempotent, retries, stream, **kwargs)
+        except asyncio.CancelledError:
+            # Lost a hedge race: the time so far is a lower bound of this replica's latency
+            endpoint.latency.record(time.perf_counter() - started)
+            raise
+        except SimulatorError as e:
+            endpoint.count("errors")
+            if _is_outage(e):
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.record_success()
+            raise
+        endpoint.latency.record(time.perf_counter() - started)
+        endpoint.breaker.record_success()
+        return response
+
+    async def _send(self, method: str, url: str, idempotent: bool, retries: Optional[int], stream: bool, **kwargs):
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            last_attempt = attempt == retries
+            try:
+                response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if last_attempt:
+                    raise SimulatorError(f"{method} {url} failed: {e}", url) from e
+            except httpx.TransportError as e:
+                if last_attempt or not idempotent:
+                    raise SimulatorError(f"{method} {url} failed: {e}", url) from e
+            else:
+                if response.status_code in RETRY_STATUSES and idempotent and not last_attempt:
+                    await response.aclose()
+                    await asyncio.sleep(_backoff_delay(attempt, self.backoff_base, self.backoff_max, response))
+                    continue
+                if response.status_code >= 400:
+                    await response.aread()
+                    await response.aclose()
+                    raise SimulatorError(f"{method} {url} returned {response.status_code}: {response.text[:200]}",
+                                         url, response.status_code)
+                return response
+            await asyncio.sleep(_backoff_delay(attempt, self.backoff_base, self.backoff_max))
+        raise SimulatorError(f"{method} {url} failed after {retries + 1} attempts", url)
+
+    async def fetch(self, url: str, **kwargs):
+        """GET ``url``, hedged across the simulator's replicas; see SimulatorClient.fetch."""
+        urls = _alternatives(self.replicas, url)
+        if len(urls) == 1 or not self.hedge:
+            return await self.request("GET", url, **kwargs)
+
+        urls = _by_health(self.health, urls)
+        primary = self.health.endpoint(url)
+        primary.count("hedgeable")
+        delay = self.health.endpoint(urls[0]).latency.hedge_delay()
+        first = asyncio.ensure_future(self.request("GET", urls[0], **kwargs))
+        pending, errors, launched = {first}, [], 1
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=delay if launched < len(urls) else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        response = task.result()
+                    except SimulatorError as e:
+                        errors.append(e)
+                        continue
+                    if task is not first:
+                        primary.count("hedge_wins")
+                    return response
+                if launched < len(urls) and (not done or not pending):
+                    if not done:
+                        primary.count("hedged")
+                    pending.add(asyncio.ensure_future(self.request("GET", urls[launched], **kwargs)))
+                    launched += 1
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _stale(self, url: str, key: Optional[str], entry: Optional[Dict[str, Any]],
+                     error: SimulatorError) -> Tuple[str, bytes]:
+        body = await asyncio.to_thread(self.cache.read, key, entry) if entry is not None and _is_outage(error) else None
+        if body is None:
+            raise error
+        self.health.endpoint(url).count("stale_served")
+        print(f"Serving stale cached copy of {url}: {error}")
+        return entry["content_type"], body
+
+    async def get_body(self, url: str, **kwargs) -> Tuple[str, bytes]:
+        """GET a simulator URL as (content type, raw body), revalidating any cached copy."""
+        if self.cache is None:
+            response = await self.fetch(url, **kwargs)
+            return response.headers.get("content-type", ""), response.content
+
+        headers = kwargs.pop("headers", {})
+        key = ResponseCache.key(url, headers.get("Accept", self.client.headers["Accept"]))
+        entry = await asyncio.to_thread(self.cache.lookup, key)
+        try:
+            response = await self.fetch(url, headers=dict(headers, **_validators(entry)), **kwargs)
+        except SimulatorError as e:
+            return await self._stale(url, key, entry, e)
+        if response.status_code == 304:
+            body = await asyncio.to_thread(self.cache.read, key, entry)
+            if body is not None:
+                return entry["content_type"], body
+            response = await self.fetch(url, headers=headers, **kwargs)
+        content_type = response.headers.get("content-type", "")
+        if _cacheable(response):
+            await asyncio.to_thread(self.cache.store, key, url, response.content, content_type,
+                                    response.headers.get("etag"), response.headers.get("last-modified"))
+        return content_type, response.content
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        return decode_body(*await self.get_body(url, **kwargs))
+
+    async def random_patients(self, count: int) -> List[Dict[str, Any]]:
+        return await self.get_json(f"{self.medical_url}/random_patient_list/{count}")
+
+    async def random_patient_ids(self, count: int) -> List[str]:
+        return await self.get_json(f"{self.medical_url}/random_patient_ids/{count}")
+
+    async def patient(self, patient_id: str) -> Dict[str, Any]:
+        return await self.get_json(f"{self.medical_url}/patient/{patient_id}")
+
+    async def movemend_dossier(self, patient_id: str) -> Dict[str, Any]:
+        return await self.get_json(f"{self.movemend_url}/patient_dossier/{patient_id}")
+
+    async def stream_linked_patients(self, count: int = 10, patient_ids: Optional[List[str]] = None,
+                                     include: Optional[List[str]] = None, resource_types: Optional[List[str]] = None,
+                                     sessions_limit: Optional[int] = None,
+                                     retries: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream joined patients from the gateway; see SimulatorClient.stream_linked_patients."""
+        if self.gateway_url is None:
+            raise SimulatorError("No gateway_url configured")
+        params = _projection_params(count, patient_ids, include, resource_types, sessions_limit)
+        url = f"{self.gateway_url}/linked_patients"
+        response = await self.request("GET", url, params=params, retries=retries, stream=True,
+                                      headers={"Accept": "application/x-ndjson"})
+        try:
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)
+        except httpx.TransportError as e:
+            raise SimulatorError(f"Linked patient stream broke off: {e}", url) from e
+        finally:
+            await response.aclose()
+
+    async def iter_linked_patients(self, count: int, return_exceptions: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Yield random patients with ``movemend_data`` attached, in completion order.
+
+        Uses the join gateway when it is running. Otherwise dossiers are
+        fetched concurrently, bounded by ``max_concurrency``. With
+        ``return_exceptions=True`` a failed dossier yields the record with
+        ``movemend_data`` set to None and the reason in ``movemend_error``
+        instead of raising, and a failed medical record likewise yields it with
+        ``data`` set to None and the reason in ``medical_error``.
+        """
+        if self.gateway_url is not None:
+            started = False
+            try:
+                async for record in self.stream_linked_patients(count, retries=0):
+                    started = True
+                    yield _check_linked(record, return_exceptions)
+                return
+            except SimulatorError as e:
+                if started or e.status_code is not None:
+                    raise
+                print(f"Linked patient gateway unavailable ({e}); joining client-side")
+
+        if self.cache is not None:
+            # Per-patient requests so unchanged bundles come from the disk cache
+            records = [{"id": patient_id} for patient_id in await self.random_patient_ids(count)]
+        else:
+            records = await self.random_patients(count)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def link(record):
+            async with semaphore:
+                try:
+                    if "data" not in record:
+                        record.update(await self.patient(record["id"]))
+                except SimulatorError as e:
+                    if not return_exceptions:
+                        raise
+                    record["data"] = None
+                    record["medical_error"] = str(e)
+                try:
+                    record["movemend_data"] = await self.movemend_dossier(record["id"])
+                except SimulatorError as e:
+                    if not return_exceptions:
+                        raise
+                    record["movemend_data"] = None
+                    record["movemend_error"] = str(e)
+            return record
+
+        tasks = [asyncio.ensure_future(link(record)) for record in records]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-endpoint request/error counts, p95 latency, hedge rate and breaker state."""
+        stats: Dict[str, Any] = {"endpoints": self.health.stats()}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """Run a coroutine from synchronous code such as a Streamlit script.
+
+    Uses asyncio.run, or a helper thread when the caller already has a running loop.
+    """
     try:
-        response = requests.get(base_url + endpoint)
-        response.raise_for_status()  # Raises HTTPError for 4xx/5xx
-        print(response.json())
-    except requests.exceptions.RequestException as e:
-        print(f"Error retrieving patient list: {e}")
-        return []
-    
-    base_url_2 = "http://127.0.0.1:8002"
-    endpoint = f"/db_id"
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+def fetch_linked_patients(count: int, return_exceptions: bool = False, **client_kwargs) -> List[Dict[str, Any]]:
+    """Synchronous wrapper around AsyncSimulatorClient.iter_linked_patients.
+
+    Uses the shared on-disk response cache unless ``cache`` is passed explicitly.
+    """
+    client_kwargs.setdefault("cache", default_cache())
+
+    async def collect():
+        async with AsyncSimulatorClient(**client_kwargs) as client:
+            return [record async for record in client.iter_linked_patients(count, return_exceptions)]
+    return run_sync(collect())
+
+
+_default_client: Optional[SimulatorClient] = None
+
+def get_client() -> SimulatorClient:
+    """Return the process-wide client, so callers share one connection pool."""
+    global _default_client
+    if _default_client is None:
+        _default_client = SimulatorClient(cache=default_cache())
+    return _default_client
+
+# ---------------------------------------------------------------------- legacy helpers
+# These predate SimulatorClient: they return raw responses and turn failures into [].
+# They now share the pooled session and timeouts; new code should use SimulatorClient.
+
+def ping_dbs():
     try:
-        response = requests.get(base_url_2 + endpoint)
-        response.raise_for_status()  # Raises HTTPError for 4xx/5xx
-        print(response.json())
-    except requests.exceptions.RequestException as e:
+        for answer in get_client().ping().values():
+            print(answer)
+    except SimulatorError as e:
         print(f"Error retrieving patient list: {e}")
         return []
 
-def get_random_patient_data(count: int):
-
-    base_url = "http://127.0.0.1:8001"
-    endpoint = f"/random_patient_list/{count}"
+def get_random_patient_data(count: int, use_msgpack: bool = False):
+    """Fetch random patients. With use_msgpack=True read the body with decode_response()."""
+    client = get_client()
     try:
-        records = requests.get(base_url + endpoint)
-        records.raise_for_status()  # Raises HTTPError for 4xx/5xx
-        return records
-    
-    except requests.exceptions.RequestException as e:
+        return client.request("GET", f"{client.medical_url}/random_patient_list/{count}",
+                              headers=_accept_header(use_msgpack))
+    except SimulatorError as e:
         print(f"Error retrieving patient list: {e}")
         return []
-    
-def get_movemend_data(patient_id: str):
-    base_url = "http://127.0.0.1:8002"
-    endpoint = f"/patient_dossier/{patient_id}"
+
+def get_movemend_data(patient_id: str, use_msgpack: bool = False):
+    """Fetch a MoveMend dossier. With use_msgpack=True read the body with decode_response()."""
+    client = get_client()
     try:
-        records = requests.get(base_url + endpoint)
-        records.raise_for_status()  # Raises HTTPError for 4xx/5xx
-        return records  
-    except requests.exceptions.RequestException as e:
+        return client.request("GET", f"{client.movemend_url}/patient_dossier/{patient_id}",
+                              headers=_accept_header(use_msgpack))
+    except SimulatorError as e:
         print(f"Error retrieving movemend data: {e}")
         return []
 
+def post_movemend_sessions(patient_id: str, sessions, use_msgpack: bool = False):
+    """Append sessions to a patient's MoveMend record, optionally sending the body as msgpack."""
+    return get_client().append_sessions(patient_id, sessions, use_msgpack)
+
+def iter_movemend_events(last_event_id=None, types=None):
+    """Follow the MoveMend /events SSE feed; see SimulatorClient.iter_movemend_events."""
+    return get_client().iter_movemend_events(last_event_id, types)
+
 if __name__ == "__main__":
-    ping_dbs()
-    records = get_random_patient_data(5)
-    records_json = records.json()
-    for record in records_json:
-        print(record["id"])
-        record["movemend_data"] = get_movemend_data(record["id"]).json()
-        print("linked movemend data")
-        print("sessions: ", len(record["movemend_data"]["sessions"]))
\ No newline at end of file
+    with SimulatorClient(use_msgpack=True) as client:
+        print(client.ping())
+        for record in client.linked_patients(5):
+            print(record["id"])
+            print("linked movemend data")
+            print("sessions: ", len(record["movemend_data"]["sessions"]))
@@ -0,0 +1,164 @@
+"""Per-endpoint latency tracking and circuit breakers for the simulator clients.
+
+An endpoint is a simulator host plus the first path segment of the URL
+(``http://127.0.0.1:8002/patient_dossier``), so a slow bundle route doesn't
+trip the breaker or skew the hedge delay of a cheap one on the same host.
+
+Shared by SimulatorClient (threads, for hedging) and AsyncSimulatorClient,
+so everything here is guarded by plain locks and never blocks.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+
+def endpoint_key(url: str) -> str:
+    parts = urlsplit(url)
+    segment = parts.path.lstrip("/").split("/", 1)[0]
+    return f"{parts.scheme}://{parts.netloc}/{segment}"
+
+
+class LatencyTracker:
+    """Sliding window of response times; the hedge delay is its p95."""
+
+    def __init__(self, window: int = 256, min_samples: int = 20, default_delay: float = 0.25,
+                 min_delay: float = 0.01, max_delay: float = 2.0):
+        self._samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return None
+        samples.sort()
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self) -> float:
+        """How long to wait for the primary before hedging to another replica."""
+        with self._lock:
+            enough = len(self._samples) >= self.min_samples
+        if not enough:
+            return self.default_delay
+        return min(max(self.percentile(0.95), self.min_delay), self.max_delay)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed.
+
+    After ``failure_threshold`` outages in a row the breaker opens and calls
+    fail fast for ``reset_timeout`` seconds. Then one trial call is let
+    through (half-open): success closes the breaker, failure re-opens it. A
+    trial that never reports back (e.g. a cancelled hedge) is replaced after
+    another ``reset_timeout``.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_started = None
+            if self._trial_started is None or now - self._trial_started >= self.reset_timeout:
+                self._trial_started = now
+                return True
+            return False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_started = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.times_opened,
+                    "open_for_s": round(time.monotonic() - self.opened_at, 1) if self.state != self.CLOSED else 0.0}
+
+
+class Endpoint:
+    """Breaker, latency window and hedging counters for one endpoint."""
+
+    def __init__(self, key: str, failure_threshold: int, reset_timeout: float):
+        self.key = key
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyTracker()
+        # requests/errors count sends to this endpoint; hedgeable/hedged/hedge_wins count
+        # fetches that asked for this endpoint and may have been answered by a replica
+        self.counts = {"requests": 0, "errors": 0, "hedgeable": 0, "hedged": 0, "hedge_wins": 0, "stale_served": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        p95 = self.latency.percentile(0.95)
+        return dict(counts, breaker=self.breaker.snapshot(),
+                    hedge_rate=round(counts["hedged"] / counts["hedgeable"], 4) if counts["hedgeable"] else 0.0,
+                    p95_ms=round(p95 * 1000, 1) if p95 is not None else None)
+
+
+class EndpointHealth:
+    """Registry of Endpoints, created on first use."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._endpoints: Dict[str, Endpoint] = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, url: str) -> Endpoint:
+        key = endpoint_key(url)
+        with self._lock:
+            if key not in self._endpoints:
+                self._endpoints[key] = Endpoint(key, self.failure_threshold, self.reset_timeout)
+            return self._endpoints[key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+        return {endpoint.key: endpoint.snapshot() for endpoint in endpoints}
@@ -0,0 +1,203 @@
+"""Content-addressed on-disk cache for simulator responses.
+
+Bodies are stored once per content hash under ``blobs/``; small entry files
+under ``entries/`` map a request (URL + Accept) to its blob and validators
+(ETag / Last-Modified). An entry file's mtime is its last use, which gives LRU
+eviction without rewriting a shared index on every hit.
+
+The directory can be shared by every process on the host (dashboard, MCP
+server, jobs): writers serialize on an ``fcntl`` lock file and every file is
+published with an atomic rename, so readers never need the lock and never see
+partial writes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: fall back to in-process locking only
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "movemend-simulator")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache:
+    """Size-capped LRU cache of HTTP response bodies with their validators."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._blob_dir = os.path.join(directory, "blobs")
+        self._entry_dir = os.path.join(directory, "entries")
+        self._lock_path = os.path.join(directory, ".lock")
+        self._usage_path = os.path.join(directory, "usage")
+        self._thread_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._entry_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------ helpers
+
+    @staticmethod
+    def key(url: str, accept: str = "") -> str:
+        return hashlib.sha256(f"{accept} {url}".encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._entry_dir, f"{key}.json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest[:2], digest)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            with open(self._lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_usage(self) -> int:
+        try:
+            with open(self._usage_path) as f:
+                return int(f.read() or 0)
+        except (OSError, ValueError):
+            return self._recount_usage()
+
+    def _recount_usage(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self._blob_dir):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files if not f.startswith(".tmp-"))
+        return total
+
+    # ------------------------------------------------------------------ public API
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the entry metadata (validators, content type, blob digest) or None."""
+        try:
+            with open(self._entry_path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._blob_path(entry["blob"])):
+            # Blob evicted by another process; the entry is useless without it
+            return None
+        return entry
+
+    def read(self, key: str, entry: Dict[str, Any]) -> Optional[bytes]:
+        """Read an entry's body and mark it as recently used. None if it vanished."""
+        try:
+            with open(self._blob_path(entry["blob"]), "rb") as f:
+                body = f.read()
+            os.utime(self._entry_path(key))
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def store(self, key: str, url: str, body: bytes, content_type: str,
+              etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Store a response body under ``key`` and evict least recently used entries over the cap."""
+        if len(body) > self.max_bytes:
+            return
+        self.misses += 1
+        digest = hashlib.sha256(body).hexdigest()
+        entry = {"url": url, "blob": digest, "size": len(body), "content_type": content_type,
+                 "etag": etag, "last_modified": last_modified, "stored_at": time.time()}
+        with self._locked():
+            usage = self._read_usage()
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                self._write_atomic(blob_path, body)
+                usage += len(body)
+            self._write_atomic(self._entry_path(key), json.dumps(entry).encode("utf-8"))
+            if usage > self.max_bytes:
+                usage = self._evict(usage)
+            self._write_atomic(self._usage_path, str(usage).encode("utf-8"))
+
+    def _evict(self, usage: int) -> int:
+        """Drop least recently used entries until under 90% of the cap. Caller holds the lock."""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for name in os.listdir(self._entry_dir):
+            path = os.path.join(self._entry_dir, name)
+            try:
+                with open(path) as f:
+                    entries.append((os.path.getmtime(path), path, json.load(f)))
+            except (OSError, ValueError):
+                continue
+        entries.sort(key=lambda e: e[0])
+
+        live_blobs: Dict[str, int] = {}
+        for _, _, entry in entries:
+            live_blobs[entry["blob"]] = live_blobs.get(entry["blob"], 0) + 1
+        for _, path, entry in entries:
+            if usage <= target:
+                break
+            os.remove(path)
+            live_blobs[entry["blob"]] -= 1
+            # Content-addressed: a blob may back several entries, free it with the last one
+            if live_blobs[entry["blob"]] == 0:
+                try:
+                    os.remove(self._blob_path(entry["blob"]))
+                    usage -= entry["size"]
+                except OSError:
+                    pass
+        return usage
+
+    def clear(self) -> None:
+        with self._locked():
+            for root, _, files in os.walk(self.directory, topdown=False):
+                for name in files:
+                    if name != ".lock":
+                        os.remove(os.path.join(root, name))
+            os.makedirs(self._blob_dir, exist_ok=True)
+            os.makedirs(self._entry_dir, exist_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "bytes": self._read_usage(), "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+_default_cache: Optional[ResponseCache] = None
+
+def default_cache() -> Optional[ResponseCache]:
+    """Shared cache configured from the environment.
+
+    MOVEMEND_CACHE_DIR sets the directory (empty string disables caching) and
+    MOVEMEND_CACHE_MAX_MB the size cap.
+    """
+    global _default_cache
+    directory = os.getenv("MOVEMEND_CACHE_DIR", DEFAULT_CACHE_DIR)
+    if not directory:
+        return None
+    if _default_cache is None or _default_cache.directory != directory:
+        max_bytes = int(float(os.getenv("MOVEMEND_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024)
+        _default_cache = ResponseCache(directory, max_bytes)
+    return _default_cache
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Measure connection reuse in SimulatorClient against bare requests.get.
+
+By default a local keep-alive HTTP server stands in for a simulator and counts
+the TCP connections it accepts; pass --url to hit a running simulator instead
+(connection counts are then unavailable).
+
+    python benchmarks/bench_client_pooling.py --requests 500
+    python benchmarks/bench_client_pooling.py --url http://127.0.0.1:8002/patient_dossier/0859da6e-2508-d245-e483-b698cab1e7a4
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "Database Simulation"))
+
+from client_medicaldataretrieval import SimulatorClient
+
+PAYLOAD = json.dumps({"resourceType": "MovemendRecord", "id": "bench", "sessions": [{"score": i} for i in range(50)]}).encode()
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(label, fn, n, server):
+    before = server.connections if server else 0
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    connections = f"{server.connections - before:>6}" if server else "     ?"
+    print(f"{label:<28} {elapsed * 1000 / n:>8.2f} ms/req {n / elapsed:>9,.0f} req/s  connections: {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection reuse benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--url", default=None, help="Benchmark against this URL instead of a local server")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = CountingServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/patient_dossier/bench"
+
+    print(f"{args.requests} sequential GETs of {url}\n")
+    timed("bare requests.get", lambda: requests.get(url).json(), args.requests, server)
+    with SimulatorClient() as client:
+        timed("SimulatorClient (pooled)", lambda: client.get_json(url), args.requests, server)
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
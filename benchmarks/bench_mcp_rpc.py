@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""Tool calls per second through the MCP JSON-RPC server, over stdio and HTTP.
+
+Starts ``python -m mcp_server.rpc_server`` as a subprocess (memory
+persistence off, no patients loaded, so no simulator needs to be running)
+and sends a mix of create_memory / search_memories / get_memories calls
+with up to ``depth`` requests outstanding at once.
+
+    python benchmarks/bench_mcp_rpc.py --calls 5000 --depths 1 8 64
+    python benchmarks/bench_mcp_rpc.py --http
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+WORDS = "knee hip shoulder pain swelling balance gait fall risk sleep dose exercise walking improved".split()
+
+
+def tool_call(request_id):
+    kind = request_id % 4
+    if kind == 0:
+        name, arguments = "create_memory", {"content": " ".join(random.choices(WORDS, k=10)),
+                                            "category": "observation", "patient_id": f"p{request_id % 50}"}
+    elif kind in (1, 2):
+        name, arguments = "search_memories", {"query": " ".join(random.sample(WORDS, 2)), "limit": 5}
+    else:
+        name, arguments = "get_memories", {"patient_id": f"p{request_id % 50}", "category": "observation"}
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+
+
+def start_server(*args):
+    env = dict(os.environ, MCP_MEMORY_DB="", MCP_PATIENT_COUNT="0")
+    return subprocess.Popen([sys.executable, "-m", "mcp_server.rpc_server", *args], cwd=project_dir, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+async def bench_stdio(calls, depth):
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "mcp_server.rpc_server", "--max-in-flight", str(max(depth, 1)), cwd=project_dir,
+        env=dict(os.environ, MCP_MEMORY_DB="", MCP_PATIENT_COUNT="0"), limit=64 * 1024 * 1024,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    process.stdin.write(b'{"jsonrpc":"2.0","id":0,"method":"initialize","params":{}}\n')
+    await process.stdin.drain()
+    await process.stdout.readline()
+
+    window = asyncio.Semaphore(depth)
+    done = asyncio.Event()
+    received = 0
+
+    async def read_responses():
+        nonlocal received
+        while received < calls:
+            response = json.loads(await process.stdout.readline())
+            if "id" not in response:
+                continue  # notifications/resources/list_changed from the memory writes
+            assert "result" in response and not response["result"]["isError"], response
+            received += 1
+            window.release()
+        done.set()
+
+    reader = asyncio.create_task(read_responses())
+    start = time.perf_counter()
+    for request_id in range(1, calls + 1):
+        await window.acquire()
+        process.stdin.write(json.dumps(tool_call(request_id)).encode() + b"\n")
+        await process.stdin.drain()
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await reader
+    process.stdin.close()
+    await process.wait()
+    return elapsed
+
+
+async def bench_http(calls, depth, port):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60,
+                                 limits=httpx.Limits(max_connections=depth)) as client:
+        for _ in range(100):
+            try:
+                await client.post("/rpc", json={"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        window = asyncio.Semaphore(depth)
+
+        async def one(request_id):
+            async with window:
+                response = (await client.post("/rpc", json=tool_call(request_id))).json()
+            assert not response["result"]["isError"], response
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(request_id) for request_id in range(1, calls + 1)])
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP JSON-RPC server throughput")
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--http", action="store_true", help="Also benchmark POST /rpc over HTTP")
+    parser.add_argument("--port", type=int, default=8019)
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{'transport':<10} {'depth':>6} {'calls/s':>10} {'mean ms':>9}")
+    for depth in args.depths:
+        elapsed = asyncio.run(bench_stdio(args.calls, depth))
+        print(f"{'stdio':<10} {depth:>6} {args.calls / elapsed:>10.0f} {elapsed / args.calls * 1000 * depth:>9.2f}")
+
+    if args.http:
+        for depth in args.depths:
+            # Fresh server per depth so memory counts (and search cost) match the stdio runs
+            server = start_server("--http", "--port", str(args.port), "--max-in-flight", str(max(depth, 1)))
+            try:
+                elapsed = asyncio.run(bench_http(args.calls, depth, args.port))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{'http':<10} {depth:>6} {args.calls / elapsed:>10.0f} {elapsed / args.calls * 1000 * depth:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Repeated read_resource tool calls on whole patient records.
+
+Compares the old tool path (``read_resource`` dict, then ``json.dumps``)
+with ``call_tool_json``, which reuses the record's cached encoding. Loads
+patients from the simulators (ports 8001/8002, or the gateway on 8003)
+and reads each one a few times after a warm-up read.
+
+    python benchmarks/bench_read_resource.py --patients 5 --reads 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.tools import call_tool_json
+
+
+def timed(fn, uris, reads):
+    samples = []
+    for _ in range(reads):
+        for uri in uris:
+            start = time.perf_counter()
+            fn(uri)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="read_resource tool path latency")
+    parser.add_argument("--patients", type=int, default=5)
+    parser.add_argument("--reads", type=int, default=20)
+    args = parser.parse_args()
+
+    server = MCPServer(memory_db="", retention="")
+    server.initialize(patient_count=args.patients, wait_for=args.patients, timeout=300)
+    uris = [resource["uri"] for resource in server.list_resources("patient", page_size=args.patients)[0]]
+    sizes = [len(server.read_resource_json(uri)) for uri in uris]  # loads content and warms the cache
+    print(f"{len(uris)} patients, {sum(sizes) / len(sizes) / 1e6:.2f} MB JSON each on average")
+
+    print(f"{'path':<28} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, fn in [("read_resource + json.dumps", lambda uri: json.dumps(server.read_resource(uri))),
+                     ("call_tool_json", lambda uri: call_tool_json(server, "read_resource", {"uri": uri}))]:
+        p50, p95 = timed(fn, uris, args.reads)
+        print(f"{name:<28} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Mixed reads and writes on one MCPServer from many threads.
+
+Each thread loops over a weighted mix of the calls Streamlit sessions and
+the RPC server make (create/delete memory, list_resources pages,
+get_memories, search_memories, find_similar, read_resource) for a fixed
+time. Reports throughput and per-operation latency, counts exceptions
+(before the registry lock these included "dictionary changed size during
+iteration"), then checks that every index agrees with the URI map.
+
+    python benchmarks/bench_registry_concurrency.py --threads 1 4 16 --seconds 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.resources.base import ANY
+
+WORDS = "knee hip shoulder pain swelling balance gait fall risk sleep dose exercise walking improved".split()
+PATIENTS = [f"p{i}" for i in range(50)]
+
+
+def sentence(rng):
+    return " ".join(rng.choices(WORDS, k=10))
+
+
+def operations(server, rng, created, created_lock):
+    def create():
+        uri = server.create_memory(sentence(rng), rng.choice(["observation", "plan"]), rng.choice(PATIENTS))["memory_uri"]
+        with created_lock:
+            created.append(uri)
+
+    def delete():
+        with created_lock:
+            uri = created.pop(rng.randrange(len(created))) if created else None
+        if uri:
+            server.delete_memory(uri)
+
+    def page():
+        _, cursor = server.list_resources("memory")
+        while cursor:
+            _, cursor = server.list_resources("memory", cursor, page_size=200)
+
+    def read():
+        with created_lock:
+            uri = created[rng.randrange(len(created))] if created else None
+        if uri:
+            server.read_resource(uri)
+
+    # (name, weight, call): writes are about a fifth of the calls
+    return [
+        ("create_memory", 15, create),
+        ("delete_memory", 5, delete),
+        ("list_resources", 5, page),
+        ("get_memories", 20, lambda: server.get_memories(rng.choice(PATIENTS))),
+        ("search_memories", 20, lambda: server.search_memories(" ".join(rng.sample(WORDS, 2)))),
+        ("find_similar", 15, lambda: server.find_similar(sentence(rng), rng.choice([None, rng.choice(PATIENTS)]))),
+        ("read_resource", 20, read),
+    ]
+
+
+def check_consistency(registry):
+    """Every index must list exactly the registered resources."""
+    uris = set(registry.resources)
+    assert set(registry._sort_keys) == uris, "sort keys differ from resources"
+    assert {uri for _, _, uri in registry._indexes.get((ANY, ANY, ANY), [])} == uris, "ANY index differs"
+    assert {uri for _, uri in registry._by_seq.get(ANY, [])} == uris, "insertion order differs"
+    memories = {uri for uri, r in registry.resources.items() if r.search_text() is not None}
+    assert len(registry.text_index) == len(memories), "BM25 index size differs"
+    assert len(registry.similarity_index) == len(memories), "TF-IDF index size differs"
+
+
+def run(threads, seconds, preload):
+    server = MCPServer(memory_db="")
+    rng = random.Random(0)
+    created, created_lock = [], threading.Lock()
+    for _ in range(preload):
+        created.append(server.create_memory(sentence(rng), "observation", rng.choice(PATIENTS))["memory_uri"])
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    stop = threading.Event()
+    start_gate = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        worker_rng = random.Random(seed)
+        ops = operations(server, worker_rng, created, created_lock)
+        names, weights = [op[0] for op in ops], [op[1] for op in ops]
+        calls = {op[0]: op[2] for op in ops}
+        local = defaultdict(list)
+        start_gate.wait()
+        while not stop.is_set():
+            name = worker_rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                calls[name]()
+            except Exception as e:
+                errors[f"{name}: {type(e).__name__}: {e}"] += 1
+            local[name].append(time.perf_counter() - started)
+        for name, samples in local.items():
+            latencies[name].extend(samples)
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_gate.wait()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+
+    check_consistency(server.registry)
+    return latencies, errors, len(server.registry.resources)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent MCPServer stress test")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--preload", type=int, default=5000, help="Memories created before the run")
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        latencies, errors, remaining = run(threads, args.seconds, args.preload)
+        total = sum(len(samples) for samples in latencies.values())
+        print(f"\n{threads} threads: {total / args.seconds:,.0f} ops/s, {sum(errors.values())} errors, "
+              f"{remaining} resources at the end, indexes consistent")
+        print(f"  {'operation':<16} {'calls':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, samples in sorted(latencies.items()):
+            samples.sort()
+            print(f"  {name:<16} {len(samples):>8} {samples[len(samples) // 2] * 1000:>8.2f} "
+                  f"{samples[int(len(samples) * 0.99)] * 1000:>8.2f}")
+        for error, count in sorted(errors.items(), key=lambda item: -item[1])[:5]:
+            print(f"  ! {count} x {error}")
+
+
+if __name__ == "__main__":
+    main()
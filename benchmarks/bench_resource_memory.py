@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Bytes per memory resource, measured with tracemalloc.
+
+Two numbers per run:
+
+- objects: N MemoryResource instances held in a list (the resource itself:
+  instance, URI, content, metadata and timestamp)
+- registered: N memories added to a ResourceRegistry, i.e. the objects plus
+  every registry index (sorted filter lists, insertion order, BM25 and TF-IDF)
+
+Memories are spread over 1,000 patients and 5 categories, with 12-word texts.
+
+    python benchmarks/bench_resource_memory.py --objects 1000000 --registered 200000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+
+from mcp_server.resources import MemoryResource, ResourceRegistry
+
+WORDS = ("knee hip shoulder pain swelling balance gait fall risk sleep dose exercise walking improved "
+         "stiffness range motion therapy session score quality fatigue mood appetite").split()
+CATEGORIES = ["observation", "plan", "clinical_insight", "medication", "follow_up"]
+
+
+def make_memories(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        # Ids and categories arrive as fresh strings, as they would from JSON tool arguments
+        yield MemoryResource({"content": " ".join(rng.choices(WORDS, k=12)), "category": "".join(category)},
+                             f"patient-{rng.randrange(1000)}")
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per resource")
+    parser.add_argument("--objects", type=int, default=1_000_000)
+    parser.add_argument("--registered", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'':<12} {'count':>10} {'MB':>9} {'bytes/each':>11} {'seconds':>8}")
+    if args.objects:
+        kept, size, elapsed = measure(lambda: list(make_memories(args.objects)))
+        uris = len({resource.uri for resource in kept})
+        print(f"{'objects':<12} {args.objects:>10,} {size / 1e6:>9.1f} {size / args.objects:>11.0f} {elapsed:>8.1f}"
+              f"   ({args.objects - uris} URI collisions)")
+        del kept
+    if args.registered:
+        def build():
+            registry = ResourceRegistry()
+            for resource in make_memories(args.registered, seed=1):
+                registry.add_resource(resource)
+            return registry
+        registry, size, elapsed = measure(build)
+        print(f"{'registered':<12} {args.registered:>10,} {size / 1e6:>9.1f} {size / args.registered:>11.0f} "
+              f"{elapsed:>8.1f}   ({len(registry.resources):,} kept)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""Benchmark sustained ingest rate of the MoveMend append-only session log.
+
+Runs writer threads against a SessionLog in a temporary directory (the real
+patient records are never touched) and reports appends/sec, fsync batching and
+compaction cost.
+
+    python benchmarks/bench_session_ingest.py --seconds 10 --threads 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "Database Simulation", "Database Simulator"))
+
+from movemend_record_database.session_log import SessionLog
+
+
+def make_session(i):
+    return {
+        "gameId": random.choice(["rowing", "boxing", "gardening", "soccer"]),
+        "date": f"2025-01-01T00:00:{i % 60:02d}.000000+00:00Z",
+        "score": random.randint(5, 25),
+        "duration_minutes": random.randint(1, 10),
+        "quality": random.randint(30, 95),
+        "notes": ""
+    }
+
+
+def run(seconds, threads, patients, batch, durable):
+    with tempfile.TemporaryDirectory() as tmp:
+        records_dir = os.path.join(tmp, "records")
+        os.makedirs(records_dir)
+        log = SessionLog(records_dir, os.path.join(tmp, "log"), compact_interval=3600, compact_threshold=10 ** 9)
+        patient_ids = [f"patient-{i}" for i in range(patients)]
+        stop = threading.Event()
+        counts = [0] * threads
+
+        def writer(n):
+            i = 0
+            while not stop.is_set():
+                sessions = [make_session(i + k) for k in range(batch)]
+                log.append_many(random.choice(patient_ids), sessions, durable=durable)
+                i += batch
+            counts[n] = i
+
+        workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        time.sleep(seconds)
+        stop.set()
+        for w in workers:
+            w.join()
+        log.flush()
+        elapsed = time.perf_counter() - start
+        total = sum(counts)
+
+        print(f"threads={threads} batch={batch} durable={durable} patients={patients}")
+        print(f"  appended:   {total} sessions in {elapsed:.2f}s -> {total / elapsed:,.0f} sessions/s")
+        print(f"  fsyncs:     {log.stats['fsyncs']} ({total / max(log.stats['fsyncs'], 1):,.0f} sessions per fsync)")
+
+        read_start = time.perf_counter()
+        visible = sum(len(log.read_record(pid, log.stored_record)["sessions"]) for pid in patient_ids)
+        print(f"  read-back:  {visible} sessions visible before compaction in {time.perf_counter() - read_start:.3f}s")
+
+        compact_start = time.perf_counter()
+        rewritten = log.compact()
+        print(f"  compaction: {rewritten} records rewritten in {time.perf_counter() - compact_start:.2f}s")
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MoveMend session ingest benchmark")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1, help="Sessions per append call")
+    parser.add_argument("--durable", action="store_true", help="Wait for fsync on every append")
+    args = parser.parse_args()
+    run(args.seconds, args.threads, args.patients, args.batch, args.durable)
+
+
+if __name__ == "__main__":
+    main()
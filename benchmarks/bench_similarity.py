@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Query latency of the TF-IDF similarity index (and BM25 search) at 100k memories.
+
+Memories are sentences taken from the Synthea clinical notes, so the
+vocabulary and term frequencies look like real notes. Runs in-process with
+memory persistence off; no simulator needs to be running.
+
+    python benchmarks/bench_similarity.py --memories 100000 --queries 200
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+sys.path.append(project_dir)
+synthea_dir = os.path.join(project_dir, "Database Simulation", "Database Simulator",
+                           "medical_record_database", "synthea_sample_data_fhir_latest")
+
+from mcp_server.app import MCPServer
+
+
+def note_sentences(limit):
+    sentences = []
+    for path in sorted(glob.glob(os.path.join(synthea_dir, "*.json"))):
+        with open(path) as f:
+            bundle = json.load(f)
+        for entry in bundle.get("entry", []):
+            resource = entry["resource"]
+            if resource["resourceType"] != "DocumentReference":
+                continue
+            text = base64.b64decode(resource["content"][0]["attachment"]["data"]).decode("utf-8", "replace")
+            sentences.extend(s.strip() for s in re.split(r"[.\n#]+", text) if len(s.split()) >= 4)
+        if len(sentences) >= limit:
+            break
+    return sentences
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.95)] * 1000)
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similarity search benchmark")
+    parser.add_argument("--memories", type=int, default=100000)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    sentences = note_sentences(20000)
+    print(f"{len(sentences)} distinct note sentences")
+
+    server = MCPServer(memory_db="")
+    start = time.perf_counter()
+    for i in range(args.memories):
+        server.create_memory(random.choice(sentences), random.choice(["observation", "clinical_insight"]),
+                             f"patient-{i % args.patients}")
+    build = time.perf_counter() - start
+    index = server.registry.similarity_index
+    print(f"{args.memories} memories created in {build:.1f}s ({build / args.memories * 1e6:.0f} us each, "
+          f"all indexes); {len(index._vocabulary)} terms, {index._nnz} nonzeros\n")
+
+    queries = [" ".join(random.sample(random.choice(sentences).split(), 4)) for _ in range(args.queries)]
+    patient_queries = [(q, f"patient-{random.randrange(args.patients)}") for q in queries]
+
+    rows = [
+        ("tfidf index only", timed(lambda q: index.search(q, 5), queries)),
+        ("find_similar", timed(lambda q: server.find_similar(q, limit=5), queries)),
+        ("find_similar patient", timed(lambda qp: server.find_similar(qp[0], qp[1], limit=5), patient_queries)),
+        ("search_memories", timed(lambda q: server.search_memories(q, limit=5), queries)),
+        ("search_memories patient", timed(lambda qp: server.search_memories(qp[0], qp[1], limit=5), patient_queries)),
+    ]
+    print(f"{'query':<25} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, (p50, p95) in rows:
+        print(f"{name:<25} {p50:>8.2f} {p95:>8.2f}")
+
+    uris = [r.uri for r in server.registry.query("memory", limit=args.memories // 10)]
+    start = time.perf_counter()
+    for uri in uris:
+        server.delete_memory(uri)
+    print(f"\ndeleted {len(uris)} memories in {time.perf_counter() - start:.2f}s; "
+          f"tfidf p50/p95 after deletes: {'%.2f / %.2f ms' % timed(lambda q: index.search(q, 5), queries)}")
+
+
+if __name__ == "__main__":
+    main()
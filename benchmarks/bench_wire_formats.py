@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Compare JSON and msgpack encode time, decode time and wire size on real Synthea bundles.
+
+Uses the same payload shape as /random_patient_list ({"id", "data"} per patient),
+so no simulator needs to be running.
+
+    python benchmarks/bench_wire_formats.py --patients 10 --repeat 5
+"""
+
+import argparse
+import gc
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+synthea_dir = os.path.join(os.path.dirname(current_dir), "Database Simulation", "Database Simulator",
+                           "medical_record_database", "synthea_sample_data_fhir_latest")
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_payload(count):
+    payload = []
+    for path in sorted(glob.glob(os.path.join(synthea_dir, "*.json"))):
+        with open(path) as f:
+            data = json.load(f)
+        if data["entry"][0]["resource"]["resourceType"] != "Patient":
+            continue
+        payload.append({"id": data["entry"][0]["resource"]["id"], "data": data})
+        if len(payload) == count:
+            break
+    return payload
+
+
+def measure(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        # Keep the cyclic GC from charging collection pauses to whichever codec allocates last
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wire format benchmark on Synthea bundles")
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = load_payload(args.patients)
+    print(f"{len(payload)} patient bundles, best of {args.repeat}\n")
+
+    codecs = [("json (stdlib)", lambda o: json.dumps(o).encode("utf-8"), json.loads)]
+    if orjson is not None:
+        codecs.append(("json (orjson)", orjson.dumps, orjson.loads))
+    if msgpack is not None:
+        codecs.append(("msgpack", lambda o: msgpack.packb(o, use_bin_type=True), lambda b: msgpack.unpackb(b, raw=False)))
+    else:
+        print("msgpack is not installed; pip install msgpack to include it\n")
+
+    print(f"{'format':<15} {'encode ms':>10} {'decode ms':>10} {'size MB':>9} {'gzip MB':>9}")
+    for name, encode, decode in codecs:
+        encode_time, encoded = measure(encode, payload, args.repeat)
+        decode_time, decoded = measure(decode, encoded, args.repeat)
+        assert decoded == payload
+        gzipped = len(gzip.compress(encoded, 6))
+        print(f"{name:<15} {encode_time * 1000:>10.1f} {decode_time * 1000:>10.1f} "
+              f"{len(encoded) / 1e6:>9.2f} {gzipped / 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ sys.path.append(database_sim_path)
 
 # Import database client functions with error handling for Streamlit Cloud
 try:
-    from client_medicaldataretrieval import get_random_patient_data, get_movemend_data
+    from client_medicaldataretrieval import get_random_patient_data, get_movemend_data, fetch_linked_patients
 except ImportError:
     # Define fallback functions for Streamlit Cloud where database servers might not be available
     def get_random_patient_data(count=15):
@@ -32,6 +32,13 @@ except ImportError:
         return MockResponse({"patient_id": patient_id, "exercises": ["Walking", "Stretching"], 
                            "adherence": "Good", "progress": "Improving"})
     
+    def fetch_linked_patients(count=15, return_exceptions=False):
+        # Mock patients with their mock MoveMend data attached
+        records = get_random_patient_data(count).json()
+        for record in records:
+            record["movemend_data"] = get_movemend_data(record["id"]).json()
+        return records
+    
     # Mock response class
     class MockResponse:
         def __init__(self, data):
@@ -222,7 +229,7 @@ Patient reports {random.choice(['improving symptoms', 'stable condition', 'mild
                 # Initialize MCP server if not already initialized
                 from mcp_server.app import mcp_server
                 if not mcp_server.initialized:
-                    mcp_server.initialize()
+                    mcp_server.initialize(wait_for=1, timeout=30)
                 
                 # Use Claude MCP client to generate summary
                 return claude_mcp_client.generate_clinical_summary_with_mcp(patient_uri)
@@ -1477,6 +1484,21 @@ def display_billing() -> None:
     with st.expander("Billing / RTM"):
         st.write("$1,150, $704")
 
+def display_mcp_metrics() -> None:
+    """Display per-operation MCP timings, payload sizes and error counts for this process."""
+    try:
+        from mcp_server.metrics import metrics
+    except ImportError:
+        return
+    with st.expander("MCP Tool Metrics"):
+        rows = metrics.snapshot()
+        if not rows:
+            st.write("No MCP calls recorded yet.")
+            return
+        for row in rows:
+            row["error_types"] = ", ".join(f"{name}: {count}" for name, count in row["error_types"].items())
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
 def display_clinical_summary(patient: Dict):
     """Display AI-generated clinical summary from Claude."""
     # In Summary view, the header is added separately as part of the breadcrumb content
@@ -1766,28 +1788,17 @@ def load_patients_from_database():
     # Attempt to get random patients from the database
     st.info("Connecting to Database Simulation...")
     try:
-        # Get 15 random patients from the database
-        response = get_random_patient_data(15)
-        patients_data = response.json()
+        # Get 15 random patients; their MoveMend data is fetched concurrently
+        patients_data = fetch_linked_patients(15, return_exceptions=True)
         st.success("Connected to Database Simulation successfully!")
         
-        # Process each patient and add movemend data
+        # Process each patient
         processed_patients = []
         for patient_record in patients_data:
             try:
-                # Get additional Movemend data for this patient
-                try:
-                    # Try to get MoveMend data from the database
-                    movemend_response = get_movemend_data(patient_record["id"])
-                    
-                    # If we got a valid response, use it
-                    if hasattr(movemend_response, 'json'):
-                        movemend_data = movemend_response.json()
-                    else:
-                        # If no valid MoveMend data found, generate unique data for this patient
-                        movemend_data = generate_unique_movemend_data(patient_record["id"])
-                except:
-                    # In case of any error, generate unique data
+                movemend_data = patient_record.get("movemend_data")
+                if not movemend_data:
+                    # If no valid MoveMend data found, generate unique data for this patient
                     movemend_data = generate_unique_movemend_data(patient_record["id"])
                 
                 # Format patient data to match our app's expectations
@@ -2326,5 +2337,7 @@ def main():
         display_billing()
         display_exercise_adherence(selected_patient)
 
+    display_mcp_metrics()
+
 if __name__ == "__main__":
     main()
@@ -18,6 +18,8 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from mcp_server.app import mcp_server
+from mcp_server.metrics import instrument
+from mcp_server.tools import TOOL_DEFINITIONS, ToolError, call_tool_json
 from llm.config import CLAUDE_API_KEY, CLAUDE_MODEL
 
 class ClaudeMCPClient:
@@ -33,257 +35,45 @@ class ClaudeMCPClient:
     
     def _create_mcp_tools(self) -> List[Dict[str, Any]]:
         """Create MCP tools for Claude."""
-        return [
-            {
-                "name": "list_resources",
-                "description": "Lists the available resources from the MCP server.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "resource_type": {
-                            "type": "string",
-                            "description": "Optional type of resource to filter by (e.g., 'patient', 'memory')."
-                        },
-                        "cursor": {
-                            "type": "string",
-                            "description": "Pagination cursor for getting the next page of results."
-                        }
-                    },
-                    "required": []
-                }
-            },
-            {
-                "name": "read_resource",
-                "description": "Reads the content of a specific resource by URI.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "uri": {
-                            "type": "string",
-                            "description": "URI of the resource to read."
-                        }
-                    },
-                    "required": ["uri"]
-                }
-            },
-            {
-                "name": "generate_voice",
-                "description": "Generates speech audio from text using Hume AI voice synthesis.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "text": {
-                            "type": "string",
-                            "description": "The text to convert to speech."
-                        },
-                        "voice_id": {
-                            "type": "string",
-                            "description": "Optional voice ID to use (default: samantha)."
-                        }
-                    },
-                    "required": ["text"]
-                }
-            },
-            {
-                "name": "create_memory",
-                "description": "Creates a new memory entry in the MCP server.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "content": {
-                            "type": "string",
-                            "description": "The content of the memory to store."
-                        },
-                        "category": {
-                            "type": "string",
-                            "description": "Category of the memory (e.g., 'clinical_insight', 'patient_preference', 'observation')."
-                        },
-                        "patient_id": {
-                            "type": "string",
-                            "description": "Optional patient ID to associate this memory with."
-                        }
-                    },
-                    "required": ["content", "category"]
-                }
-            },
-            {
-                "name": "get_memories",
-                "description": "Retrieves memories from the MCP server with optional filters.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "patient_id": {
-                            "type": "string",
-                            "description": "Optional patient ID to filter memories by."
-                        },
-                        "category": {
-                            "type": "string",
-                            "description": "Optional category to filter memories by."
-                        }
-                    },
-                    "required": []
-                }
-            },
-            {
-                "name": "delete_memory",
-                "description": "Deletes a memory from the MCP server by URI.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "memory_uri": {
-                            "type": "string",
-                            "description": "URI of the memory to delete."
-                        }
-                    },
-                    "required": ["memory_uri"]
-                }
-            }
-        ]
+        return [dict(tool) for tool in TOOL_DEFINITIONS]
     
+    @instrument("claude", measure_payload=False)
     def _handle_tool_calls(self, tool_calls) -> List[Dict]:
         """Handle tool calls from Claude."""
         # Make sure MCP server is initialized
         from mcp_server.app import mcp_server
         if not mcp_server.initialized:
-            mcp_server.initialize()
+            # Patients register as they load; don't hold the request for all of them
+            mcp_server.initialize(wait_for=1, timeout=30)
             
         tool_results = []
         
         for tool_call in tool_calls:
-            tool_name = tool_call.get("name")
-            tool_args = tool_call.get("input", {})
-            
-            if tool_name == "list_resources":
-                result = self._handle_list_resources(tool_args)
-            elif tool_name == "read_resource":
-                result = self._handle_read_resource(tool_args)
-            elif tool_name == "create_memory":
-                result = self._handle_create_memory(tool_args)
-            elif tool_name == "get_memories":
-                result = self._handle_get_memories(tool_args)
-            elif tool_name == "delete_memory":
-                result = self._handle_delete_memory(tool_args)
-            elif tool_name == "generate_voice":
-                result = self._handle_generate_voice(tool_args)
-            else:
-                result = {"error": f"Unknown tool: {tool_name}"}
-                
+            result = self._handle_tool_call(tool_call.get("name"), tool_call.get("input") or {})
             tool_results.append({
                 "tool_call_id": tool_call.get("id"),
-                "output": json.dumps(result)
+                # Tool results are already JSON bytes (read_resource's cached encoding for whole records)
+                "output": result.decode("utf-8") if isinstance(result, bytes) else json.dumps(result)
             })
             
         return tool_results
     
-    def _handle_mcp_tool_call(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle an MCP tool call from Claude."""
+    @instrument("claude")
+    def _handle_mcp_tool_call(self, tool_call: Dict[str, Any]) -> Union[bytes, Dict[str, Any]]:
+        """Handle an MCP tool call from Claude: the result as JSON bytes, or {"error": ...}."""
+        # Initialize MCP server if not already initialized
+        if not mcp_server.initialized:
+            mcp_server.initialize(wait_for=1, timeout=30)
+        return self._handle_tool_call(tool_call.get("name"), tool_call.get("parameters") or {})
+    
+    @instrument("claude")
+    def _handle_tool_call(self, tool_name: str, tool_args: Dict[str, Any]) -> Union[bytes, Dict[str, Any]]:
+        """Run one tool through the shared dispatcher; unknown tools and bad arguments come back as {"error": ...}."""
         try:
-            tool_name = tool_call.get("name")
-            tool_params = tool_call.get("parameters", {})
-            
-            # Initialize MCP server if not already initialized
-            if not mcp_server.initialized:
-                mcp_server.initialize()
-            
-            if tool_name == "list_resources":
-                resource_type = tool_params.get("resource_type")
-                cursor = tool_params.get("cursor")
-                resources, next_cursor = mcp_server.list_resources(resource_type, cursor)
-                return {
-                    "resources": resources,
-                    "next_cursor": next_cursor
-                }
-            elif tool_name == "read_resource":
-                uri = tool_params.get("uri")
-                if not uri:
-                    return {"error": "URI is required"}
-                resource = mcp_server.read_resource(uri)
-                if not resource:
-                    return {"error": f"Resource not found: {uri}"}
-                return resource
-            elif tool_name == "create_memory":
-                content = tool_params.get("content")
-                category = tool_params.get("category")
-                patient_id = tool_params.get("patient_id")
-                memory = mcp_server.create_memory(content, category, patient_id)
-                return memory
-            elif tool_name == "get_memories":
-                patient_id = tool_params.get("patient_id")
-                category = tool_params.get("category")
-                memories = mcp_server.get_memories(patient_id, category)
-                return memories
-            elif tool_name == "delete_memory":
-                memory_uri = tool_params.get("memory_uri")
-                if not memory_uri:
-                    return {"error": "Memory URI is required"}
-                result = mcp_server.delete_memory(memory_uri)
-                return result
-            elif tool_name == "generate_voice":
-                text = tool_params.get("text")
-                voice_id = tool_params.get("voice_id", "samantha")
-                if not text:
-                    return {"error": "Missing required 'text' parameter"}
-                result = mcp_server.generate_voice(text, voice_id)
-                return {"content": [{"type": "text", "text": json.dumps(result, indent=2)}]}
-            else:
-                return {"error": f"Unknown tool: {tool_name}"}
-        except Exception as e:
+            return call_tool_json(mcp_server, tool_name, tool_args)
+        except ToolError as e:
             return {"error": str(e)}
     
-    def _handle_list_resources(self, tool_args):
-        resource_type = tool_args.get("resource_type")
-        cursor = tool_args.get("cursor")
-        resources, next_cursor = mcp_server.list_resources(resource_type, cursor)
-        return {
-            "resources": resources,
-            "next_cursor": next_cursor
-        }
-    
-    def _handle_read_resource(self, tool_args):
-        uri = tool_args.get("uri")
-        if not uri:
-            return {"error": "URI is required"}
-        resource = mcp_server.read_resource(uri)
-        if not resource:
-            return {"error": f"Resource not found: {uri}"}
-        return resource
-    
-    def _handle_create_memory(self, tool_args):
-        content = tool_args.get("content")
-        category = tool_args.get("category")
-        patient_id = tool_args.get("patient_id")
-        memory = mcp_server.create_memory(content, category, patient_id)
-        return memory
-    
-    def _handle_get_memories(self, tool_args):
-        patient_id = tool_args.get("patient_id")
-        category = tool_args.get("category")
-        memories = mcp_server.get_memories(patient_id, category)
-        return memories
-    
-    def _handle_delete_memory(self, tool_args):
-        """Handle the delete_memory tool call."""
-        memory_uri = tool_args.get("memory_uri")
-        if memory_uri:
-            result = mcp_server.delete_memory(memory_uri)
-            return {"content": [{"type": "text", "text": json.dumps({"success": result})}]}
-            
-        return {"content": [{"type": "text", "text": "Error: Missing memory_uri parameter"}]}
-        
-    def _handle_generate_voice(self, tool_args):
-        """Handle the generate_voice tool call."""
-        text = tool_args.get("text")
-        voice_id = tool_args.get("voice_id", "samantha")
-        
-        if not text:
-            return {"content": [{"type": "text", "text": "Error: Missing required 'text' parameter"}]}
-            
-        # Generate voice using MCP server
-        result = mcp_server.generate_voice(text, voice_id)
-        
-        # Return the result as a pretty-printed JSON string
-        return {"content": [{"type": "text", "text": json.dumps(result, indent=2)}]}
-    
     def chat_with_mcp(self, messages: List[Dict[str, str]], 
                      system_prompt: Optional[str] = None,
                      temperature: float = 0.7,
@@ -353,8 +143,10 @@ Explain what information you need, and I'll provide it in a follow-up message.
             system_prompt = """You are a clinical assistant helping physical therapists review patient data.
 You have access to patient data through MCP. Follow these steps:
 1. List available patient resources using the list_resources tool with resource_type="patient"
-2. If a specific patient URI is provided, read that resource
+2. If a specific patient URI is provided, read that patient's data
 3. If no URI is provided, choose a patient and read their data
+   Read the sub-resources you need (conditions, vitals, observations, movemend/sessions)
+   using the resource_templates from list_resources rather than the whole record
 4. Generate a concise clinical summary with these sections:
    - Patient Overview: demographics and conditions
    - Recent Vitals: latest measurements and trends
@@ -396,7 +188,8 @@ Be brief but thorough, focusing on clinically relevant information."""
             system_prompt = """You are an expert clinical assistant helping physical therapists.
 You have access to patient data through MCP tools. When answering clinical questions:
 1. First, determine if you need patient data to answer the question
-2. If needed, list patient resources and read the relevant patient data
+2. If needed, list patient resources and read the relevant patient data, using the
+   sub-resource templates (e.g. patient:{id}/observations?code=...) to fetch only what you need
 3. Base your answer on the patient's specific information and clinical best practices
 4. Be clear, concise, and clinically precise in your response
 5. When appropriate, provide evidence-based recommendations
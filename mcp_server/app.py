@@ -6,13 +6,26 @@ import datetime
 from typing import Dict, List, Any, Optional, Tuple
 import json
 import asyncio
+import base64
+import threading
+import time
+from functools import partial
+from urllib.parse import parse_qsl, urlsplit
 
 # Add Database Simulation directory to path
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Database Simulation'))
-from client_medicaldataretrieval import get_random_patient_data, get_movemend_data
+from client_medicaldataretrieval import AsyncSimulatorClient, SimulatorError, get_client, run_sync
+from response_cache import default_cache
 
 # Import MCP resources
-from .resources import Resource, PatientResource, MemoryResource, VoiceResource, ResourceRegistry
+from .resources import Resource, PatientResource, MemoryResource, VoiceResource, ResourceRegistry, ContentCache, MemoryStore
+from .resources import RESOURCE_TEMPLATES
+from .resources.patient_views import resolve as resolve_patient_view
+from .resources.base import epoch_us, iso_timestamp
+from .resources.content_cache import json_bytes
+from .metrics import instrument
+from .subscriptions import SubscriptionHub
+from .retention import RetentionSweeper, build_digest, digest_uri, is_digest, parse_policies
 
 # Voice client import removed
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -20,72 +33,299 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 class MCPServer:
     """MCP server implementation that works with Streamlit."""
     
-    def __init__(self):
+    def __init__(self, page_size: int = int(os.getenv("MCP_PAGE_SIZE", "10")),
+                 content_budget_mb: float = float(os.getenv("MCP_CONTENT_BUDGET_MB", "256")),
+                 init_retries: int = 3,
+                 memory_db: Optional[str] = os.getenv("MCP_MEMORY_DB"),
+                 retention: Optional[str] = os.getenv("MCP_RETENTION")):
         self.registry = ResourceRegistry()
         self.server_name = "movemend-mcp-server"
-        self.initialized = False
+        self.page_size = page_size
+        # Patient bundles are loaded on first read and evicted least recently used beyond this budget
+        self.content_cache = ContentCache(int(content_budget_mb * 1024 * 1024))
+        
+        # Background initialization: state is idle -> loading -> ready | failed
+        self.init_retries = init_retries
+        self.init_state = "idle"
+        self.init_errors: Dict[str, str] = {}
+        self._init_thread: Optional[threading.Thread] = None
+        self._init_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._patients_registered = 0
+        
+        # With MCP_MEMORY_DB, memories persist in a SQLite file shared by every process using it;
+        # without one they live in this process only
+        self.memory_store = MemoryStore(memory_db) if memory_db else None
+        self._memory_seq = 0
+        self._memory_sync_lock = threading.Lock()
+        
+        # Decoded DocumentReference notes in the similarity index, by URI; indexed per patient on demand
+        self.clinical_notes: Dict[str, Dict[str, Any]] = {}
+        self._notes_indexed = set()
+        self._notes_lock = threading.Lock()
+        if self.memory_store is not None:
+            records, self._memory_seq = self.memory_store.load()
+            for record in records:
+                self.registry.add_resource(_restore_memory(record))
+        
+        # Change notifications for subscribers (MCP clients, dashboards), coalesced per subscriber
+        self.subscriptions = SubscriptionHub(min_interval=float(os.getenv("MCP_NOTIFY_INTERVAL", "0.5")))
+        self.registry.add_listener(self.subscriptions.resource_changed)
+        
+        # Retention policies by category (empty: keep every memory), applied by a background sweeper
+        self.retention_policies = parse_policies(retention)
+        self.retention = RetentionSweeper(self, float(os.getenv("MCP_RETENTION_INTERVAL", "300")))
+        if self.retention_policies:
+            self.retention.start()
     
-    def initialize(self):
-        """Initialize the MCP server with data from the simulated databases."""
-        if self.initialized:
-            return
+    @property
+    def initialized(self) -> bool:
+        return self.init_state == "ready"
+    
+    @instrument("server")
+    def initialize(self, patient_count: int = int(os.getenv("MCP_PATIENT_COUNT", "10")),
+                   wait_for: Optional[int] = int(os.getenv("MCP_INIT_WAIT_FOR", "1")),
+                   timeout: Optional[float] = None) -> bool:
+        """Start loading patients from the simulated databases in the background.
+        
+        Patients are registered as they arrive, with metadata only; their full
+        record is loaded by ``read_resource`` and may be evicted again under
+        the content budget. Patients that fail to load are retried on their
+        own, with backoff, instead of failing the whole load.
+        
+        Waits only until ``wait_for`` patients are registered (one by default,
+        ``MCP_INIT_WAIT_FOR``), or until loading ends if sooner, for at most
+        ``timeout`` seconds; ``wait_for=0`` returns immediately and
+        ``wait_for=None`` waits for the whole panel. Returns whether loading
+        has finished successfully, so it is usually False right after the
+        first patients arrive. Calling it again after a failed load retries.
+        """
+        with self._init_lock:
+            if self.init_state in ("idle", "failed"):
+                self.init_state = "loading"
+                self.init_errors = {}
+                self._init_thread = threading.Thread(target=self._load_patients, args=(patient_count,),
+                                                     name="mcp-initialize", daemon=True)
+                self._init_thread.start()
         
-        # Get random patients from the medical records database
+        with self._progress:
+            self._progress.wait_for(
+                lambda: self.init_state != "loading" or (wait_for is not None and self._patients_registered >= wait_for),
+                timeout)
+        return self.initialized
+    
+    def initialization_status(self) -> Dict[str, Any]:
+        return {"state": self.init_state, "patients": self._patients_registered, "errors": dict(self.init_errors)}
+    
+    def _load_patients(self, patient_count: int) -> None:
+        """Loader thread: one batch for a random pick, then retries for the patients that failed."""
+        pending: Optional[List[str]] = None
+        for attempt in range(self.init_retries + 1 if patient_count > 0 else 0):
+            if attempt:
+                time.sleep(min(0.5 * 2 ** attempt, 10.0))
+            try:
+                pending = self._load_batch(patient_count, pending)
+            except Exception as e:
+                # Nothing came back (e.g. simulators down); retry the same batch
+                print(f"Error initializing MCP server (attempt {attempt + 1}): {e}")
+                continue
+            if not pending:
+                break
+            print(f"Retrying {len(pending)} patients that failed to load")
+        
+        with self._progress:
+            self.init_state = "ready" if self._patients_registered or patient_count <= 0 else "failed"
+            self._progress.notify_all()
+    
+    def _load_batch(self, patient_count: int, patient_ids: Optional[List[str]]) -> List[str]:
+        """Register a batch as records arrive. Returns the ids that need another attempt."""
+        failed: List[str] = []
+        seen = set()
         try:
-            records = get_random_patient_data(10)
-            records_json = records.json()
+            # Metadata only: the gateway trims each bundle to its Patient and Condition entries
+            for record in get_client().stream_linked_patients(patient_count, patient_ids=patient_ids,
+                                                              resource_types=["Patient", "Condition"],
+                                                              sessions_limit=0, retries=0):
+                seen.add(record["id"])
+                self._register_patient(record, failed, preloaded=False)
+        except SimulatorError as e:
+            if e.status_code is not None:
+                raise
+            # No gateway: join client-side (full records, still registered as they arrive)
+            remaining = [pid for pid in patient_ids if pid not in seen] if patient_ids else None
+            run_sync(self._load_batch_direct(patient_count - len(seen), remaining, failed))
+        return failed
+    
+    async def _load_batch_direct(self, patient_count: int, patient_ids: Optional[List[str]], failed: List[str]) -> None:
+        async with AsyncSimulatorClient(cache=default_cache(), gateway_url=None) as client:
+            if patient_ids is None:
+                patient_ids = await client.random_patient_ids(patient_count) if patient_count > 0 else []
+            semaphore = asyncio.Semaphore(client.max_concurrency)
             
-            # Add each patient as a resource
-            for record in records_json:
-                # Get MoveMend data for this patient
-                record["movemend_data"] = get_movemend_data(record["id"]).json()
-                
-                # Create metadata for easier discovery
-                metadata = {
-                    "name": record.get("name", "Unknown"),
-                    "gender": record.get("gender", "Unknown"),
-                    "age": record.get("age", 0),
-                    "conditions_count": len(record.get("conditions", [])),
-                    "has_movemend_data": "movemend_data" in record and bool(record["movemend_data"])
-                }
-                
-                # Create and register the patient resource
-                patient_resource = PatientResource(record, metadata)
-                self.registry.add_resource(patient_resource)
+            async def join(patient_id):
+                async with semaphore:
+                    try:
+                        record = await client.patient(patient_id)
+                    except SimulatorError as e:
+                        return {"id": patient_id, "data": None, "medical_error": str(e)}
+                    try:
+                        record["movemend_data"] = await client.movemend_dossier(patient_id)
+                    except SimulatorError as e:
+                        record["movemend_data"] = None
+                        record["movemend_error"] = str(e)
+                    return record
             
-            self.initialized = True
-            return True
-        except Exception as e:
-            print(f"Error initializing MCP server: {e}")
-            return False
+            for next_done in asyncio.as_completed([join(pid) for pid in patient_ids]):
+                self._register_patient(await next_done, failed, preloaded=True)
     
-    def list_resources(self, resource_type: Optional[str] = None, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-        """List resources, optionally filtered by type."""
-        resources = self.registry.list_resources(resource_type)
-        
-        # Simple pagination (not really needed for our small dataset)
-        if cursor:
-            try:
-                start_idx = int(cursor)
-                page_size = 10
-                end_idx = start_idx + page_size
-                result_page = resources[start_idx:end_idx]
-                next_cursor = str(end_idx) if end_idx < len(resources) else None
-                return result_page, next_cursor
-            except ValueError:
-                # Invalid cursor, return first page
-                return resources[:10], "10" if len(resources) > 10 else None
+    def _register_patient(self, record: Dict[str, Any], failed: List[str], preloaded: bool) -> None:
+        error = record.get("medical_error") or record.get("movemend_error")
+        if error:
+            failed.append(record["id"])
+            self.init_errors[record["id"]] = error
         else:
-            # No cursor, return first page
-            return resources[:10], "10" if len(resources) > 10 else None
+            self.init_errors.pop(record["id"], None)
+        # Without a bundle there is nothing to list; without a dossier the patient is still useful
+        if record.get("medical_error"):
+            return
+        
+        # Re-registering (after a retry) replaces the earlier resource
+        is_new = self.registry.get_resource(f"patient:{record['id']}") is None
+        patient_resource = PatientResource(record if preloaded else None, _patient_metadata(record),
+                                           patient_id=record["id"], loader=partial(_load_patient, record["id"]),
+                                           cache=self.content_cache)
+        self.registry.add_resource(patient_resource)
+        with self._progress:
+            self._patients_registered += is_new
+            self._progress.notify_all()
     
+    def sync_memories(self) -> None:
+        """Apply memories created or deleted by other processes since the last sync."""
+        if self.memory_store is None:
+            return
+        with self._memory_sync_lock:
+            records, self._memory_seq = self.memory_store.changes(self._memory_seq)
+            if records is None:
+                # Deletes we haven't seen were purged: reload, and drop memories no longer in the store
+                records, self._memory_seq = self.memory_store.load()
+                live = {record["uri"] for record in records}
+                for resource in self.registry.query("memory", newest_first=False):
+                    if resource.uri not in live and not self.memory_store.has_pending(resource.uri):
+                        self.registry.remove_resource(resource.uri)
+            for record in records:
+                existing = self.registry.get_resource(record["uri"])
+                if record["deleted"]:
+                    if existing is not None and existing.resource_type == "memory":
+                        self.registry.remove_resource(record["uri"])
+                elif existing is None or (existing.content, existing.stored_metadata()) != (record["content"], record["metadata"]):
+                    # Our own writes come back unchanged and are skipped
+                    self.registry.add_resource(_restore_memory(record))
+    
+    def add_subscriber(self, callback, uris: Optional[List[str]] = None, list_changed: bool = True,
+                       min_interval: Optional[float] = None) -> int:
+        """Register ``callback(notifications)`` for resource changes; returns the subscriber id.
+        
+        ``callback`` receives lists of MCP ``notifications/resources/updated``
+        and ``notifications/resources/list_changed`` messages, at most once per
+        ``min_interval`` seconds, on the hub's delivery thread. Memories written
+        by other processes are reported once this process syncs them.
+        """
+        subscriber_id = self.subscriptions.add_subscriber(callback, list_changed, min_interval)
+        for uri in uris or []:
+            self.subscriptions.subscribe(subscriber_id, uri)
+        return subscriber_id
+    
+    def remove_subscriber(self, subscriber_id: int) -> None:
+        self.subscriptions.remove_subscriber(subscriber_id)
+    
+    def subscribe(self, subscriber_id: int, uri: str) -> bool:
+        """Notify the subscriber when ``uri`` changes (``prefix*`` for every URI under a prefix)."""
+        return self.subscriptions.subscribe(subscriber_id, uri)
+    
+    def unsubscribe(self, subscriber_id: int, uri: str) -> bool:
+        return self.subscriptions.unsubscribe(subscriber_id, uri)
+    
+    @instrument("server")
+    def list_resources(self, resource_type: Optional[str] = None, cursor: Optional[str] = None,
+                       page_size: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List resources, optionally filtered by type, one page at a time.
+        
+        Pages follow insertion order. The cursor is opaque: it records the
+        last position returned and the registry's high-water mark when the
+        listing started, so resources added while paging are left out (no
+        duplicates or shifted pages) and deleted ones simply don't appear.
+        An invalid cursor, or one from a different resource_type, restarts
+        at the first page.
+        """
+        if resource_type in (None, "memory"):
+            self.sync_memories()
+        page_size = max(1, page_size or self.page_size)
+        position = _decode_cursor(cursor, resource_type)
+        if position is None:
+            position = (0, self.registry.last_seq)
+        after_seq, high_water = position
+        
+        resources, last_seq, more = self.registry.page(resource_type, after_seq, high_water, page_size)
+        next_cursor = _encode_cursor(resource_type, last_seq, high_water) if more else None
+        return [r.summary() for r in resources], next_cursor
+    
+    def resource_templates(self) -> List[Dict[str, Any]]:
+        """URI templates for patient sub-resources, which read_resource resolves but list_resources doesn't list."""
+        return RESOURCE_TEMPLATES
+    
+    @instrument("server", measure_payload=False)
     def read_resource(self, uri: str) -> Optional[Dict[str, Any]]:
-        """Read a resource by URI."""
+        """Read a resource by URI.
+        
+        Besides registered resources this resolves patient sub-resources such
+        as ``patient:{id}/observations?code=8302-2&limit=5`` (see
+        ``resource_templates``), which return kilobytes instead of the whole
+        record.
+        """
+        if uri.startswith("memory:"):
+            self.sync_memories()
+        if uri.startswith("patient:") and ("/" in uri or "?" in uri):
+            return self._read_patient_view(uri)
         resource = self.registry.get_resource(uri)
         if resource:
             return resource.to_dict()
         return None
         
+    @instrument("server")
+    def read_resource_json(self, uri: str) -> Optional[bytes]:
+        """``read_resource(uri)`` as compact JSON bytes, for tool results and protocol responses.
+        
+        A whole patient record is encoded once and reused until its content
+        changes or is evicted, instead of being rebuilt and re-encoded on
+        every call.
+        """
+        if uri.startswith("memory:"):
+            self.sync_memories()
+        if uri.startswith("patient:") and ("/" in uri or "?" in uri):
+            view = self._read_patient_view(uri)
+            return None if view is None else json_bytes(view)
+        resource = self.registry.get_resource(uri)
+        if resource:
+            return resource.to_json()
+        return None
+    
+    def _read_patient_view(self, uri: str) -> Optional[Dict[str, Any]]:
+        parts = urlsplit(uri)
+        patient_id, _, path = parts.path.partition("/")
+        resource = self.registry.get_resource(f"patient:{patient_id}")
+        if resource is None:
+            return None
+        content = resolve_patient_view(resource.index(), path.strip("/"), dict(parse_qsl(parts.query)))
+        if content is None:
+            return None
+        return {
+            "uri": uri,
+            "content": content,
+            "resource_type": f"patient/{path.split('/')[0]}",
+            "metadata": {"patient_id": patient_id, "name": resource.metadata.get("name")}
+        }
+    
+    @instrument("server")
     def create_memory(self, content: str, category: str, patient_id: Optional[str] = None) -> Dict[str, Any]:
         """Create a new memory resource.
         
@@ -100,18 +340,20 @@ class MCPServer:
         # Create the memory data
         memory_data = {
             "content": content,
-            "category": category,
-            "timestamp": datetime.datetime.now().isoformat()
+            "category": category
         }
         
-        # Create the memory resource
+        # Create the memory resource (it takes a timestamp unique to this process, which its URI includes)
         memory_resource = MemoryResource(memory_data, patient_id)
         
-        # Add it to the registry
+        # Add it to the registry; the store commits it in the background
         self.registry.add_resource(memory_resource)
+        if self.memory_store is not None:
+            self.memory_store.put(memory_resource.uri, memory_resource.content, memory_resource.stored_metadata())
         
         return {"memory_uri": memory_resource.uri, "status": "created"}
     
+    @instrument("server")
     def get_memories(self, patient_id: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get memories, optionally filtered by patient ID and/or category.
         
@@ -122,35 +364,105 @@ class MCPServer:
         Returns:
             List of memory resources matching the criteria
         """
-        # List all memory resources
-        all_resources = self.registry.list_resources("memory")
-        
-        # Filter by criteria if provided
-        filtered_resources = []
-        for resource in all_resources:
-            # Get the full resource to access metadata
-            full_resource = self.registry.get_resource(resource["uri"])
-            if not full_resource:
-                continue
-                
-            metadata = full_resource.get_metadata()
+        # The registry keeps a timestamp-ordered index per (type, patient, category) filter
+        self.sync_memories()
+        return [resource.to_dict() for resource in self.registry.query("memory", patient_id, category)]
+    
+    @instrument("server")
+    def search_memories(self, query: str, patient_id: Optional[str] = None, category: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        limit: int = 5) -> List[Dict[str, Any]]:
+        """Full-text search over memory content, ranked by BM25.
+        
+        Args:
+            query: Free-text query
+            patient_id: Optional patient ID to filter by
+            category: Optional category to filter by
+            since: Optional ISO timestamp; only memories created at or after it
+            until: Optional ISO timestamp; only memories created at or before it
+            limit: Maximum number of memories to return (best first)
             
-            # Check if patient ID matches (if provided)
-            if patient_id and metadata.get("patient_id") != patient_id:
-                continue
-                
-            # Check if category matches (if provided)
-            if category and full_resource.get_content().get("category") != category:
-                continue
-                
-            # All filters passed, add to result
-            filtered_resources.append(full_resource.to_dict())
+        Returns:
+            List of memory resources, each with its relevance score
+            
+        Raises:
+            ValueError: if since or until isn't an ISO timestamp
+        """
+        self.sync_memories()
+        matches = self.registry.search(query, "memory", patient_id, category, epoch_us(since) if since else None,
+                                       epoch_us(until) if until else None, max(1, limit))
+        return [dict(resource.to_dict(), score=round(score, 4)) for resource, score in matches]
+    
+    @instrument("server")
+    def find_similar(self, text: str, patient_id: Optional[str] = None, include_notes: bool = False,
+                     limit: int = 5) -> List[Dict[str, Any]]:
+        """Memories (and optionally clinical notes) most similar to ``text``, by TF-IDF cosine similarity.
         
-        # Sort by timestamp (newest first)
-        filtered_resources.sort(key=lambda x: x["metadata"].get("timestamp", ""), reverse=True)
+        Args:
+            text: Text to compare against, e.g. a draft note or another memory
+            patient_id: Optional patient ID to filter by
+            include_notes: Also search the patients' DocumentReference notes (indexed on first use)
+            limit: Maximum number of results to return (most similar first)
+            
+        Returns:
+            List of memory resources and/or notes, each with its similarity score
+        """
+        self.sync_memories()
+        if include_notes:
+            self.index_clinical_notes(patient_id)
         
-        return filtered_resources
+        candidates = accept = None
+        if patient_id is not None:
+            # The patient's own memories (and notes) are a small candidate set
+            candidates = [r.uri for r in self.registry.query("memory", patient_id)]
+            if include_notes:
+                # list() snapshots the dict; another thread may be indexing notes
+                candidates += [uri for uri, note in list(self.clinical_notes.items()) if note["patient_id"] == patient_id]
+        elif not include_notes:
+            accept = lambda uri: uri not in self.clinical_notes
+        
+        results = []
+        for uri, score in self.registry.similar(text, max(1, limit), accept, candidates):
+            if uri in self.clinical_notes:
+                item = dict(self.clinical_notes[uri])
+            else:
+                resource = self.registry.get_resource(uri)
+                if resource is None:
+                    continue  # deleted by another thread since the search
+                item = resource.to_dict()
+            item["score"] = round(score, 4)
+            results.append(item)
+        return results
     
+    @instrument("server")
+    def index_clinical_notes(self, patient_id: Optional[str] = None) -> int:
+        """Add the decoded DocumentReference notes of one or all registered patients to the similarity index.
+        
+        Each patient is indexed once; loading a patient's bundle for this goes
+        through the content cache like any read. Returns the number of notes added.
+        """
+        if patient_id is not None:
+            patient_ids = [patient_id] if self.registry.get_resource(f"patient:{patient_id}") else []
+        else:
+            patient_ids = [r.uri.split(":", 1)[1] for r in self.registry.query("patient", newest_first=False)]
+        
+        added = 0
+        with self._notes_lock:
+            for pid in patient_ids:
+                if pid in self._notes_indexed:
+                    continue
+                index = self.registry.get_resource(f"patient:{pid}").index()
+                for note_id in index.notes:
+                    note = index.note(note_id)
+                    uri = f"patient:{pid}/notes/{note_id}"
+                    self.clinical_notes[uri] = {"uri": uri, "source": "clinical_note", "patient_id": pid,
+                                                "date": note["date"], "type": note["type"], "content": note["text"]}
+                    self.registry.add_text(uri, note["text"])
+                    added += 1
+                self._notes_indexed.add(pid)
+        return added
+    
+    @instrument("server")
     def delete_memory(self, memory_uri: str) -> bool:
         """Delete a memory by URI.
         
@@ -160,16 +472,87 @@ class MCPServer:
         Returns:
             True if successfully deleted, False otherwise
         """
-        # Check if the memory exists
+        # Check if the memory exists (it may have been created by another process)
+        self.sync_memories()
         resource = self.registry.get_resource(memory_uri)
         if not resource or resource.resource_type != "memory":
             return False
             
-        # Remove from registry
-        self.registry.resources.pop(memory_uri, None)
+        # Remove from registry (and its indexes); another thread may have deleted it first
+        if self.registry.remove_resource(memory_uri) is None:
+            return False
+        if self.memory_store is not None:
+            self.memory_store.delete(memory_uri)
         
         return True
         
+    @instrument("server")
+    def apply_retention(self, now: Optional[int] = None) -> Dict[str, int]:
+        """Enforce the retention policies once (the sweeper calls this every MCP_RETENTION_INTERVAL seconds).
+        
+        In each (patient, category) group, memories beyond the policy's
+        max_per_patient (oldest first) or older than its ttl_days expire. With
+        ``compact`` they are rolled into the group's digest memory, otherwise
+        deleted. Digests themselves never expire.
+        
+        Args:
+            now: Current time in epoch microseconds (default: the clock)
+            
+        Returns:
+            Counts of memories deleted and compacted, and of digests written
+        """
+        result = {"deleted": 0, "compacted": 0, "digests": 0}
+        if not self.retention_policies:
+            return result
+        self.sync_memories()
+        now = time.time_ns() // 1000 if now is None else now
+        for patient_id, category in self.registry.groups("memory"):
+            policy = self.retention_policies.get(category) or self.retention_policies.get("*")
+            if policy is None or (policy.ttl_days is None and policy.max_per_patient is None):
+                continue
+            cutoff = None if policy.ttl_days is None else now - int(policy.ttl_days * 86400 * 1_000_000)
+            if patient_id is not None:
+                # Most groups are within their policy: check the count and the oldest before copying the group.
+                # The group's digest counts towards neither.
+                has_digest = self.registry.get_resource(digest_uri(patient_id, category)) is not None
+                count = self.registry.count("memory", patient_id, category) - has_digest
+                oldest = [r for r in self.registry.query("memory", patient_id, category, limit=1 + has_digest,
+                                                         newest_first=False) if not is_digest(r.uri)]
+                if ((policy.max_per_patient is None or count <= policy.max_per_patient)
+                        and (cutoff is None or not oldest or oldest[0].created >= cutoff)):
+                    continue
+            memories = [r for r in self.registry.query("memory", patient_id, category)
+                        if not is_digest(r.uri) and (patient_id or not r.patient_id)]
+            keep = memories if policy.max_per_patient is None else memories[:policy.max_per_patient]
+            expired = memories[len(keep):]
+            if cutoff is not None:
+                # Newest first, so the memories past the cutoff are a suffix of keep
+                while keep and keep[-1].created < cutoff:
+                    expired.insert(0, keep.pop())
+            if not expired:
+                continue
+            
+            if policy.compact:
+                uri = digest_uri(patient_id, category)
+                previous = self.registry.get_resource(uri)
+                oldest_first = expired[::-1]
+                text = build_digest(category, previous.text if previous else None,
+                                    [{"date": iso_timestamp(r.created), "text": r.text} for r in oldest_first])
+                # The digest sorts with the newest memory it holds
+                created = max(expired[0].created, previous.created if previous else 0)
+                digest = MemoryResource({"content": text, "category": category}, patient_id, uri=uri, created=created)
+                self.registry.add_resource(digest)
+                if self.memory_store is not None:
+                    self.memory_store.put(digest.uri, digest.content, digest.stored_metadata())
+                result["digests"] += 1
+            for resource in expired:
+                # A memory deleted by another thread meanwhile is simply gone already
+                if self.registry.remove_resource(resource.uri) is not None and self.memory_store is not None:
+                    self.memory_store.delete(resource.uri)
+            result["compacted" if policy.compact else "deleted"] += len(expired)
+        return result
+    
+    @instrument("server")
     def generate_voice(self, text: str, voice_id: str = "samantha") -> Dict[str, Any]:
         """Generate voice audio from text (disabled).
         
@@ -182,5 +565,57 @@ class MCPServer:
         """
         return {"error": "Voice generation is disabled", "status": "disabled"}
 
+def _patient_metadata(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Discovery metadata from a (possibly projected) linked patient record."""
+    entries = (record.get("data") or {}).get("entry", [])
+    resources = [entry.get("resource", {}) for entry in entries]
+    patient = next((r for r in resources if r.get("resourceType") == "Patient"), {})
+    
+    name = (patient.get("name") or [{}])[0]
+    full_name = " ".join(name.get("given", []) + [name.get("family", "")]).strip()
+    age = 0
+    if patient.get("birthDate"):
+        birth = datetime.date.fromisoformat(patient["birthDate"][:10])
+        today = datetime.date.today()
+        age = today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+    
+    return {
+        "name": full_name or "Unknown",
+        "gender": patient.get("gender", "Unknown"),
+        "age": age,
+        "conditions_count": sum(1 for r in resources if r.get("resourceType") == "Condition"),
+        "has_movemend_data": bool(record.get("movemend_data"))
+    }
+
+def _load_patient(patient_id: str) -> Dict[str, Any]:
+    """Full linked record for a patient (served from the client's disk cache when unchanged)."""
+    client = get_client()
+    return {
+        "id": patient_id,
+        "data": client.patient(patient_id)["data"],
+        "movemend_data": client.movemend_dossier(patient_id)
+    }
+
+def _restore_memory(record: Dict[str, Any]) -> MemoryResource:
+    """Rebuild a MemoryResource from a MemoryStore record, keeping its URI and timestamp."""
+    metadata = record["metadata"]
+    return MemoryResource(record["content"], metadata.get("patient_id"), metadata, uri=record["uri"],
+                          created=metadata.get("created"))
+
+def _encode_cursor(resource_type: Optional[str], after_seq: int, high_water: int) -> str:
+    raw = json.dumps([resource_type, after_seq, high_water], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: Optional[str], resource_type: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    try:
+        cursor_type, after_seq, high_water = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if cursor_type != resource_type or not isinstance(after_seq, int) or not isinstance(high_water, int):
+        return None
+    return after_seq, high_water
+
 # Create a singleton instance
 mcp_server = MCPServer()
@@ -0,0 +1,230 @@
+"""Per-operation instrumentation for the MCP layer.
+
+Every instrumented call is recorded under (layer, operation), e.g.
+("server", "read_resource"), ("tool", "search_memories") or ("claude",
+"_handle_tool_call"), with:
+
+- a duration histogram (seconds)
+- a payload size histogram (bytes of the result as JSON; results that aren't
+  already bytes are encoded to be sized, so only every
+  ``MCP_METRICS_PAYLOAD_EVERY``-th call of an operation is sized)
+- the number of results returned (items of a list result)
+- error counts by exception type (and tool results reported as errors)
+
+``metrics.prometheus()`` renders them in the Prometheus text format (served
+at ``GET /metrics`` by the HTTP RPC server) and ``metrics.snapshot()``
+returns plain rows for display, e.g. in the dashboard.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .resources.content_cache import json_size
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket, made cumulative when rendered."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class OperationStats:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.payload = Histogram(BYTES_BUCKETS)
+        self.results = 0
+        self.errors: Dict[str, int] = {}
+
+
+def _result_count(result: Any) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])  # (page, cursor)
+    if isinstance(result, dict) and isinstance(result.get("resources"), list):
+        return len(result["resources"])
+    return None
+
+
+def _payload_size(result: Any, sample: bool) -> Optional[int]:
+    if result is None:
+        return None
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if not sample:
+        return None
+    if isinstance(result, str):
+        return len(result.encode("utf-8"))
+    return json_size(result)
+
+
+def _reported_error(result: Any) -> Optional[str]:
+    """Handlers that return {"error": ...} instead of raising."""
+    if isinstance(result, dict) and isinstance(result.get("error"), str):
+        return "ErrorResult"
+    return None
+
+
+class Metrics:
+    """Thread-safe store of OperationStats by (layer, operation)."""
+
+    def __init__(self, payload_every: int = int(os.getenv("MCP_METRICS_PAYLOAD_EVERY", "10"))):
+        self.payload_every = max(1, payload_every)
+        self._operations: Dict[Tuple[str, str], OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, layer: str, operation: str) -> OperationStats:
+        stats = self._operations.get((layer, operation))
+        if stats is None:
+            with self._lock:
+                stats = self._operations.setdefault((layer, operation), OperationStats())
+        return stats
+
+    def record(self, layer: str, operation: str, duration: float, result: Any = None,
+               error: Optional[str] = None, measure_payload: bool = True) -> None:
+        """Record one call. The payload is sized as JSON unless ``measure_payload`` is False."""
+        stats = self._stats(layer, operation)
+        size = None
+        if measure_payload and error is None:
+            size = _payload_size(result, stats.duration.count % self.payload_every == 0)
+        count = _result_count(result) if error is None else None
+        error = error or _reported_error(result)
+        with self._lock:
+            stats.duration.observe(duration)
+            if size is not None:
+                stats.payload.observe(size)
+            if count is not None:
+                stats.results += count
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def instrument(self, layer: str, operation: Optional[str] = None,
+                   measure_payload: bool = True) -> Callable[[Callable], Callable]:
+        """Decorator recording each call of the function under (layer, operation or its name).
+
+        Use ``measure_payload=False`` where the result is a large object that
+        would otherwise be encoded just to be measured.
+        """
+        def decorate(fn: Callable) -> Callable:
+            name = operation or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    self.record(layer, name, time.perf_counter() - start, error=type(e).__name__)
+                    raise
+                self.record(layer, name, time.perf_counter() - start, result, measure_payload=measure_payload)
+                return result
+            return wrapper
+        return decorate
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations.clear()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """One row per operation: calls, errors, latency (ms) and payload (bytes) summaries, results."""
+        with self._lock:
+            rows = []
+            for (layer, operation), stats in sorted(self._operations.items()):
+                duration, payload = stats.duration, stats.payload
+                rows.append({
+                    "layer": layer,
+                    "operation": operation,
+                    "calls": duration.count,
+                    "errors": sum(stats.errors.values()),
+                    "mean_ms": round(duration.sum / duration.count * 1000, 3) if duration.count else 0.0,
+                    "p95_ms": round(duration.quantile(0.95) * 1000, 3),
+                    "max_ms": round(duration.max * 1000, 3),
+                    "mean_bytes": int(payload.sum / payload.count) if payload.count else 0,
+                    "max_bytes": int(payload.max),
+                    "results": stats.results,
+                    "error_types": dict(stats.errors),
+                })
+            return rows
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            items = sorted(self._operations.items())
+            lines = ["# HELP mcp_operation_duration_seconds Time spent in MCP operations.",
+                     "# TYPE mcp_operation_duration_seconds histogram"]
+            for key, stats in items:
+                lines += _histogram_lines("mcp_operation_duration_seconds", _labels(*key), stats.duration)
+            lines += ["# HELP mcp_operation_payload_bytes Size of MCP operation results as JSON.",
+                      "# TYPE mcp_operation_payload_bytes histogram"]
+            for key, stats in items:
+                if stats.payload.count:
+                    lines += _histogram_lines("mcp_operation_payload_bytes", _labels(*key), stats.payload)
+            lines += ["# HELP mcp_operation_results_total Items returned by MCP operations.",
+                      "# TYPE mcp_operation_results_total counter"]
+            lines += [f"mcp_operation_results_total{{{_labels(*key)}}} {stats.results}" for key, stats in items]
+            lines += ["# HELP mcp_operation_errors_total Failed MCP operations by error type.",
+                      "# TYPE mcp_operation_errors_total counter"]
+            for key, stats in items:
+                for error, count in sorted(stats.errors.items()):
+                    lines.append(f'mcp_operation_errors_total{{{_labels(*key)},error="{_escape(error)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(layer: str, operation: str) -> str:
+    return f'layer="{_escape(layer)}",operation="{_escape(operation)}"'
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{_format(bound)}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {_format(histogram.sum)}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+# Process-wide metrics, shared by MCPServer, the tool dispatcher and the Claude client
+metrics = Metrics()
+instrument = metrics.instrument
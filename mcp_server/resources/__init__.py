@@ -1,5 +1,9 @@
 """MCP resources package."""
 
-from .base import Resource, PatientResource, MemoryResource, VoiceResource, ResourceRegistry
+from .base import BaseResource, Resource, PatientResource, MemoryResource, VoiceResource, ResourceRegistry
+from .content_cache import ContentCache
+from .memory_store import MemoryStore
+from .patient_views import PatientIndex, RESOURCE_TEMPLATES
 
-__all__ = ["Resource", "PatientResource", "MemoryResource", "VoiceResource", "ResourceRegistry"]
+__all__ = ["BaseResource", "Resource", "PatientResource", "MemoryResource", "VoiceResource", "ResourceRegistry", "ContentCache", "MemoryStore",
+           "PatientIndex", "RESOURCE_TEMPLATES"]
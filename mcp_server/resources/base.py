@@ -1,17 +1,73 @@
 """Base resources for the MCP server implementation."""
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Iterator, Callable
+from bisect import bisect_left, insort
+from functools import lru_cache
+import datetime
+import itertools
+import os
+import sys
+import threading
+import time
 import uuid
 import base64
 
-class Resource:
-    """Base class for MCP resources."""
+from .content_cache import ContentCache, json_bytes, json_size
+from .search_index import InvertedIndex
+from .vector_index import TfidfIndex
+from .patient_views import PatientIndex
+from .rwlock import ReadWriteLock
+
+_last_timestamp = 0
+_timestamp_lock = threading.Lock()
+
+def _new_process_token() -> None:
+    global _process_token
+    _process_token = uuid.uuid4().hex[:12]
+
+# Random per process (and per fork), so ids minted by different processes sharing a memory store never collide
+_new_process_token()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_process_token)
+
+def unique_id() -> Tuple[int, str]:
+    """(unique_timestamp(), token): unique across processes; the token is this process's random component."""
+    return unique_timestamp(), _process_token
+
+def unique_timestamp() -> int:
+    """Current time in epoch microseconds, strictly increasing across calls in this process."""
+    global _last_timestamp
+    now = time.time_ns() // 1000
+    with _timestamp_lock:
+        # Same microsecond (or a clock step back): take the next free one
+        _last_timestamp = max(now, _last_timestamp + 1)
+        return _last_timestamp
+
+def epoch_us(timestamp: Any) -> int:
+    """Epoch microseconds from an ISO timestamp (naive means local time), a datetime or a number."""
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.astimezone()
+    delta = timestamp - datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+@lru_cache(maxsize=4096)
+def _iso_second(seconds: int) -> str:
+    return datetime.datetime.fromtimestamp(seconds).isoformat()
+
+def iso_timestamp(us: int) -> str:
+    """Local ISO timestamp for epoch microseconds, as ``datetime.now().isoformat()`` writes it."""
+    # Memories are rendered on every listing; the local-time conversion is per second and cached
+    seconds, micros = divmod(us, 1_000_000)
+    return f"{_iso_second(seconds)}.{micros:06d}" if micros else _iso_second(seconds)
+
+class BaseResource:
+    """Behaviour shared by all MCP resources; subclasses provide uri, content, resource_type and metadata."""
     
-    def __init__(self, content: Any, resource_type: str, metadata: Optional[Dict[str, Any]] = None):
-        self.uri = f"{resource_type}:{uuid.uuid4()}"
-        self.content = content
-        self.resource_type = resource_type
-        self.metadata = metadata or {}
+    __slots__ = ()
     
     def get_content(self) -> Any:
         """Get the resource content."""
@@ -21,6 +77,25 @@ class Resource:
         """Get the resource metadata."""
         return self.metadata
     
+    def search_text(self) -> Optional[str]:
+        """Text for the registry's full-text index, or None to leave the resource out."""
+        return None
+    
+    def index_fields(self) -> Tuple[str, Optional[str], Optional[str], int]:
+        """(resource_type, patient_id, category, timestamp in epoch microseconds, 0 if none) for the registry."""
+        metadata = self.metadata
+        timestamp = metadata.get("timestamp")
+        return (self.resource_type, metadata.get("patient_id"), metadata.get("category"),
+                epoch_us(timestamp) if timestamp else 0)
+    
+    def summary(self) -> Dict[str, Any]:
+        """URI, type and metadata, without the content (used for listings)."""
+        return {
+            "uri": self.uri,
+            "resource_type": self.resource_type,
+            "metadata": self.metadata
+        }
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert the resource to a dictionary."""
         return {
@@ -29,55 +104,194 @@ class Resource:
             "resource_type": self.resource_type,
             "metadata": self.metadata
         }
+    
+    def to_json(self) -> bytes:
+        """``to_dict()`` as compact JSON bytes."""
+        return json_bytes(self.to_dict())
+
+class Resource(BaseResource):
+    """Base class for MCP resources that store their fields as given."""
+    
+    __slots__ = ("uri", "content", "resource_type", "metadata")
+    
+    def __init__(self, content: Any, resource_type: str, metadata: Optional[Dict[str, Any]] = None):
+        self.uri = f"{resource_type}:{uuid.uuid4()}"
+        self.content = content
+        self.resource_type = resource_type
+        self.metadata = metadata or {}
 
 class PatientResource(Resource):
-    """Patient resource for the MCP server."""
+    """Patient resource for the MCP server.
+    
+    With a ``loader`` the resource can be registered with metadata only: the
+    content is loaded on first access and, with a ``ContentCache``, dropped
+    again when the cache's byte budget needs room (the next access reloads it).
+    """
     
-    def __init__(self, patient_data: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+    __slots__ = ("_loader", "_cache", "_load_lock", "_content", "_index", "_json")
+    
+    def __init__(self, patient_data: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None,
+                 patient_id: Optional[str] = None, loader: Optional[Callable[[], Dict[str, Any]]] = None,
+                 cache: Optional[ContentCache] = None):
+        self._loader = loader
+        self._cache = cache
+        self._load_lock = threading.Lock()
+        self._index: Optional[Tuple[Any, PatientIndex]] = None  # (content it was built from, index)
+        self._json: Optional[Tuple[Any, bytes]] = None  # (content it was encoded from, to_json() bytes)
         super().__init__(patient_data, "patient", metadata)
         # Set a custom URI that includes the patient ID for easier lookup
-        if "id" in patient_data:
-            self.uri = f"patient:{patient_data['id']}"
-
-class MemoryResource(Resource):
-    """Memory resource for storing contextual information in the MCP server."""
+        patient_id = patient_id or (patient_data or {}).get("id")
+        if patient_id:
+            self.uri = f"patient:{patient_id}"
+        if patient_data is not None and loader is not None and cache is not None:
+            cache.admit(self, json_size(patient_data))
     
-    def __init__(self, memory_data: Dict[str, Any], patient_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None):
-        # Generate metadata if not provided
-        if metadata is None:
-            metadata = {}
-        
-        # Add timestamp to metadata
-        import datetime
-        metadata["timestamp"] = datetime.datetime.now().isoformat()
+    @property
+    def content(self) -> Any:
+        content = self._content
+        if content is None and self._loader is not None:
+            with self._load_lock:
+                # Another reader may have loaded it while we waited
+                content = self._content
+                if content is None:
+                    content = self._loader()
+                    self._content = content
+                    if self._cache is not None:
+                        self._cache.admit(self, json_size(content))
+                    return content
+        if self._cache is not None:
+            self._cache.touch(self)
+        return content
+    
+    @content.setter
+    def content(self, value: Any) -> None:
+        self._content = value
+        self._json = None
+    
+    @property
+    def loaded(self) -> bool:
+        return self._content is not None
+    
+    def index(self) -> PatientIndex:
+        """Sub-resource index over the content, rebuilt whenever the content object changes (e.g. reloaded)."""
+        content = self.content
+        built = self._index
+        if built is None or built[0] is not content:
+            built = (content, PatientIndex(self.uri.split(":", 1)[1], content or {}))
+            self._index = built
+        return built[1]
+    
+    def to_json(self) -> bytes:
+        """Cached ``to_dict()`` JSON: a multi-megabyte bundle is encoded once per load, not on every read.
         
-        # Add patient ID to metadata if provided
-        if patient_id:
-            metadata["patient_id"] = patient_id
-            # Set memory category from data if available
-            memory_category = memory_data.get("category", "general")
-            # Create URI with patient ID and timestamp for unique identification
-            uri = f"memory:{patient_id}:{memory_category}:{metadata['timestamp']}"
-            super().__init__(memory_data, "memory", metadata)
-            self.uri = uri
+        Like the index, it is rebuilt whenever the content object changes, and
+        counts against the content cache budget while it is held.
+        """
+        content = self.content
+        cached = self._json
+        if cached is None or cached[0] is not content:
+            cached = (content, super().to_json())
+            self._json = cached
+            if self._cache is not None and self._loader is not None:
+                # Content plus its encoding: about twice the JSON size
+                self._cache.resize(self, 2 * len(cached[1]))
+        return cached[1]
+    
+    def evict(self) -> None:
+        """Drop the content (and its index and encoding) if it can be reloaded; metadata stays."""
+        if self._loader is not None:
+            self._content = None
+            self._index = None
+            self._json = None
+
+class MemoryResource(BaseResource):
+    """Memory resource for storing contextual information in the MCP server.
+    
+    There can be millions of these, so a memory keeps only its URI, its text,
+    its (interned) category and patient id, and its creation time as epoch
+    microseconds. ``content`` and ``metadata`` are built on access, in the
+    same shape as before, with the time as a local ISO timestamp for display.
+    
+    New URIs end in ``{epoch µs}-{process token}`` rather than the local
+    time, which repeats when clocks fall back: creation times are unique
+    within a process and the token tells processes sharing a store apart.
+    """
+    
+    __slots__ = ("uri", "text", "category", "patient_id", "created")
+    resource_type = "memory"
+    
+    def __init__(self, memory_data: Dict[str, Any], patient_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None,
+                 uri: Optional[str] = None, created: Optional[int] = None):
+        # Restored memories keep their creation time (and URI). ``created`` is exact; an ISO timestamp
+        # from metadata is local time and ambiguous while clocks fall back. Only timestamp and
+        # patient_id are read from metadata.
+        metadata = metadata or {}
+        self.text = memory_data.get("content", "")
+        self.category = sys.intern(memory_data.get("category") or "general")
+        patient_id = patient_id or metadata.get("patient_id")
+        self.patient_id = sys.intern(patient_id) if patient_id else None
+        timestamp = metadata.get("timestamp") or memory_data.get("timestamp")
+        if created is not None:
+            self.created, token = int(created), None
+        elif timestamp:
+            self.created, token = epoch_us(timestamp), None
         else:
-            # For general (non-patient) memories
-            memory_category = memory_data.get("category", "general")
-            uri = f"memory:{memory_category}:{metadata['timestamp']}"
-            super().__init__(memory_data, "memory", metadata)
-            self.uri = uri
+            self.created, token = unique_id()
+        if uri is None:
+            # URI with patient ID (if any), category and creation time for unique identification
+            owner = f"{self.patient_id}:" if self.patient_id else ""
+            suffix = f"{self.created}-{token}" if token else f"{self.created}-{uuid.uuid4().hex[:12]}"
+            uri = f"memory:{owner}{self.category}:{suffix}"
+        self.uri = uri
+    
+    @property
+    def content(self) -> Dict[str, Any]:
+        return {"content": self.text, "category": self.category, "timestamp": iso_timestamp(self.created)}
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        metadata = {"timestamp": iso_timestamp(self.created), "category": self.category}
+        if self.patient_id:
+            metadata["patient_id"] = self.patient_id
+        return metadata
+    
+    def stored_metadata(self) -> Dict[str, Any]:
+        """``metadata`` plus the exact creation time (``created``, epoch µs), as persisted by the MemoryStore."""
+        metadata = self.metadata
+        metadata["created"] = self.created
+        return metadata
+    
+    def to_dict(self) -> Dict[str, Any]:
+        # Render the timestamp once for both content and metadata
+        timestamp = iso_timestamp(self.created)
+        metadata = {"timestamp": timestamp, "category": self.category}
+        if self.patient_id:
+            metadata["patient_id"] = self.patient_id
+        return {
+            "uri": self.uri,
+            "content": {"content": self.text, "category": self.category, "timestamp": timestamp},
+            "resource_type": "memory",
+            "metadata": metadata
+        }
+    
+    def index_fields(self) -> Tuple[str, Optional[str], Optional[str], int]:
+        return ("memory", self.patient_id, self.category, self.created)
+    
+    def search_text(self) -> Optional[str]:
+        return f"{self.category} {self.text}"
 
 class VoiceResource(Resource):
     """Voice resource for text-to-speech content in the MCP server."""
     
+    __slots__ = ()
+    
     def __init__(self, voice_data: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
         # Generate metadata if not provided
         if metadata is None:
             metadata = {}
             
         # Add timestamp and other voice metadata
-        import datetime
-        metadata["timestamp"] = datetime.datetime.now().isoformat()
+        metadata["timestamp"] = iso_timestamp(unique_timestamp())
         
         # Add voice specific metadata
         if "voice_id" in voice_data:
@@ -98,27 +312,204 @@ class VoiceResource(Resource):
             return base64.b64encode(audio_bytes).decode('utf-8')
         return ""
 
+ANY = "*"
+
 class ResourceRegistry:
-    """Registry of MCP resources."""
+    """Registry of MCP resources.
+    
+    Besides the URI map, every resource is indexed under each combination of
+    (resource_type, patient_id, category) with ``ANY`` as a wildcard, and each
+    index is a list of (epoch µs timestamp, seq, uri) keys kept sorted with bisect. Any
+    filter combination is therefore one dict lookup plus a slice: the newest
+    k matches cost O(log n + k) instead of a scan and sort of every resource.
+    
+    For pagination each resource type (and ``ANY``) also has a list of
+    (seq, uri) in insertion order. New URIs get a growing ``seq`` and a
+    replaced URI keeps its own, so "everything after seq X, up to high-water
+    mark H" is a stable keyset page.
+    
+    Resources with ``search_text()`` (memories) are also kept in a BM25
+    inverted index, ``text_index``, and as TF-IDF vectors for cosine
+    similarity, ``similarity_index``. Other texts (e.g. clinical notes) can
+    be added to ``similarity_index`` under their own URIs.
+    
+    Listeners registered with ``add_listener`` are called with ("added",
+    uri), ("updated", uri) or ("removed", uri) after every mutation.
+    
+    The registry is shared by every session thread, so all of these
+    structures sit behind one reader-writer lock: add/remove take it for
+    writing, lookups and searches for reading, and anything returned is a
+    list built under the lock (a snapshot), never a live view. Mutate only
+    through add_resource / remove_resource.
+    """
     
     def __init__(self):
-        self.resources: Dict[str, Resource] = {}
+        self.resources: Dict[str, BaseResource] = {}
+        self._indexes: Dict[Tuple[str, str, str], List[Tuple[str, int, str]]] = {}
+        self._sort_keys: Dict[str, Tuple[str, int, str]] = {}
+        self._by_seq: Dict[str, List[Tuple[int, str]]] = {}
+        self._seq = itertools.count(1)
+        self.last_seq = 0
+        self.text_index = InvertedIndex()
+        self.similarity_index = TfidfIndex()
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._lock = ReadWriteLock()
+    
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Call ``listener(event, uri)`` after each add ("added"/"updated") and remove ("removed")."""
+        self._listeners.append(listener)
+    
+    def _notify(self, event: str, uri: str) -> None:
+        for listener in self._listeners:
+            try:
+                listener(event, uri)
+            except Exception as e:
+                print(f"Error in registry listener for {uri}: {e}")
+    
+    @staticmethod
+    def _index_names(fields: Tuple[str, Optional[str], Optional[str], int]) -> Iterator[Tuple[str, str, str]]:
+        dims = fields[:3]
+        return itertools.product(*[(ANY,) if value is None else (value, ANY) for value in dims])
+    
+    def add_resource(self, resource: BaseResource) -> None:
+        """Add a resource to the registry, replacing any resource with the same URI."""
+        text = resource.search_text()
+        fields = resource.index_fields()
+        with self._lock.write():
+            old_key = self._sort_keys.get(resource.uri)
+            replaced = self._unindex(resource.uri) is not None
+            self.resources[resource.uri] = resource
+            # seq breaks timestamp ties and keeps untimestamped resources (patients) in insertion order.
+            # A replacement keeps its place, so a listing in progress neither loses nor repeats it.
+            if old_key is not None:
+                seq = old_key[1]
+            else:
+                seq = self.last_seq = next(self._seq)
+            sort_key = (fields[3], seq, resource.uri)
+            self._sort_keys[resource.uri] = sort_key
+            for name in self._index_names(fields):
+                insort(self._indexes.setdefault(name, []), sort_key)
+            for name in (resource.resource_type, ANY):
+                insort(self._by_seq.setdefault(name, []), (seq, resource.uri))
+            if text is not None:
+                self.text_index.add(resource.uri, text)
+                self.similarity_index.add(resource.uri, text)
+        self._notify("updated" if replaced else "added", resource.uri)
+    
+    def remove_resource(self, uri: str) -> Optional[BaseResource]:
+        """Remove a resource and its index entries. Returns the removed resource, if any."""
+        with self._lock.write():
+            resource = self._unindex(uri)
+        if resource is not None:
+            self._notify("removed", uri)
+        return resource
     
-    def add_resource(self, resource: Resource) -> None:
-        """Add a resource to the registry."""
-        self.resources[resource.uri] = resource
+    def _unindex(self, uri: str) -> Optional[BaseResource]:
+        resource = self.resources.pop(uri, None)
+        if resource is None:
+            return None
+        if getattr(resource, "_cache", None) is not None:
+            resource._cache.discard(resource)
+        sort_key = self._sort_keys.pop(uri)
+        for name in self._index_names(resource.index_fields()):
+            index = self._indexes[name]
+            del index[bisect_left(index, sort_key)]
+            if not index:
+                del self._indexes[name]
+        for name in (resource.resource_type, ANY):
+            by_seq = self._by_seq[name]
+            del by_seq[bisect_left(by_seq, (sort_key[1], ""))]
+        self.text_index.remove(uri)
+        self.similarity_index.remove(uri)
+        return resource
     
-    def get_resource(self, uri: str) -> Optional[Resource]:
+    def get_resource(self, uri: str) -> Optional[BaseResource]:
         """Get a resource by URI."""
+        # A single dict lookup is atomic; no lock needed
         return self.resources.get(uri)
     
+    def add_text(self, uri: str, text: str) -> None:
+        """Index text that isn't a registered resource (e.g. a clinical note) for ``similar``."""
+        with self._lock.write():
+            self.similarity_index.add(uri, text)
+    
+    def similar(self, text: str, limit: int = 5, accept: Optional[Callable[[str], bool]] = None,
+                candidates: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Top (uri, cosine similarity) pairs from ``similarity_index``."""
+        with self._lock.read():
+            return self.similarity_index.search(text, limit, accept, candidates)
+    
+    def query(self, resource_type: Optional[str] = None, patient_id: Optional[str] = None,
+              category: Optional[str] = None, limit: Optional[int] = None,
+              newest_first: bool = True) -> List[BaseResource]:
+        """Resources matching every given filter, ordered by timestamp."""
+        with self._lock.read():
+            index = self._indexes.get((resource_type or ANY, patient_id or ANY, category or ANY), [])
+            if newest_first:
+                keys = index[::-1] if limit is None else index[:-limit - 1:-1] if limit > 0 else []
+            else:
+                keys = index if limit is None else index[:limit]
+            return [self.resources[uri] for _, _, uri in keys]
+    
+    def groups(self, resource_type: str) -> List[Tuple[Optional[str], str]]:
+        """(patient_id, category) of every non-empty group of this type; patient_id None for resources without one."""
+        with self._lock.read():
+            keys = [(patient_id, category) for kind, patient_id, category in self._indexes
+                    if kind == resource_type and category != ANY]
+            groups = [(patient_id, category) for patient_id, category in keys if patient_id != ANY]
+            with_patient: Dict[str, int] = {}
+            for patient_id, category in groups:
+                with_patient[category] = with_patient.get(category, 0) + len(self._indexes[(resource_type, patient_id, category)])
+            # Resources without a patient are only in the (type, ANY, category) index
+            groups += [(None, category) for patient_id, category in keys
+                       if patient_id == ANY and len(self._indexes[(resource_type, ANY, category)]) > with_patient.get(category, 0)]
+            return groups
+    
+    def count(self, resource_type: Optional[str] = None, patient_id: Optional[str] = None,
+              category: Optional[str] = None) -> int:
+        # len() of a list fetched in one lookup is atomic
+        return len(self._indexes.get((resource_type or ANY, patient_id or ANY, category or ANY), []))
+    
+    def page(self, resource_type: Optional[str], after_seq: int, high_water: int,
+             limit: int) -> Tuple[List[BaseResource], int, bool]:
+        """Up to ``limit`` resources with after_seq < seq <= high_water, in insertion order.
+        
+        Returns the page, the seq of its last resource and whether more remain
+        below the high-water mark. Costs O(log n + limit).
+        """
+        with self._lock.read():
+            by_seq = self._by_seq.get(resource_type or ANY, [])
+            start = bisect_left(by_seq, (after_seq + 1, ""))
+            end = min(bisect_left(by_seq, (high_water + 1, "")), start + limit)
+            entries = by_seq[start:end]
+            last_seq = entries[-1][0] if entries else after_seq
+            more = end < len(by_seq) and by_seq[end][0] <= high_water
+            return [self.resources[uri] for _, uri in entries], last_seq, more
+    
+    def search(self, text: str, resource_type: Optional[str] = None, patient_id: Optional[str] = None,
+               category: Optional[str] = None, since: Optional[int] = None, until: Optional[int] = None,
+               limit: int = 5) -> List[Tuple[BaseResource, float]]:
+        """Best BM25 matches for ``text`` among resources matching every given filter.
+        
+        ``since`` / ``until`` bound the timestamp (epoch microseconds, inclusive).
+        """
+        def accept(uri):
+            kind, owner, kind_category, timestamp = self.resources[uri].index_fields()
+            return ((resource_type is None or kind == resource_type)
+                    and (patient_id is None or owner == patient_id)
+                    and (category is None or kind_category == category)
+                    and (since is None or timestamp >= since)
+                    and (until is None or timestamp <= until))
+        
+        with self._lock.read():
+            candidates = None
+            if patient_id is not None or category is not None:
+                # The (type, patient, category) index is usually far smaller than a common term's postings
+                candidates = {uri for _, _, uri in self._indexes.get((resource_type or ANY, patient_id or ANY,
+                                                                       category or ANY), [])}
+            return [(self.resources[uri], score)
+                    for uri, score in self.text_index.search(text, limit, accept, candidates)]
+    
     def list_resources(self, resource_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """List all resources or resources of a specific type."""
-        resources = self.resources.values()
-        if resource_type:
-            resources = [r for r in resources if r.resource_type == resource_type]
-        return [{
-            "uri": r.uri,
-            "resource_type": r.resource_type,
-            "metadata": r.metadata
-        } for r in resources]
+        return [r.summary() for r in self.query(resource_type, newest_first=False)]
@@ -0,0 +1,97 @@
+"""Byte-budgeted LRU for lazily loaded resource content."""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+# Optional: orjson sizes multi-megabyte bundles much faster than the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_bytes(value: Any) -> bytes:
+    """``value`` as compact UTF-8 JSON; values JSON can't represent are written as str()."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def json_size(content: Any) -> int:
+    """Size of ``content`` as compact JSON, the unit of the cache budget."""
+    return len(json_bytes(content))
+
+
+class ContentCache:
+    """Keeps the most recently read resource contents within ``max_bytes``.
+
+    Resources register themselves when their content is loaded and are told
+    to ``evict()`` (drop their content, keep their metadata) when the budget
+    is exceeded. Sizes are measured as serialized JSON, so the in-memory
+    footprint is a constant factor of the budget rather than exactly it.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()  # uri -> (resource, nbytes)
+        self._lock = threading.Lock()
+
+    def touch(self, resource) -> None:
+        """Mark a resource's content as just used."""
+        with self._lock:
+            if resource.uri in self._entries:
+                self._entries.move_to_end(resource.uri)
+                self.hits += 1
+
+    def admit(self, resource, nbytes: int) -> None:
+        """Account for newly loaded content and evict least recently used content over budget."""
+        with self._lock:
+            previous = self._entries.pop(resource.uri, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[resource.uri] = (resource, nbytes)
+            self.bytes += nbytes
+            self.loads += 1
+            self._evict_over_budget()
+
+    def resize(self, resource, nbytes: int) -> None:
+        """Update the size of resident content (e.g. it gained a cached encoding), evicting others if needed."""
+        with self._lock:
+            entry = self._entries.get(resource.uri)
+            if entry is None or entry[0] is not resource:
+                return
+            self.bytes += nbytes - entry[1]
+            self._entries[resource.uri] = (resource, nbytes)
+            self._entries.move_to_end(resource.uri)
+            self._evict_over_budget()
+
+    def _evict_over_budget(self) -> None:
+        # Never evict the most recent entry, even if it alone exceeds the budget
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, (victim, size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            victim.evict()
+
+    def discard(self, resource) -> None:
+        """Forget a resource (e.g. removed from the registry).
+
+        Only its own entry: a resource replacing it under the same URI may
+        already have been admitted.
+        """
+        with self._lock:
+            entry = self._entries.get(resource.uri)
+            if entry is not None and entry[0] is resource:
+                del self._entries[resource.uri]
+                self.bytes -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"resident": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "loads": self.loads, "evictions": self.evictions}
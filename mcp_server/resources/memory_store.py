@@ -0,0 +1,236 @@
+"""SQLite-backed persistence for memory resources.
+
+The store holds one row per live memory plus tombstones for deleted ones;
+every write takes a new ``seq`` (AUTOINCREMENT), so "what changed since seq
+X" is one indexed range query. A server warm-starts by loading the live rows
+in a single SELECT, and stays in sync with other processes sharing the file
+(Streamlit workers, the CLI) by applying only the rows past its last seq.
+
+The database runs in WAL mode: readers never block the writer or each other,
+and concurrent writers from several processes serialize on SQLite's own lock
+(with a busy timeout). Writes are queued and committed by a background
+thread in batches, one transaction per batch; ``flush()`` waits for them.
+
+Tombstones are purged once they are ``tombstone_days`` old, at most once per
+``purge_interval`` seconds by the writer thread. The highest purged seq is
+kept in the ``meta`` table: a reader whose last seq is below it may have
+missed a delete, so ``changes`` tells it to reload (which only happens after
+not syncing for that long).
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MEMORY_DB = os.path.join(os.path.expanduser("~"), ".cache", "movemend-mcp", "memories.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uri TEXT NOT NULL UNIQUE,
+    patient_id TEXT,
+    category TEXT,
+    timestamp TEXT,
+    content TEXT,
+    metadata TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    deleted_at REAL
+);
+CREATE INDEX IF NOT EXISTS memories_live ON memories (deleted, seq);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+"""
+
+_COLUMNS = "seq, uri, content, metadata, deleted"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is durable across application crashes in WAL mode; only a power loss can drop the last commits
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def _record(row: Tuple) -> Dict[str, Any]:
+    seq, uri, content, metadata, deleted = row
+    return {"seq": seq, "uri": uri, "deleted": bool(deleted),
+            "content": json.loads(content) if content is not None else None,
+            "metadata": json.loads(metadata) if metadata is not None else {}}
+
+
+class MemoryStore:
+    """Durable, multi-process store for memory resources with batched writes."""
+
+    def __init__(self, path: str = DEFAULT_MEMORY_DB, flush_interval: float = 0.05, batch_size: int = 500,
+                 tombstone_days: float = 7, purge_interval: float = 3600):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.tombstone_days = tombstone_days
+        self.purge_interval = purge_interval
+        self._last_purge = float("-inf")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._reader = _connect(path)
+        self._reader.executescript(_SCHEMA)
+        columns = [row[1] for row in self._reader.execute("PRAGMA table_info(memories)")]
+        if "deleted_at" not in columns:
+            # Stores created before tombstones were purged
+            self._reader.execute("ALTER TABLE memories ADD COLUMN deleted_at REAL")
+        self._reader_lock = threading.Lock()
+        self._data_version: Optional[int] = None
+
+        self._writes: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        # uri -> queued writes not yet committed; our own pending write supersedes what's on disk
+        self._pending: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="memory-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------ writes
+
+    def put(self, uri: str, content: Any, metadata: Dict[str, Any]) -> None:
+        """Queue an insert or replacement of a memory."""
+        self._enqueue((uri, metadata.get("patient_id"), metadata.get("category"), metadata.get("timestamp"),
+                       json.dumps(content), json.dumps(metadata), 0, None))
+
+    def delete(self, uri: str) -> None:
+        """Queue a delete (kept as a tombstone, for ``tombstone_days``, so other processes see it)."""
+        self._enqueue((uri, None, None, None, None, None, 1, time.time()))
+
+    def _enqueue(self, row: Tuple) -> None:
+        with self._pending_lock:
+            self._pending[row[0]] = self._pending.get(row[0], 0) + 1
+        self._writes.put(row)
+
+    def flush(self) -> None:
+        """Block until every queued write is committed."""
+        self._writes.join()
+
+    def has_pending(self, uri: str) -> bool:
+        """Whether a write for ``uri`` is queued but not yet committed."""
+        with self._pending_lock:
+            return uri in self._pending
+
+    def purge(self, connection: Optional[sqlite3.Connection] = None, now: Optional[float] = None) -> int:
+        """Delete tombstones older than ``tombstone_days`` and raise the purged seq. Returns the count."""
+        own = connection is None
+        connection = connection or _connect(self.path)
+        cutoff = (now or time.time()) - self.tombstone_days * 86400
+        try:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                purged_seq = connection.execute("SELECT MAX(seq) FROM memories WHERE deleted = 1 AND deleted_at < ?",
+                                                (cutoff,)).fetchone()[0]
+                if purged_seq is None:
+                    return 0
+                count = connection.execute("DELETE FROM memories WHERE deleted = 1 AND deleted_at < ?",
+                                           (cutoff,)).rowcount
+                connection.execute("INSERT INTO meta (key, value) VALUES ('purged_seq', ?) "
+                                   "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)", (purged_seq,))
+                return count
+        finally:
+            if own:
+                connection.close()
+
+    def _write_loop(self) -> None:
+        connection = _connect(self.path)
+        while True:
+            item = self._writes.get()
+            if item is None:
+                self._writes.task_done()
+                break
+            batch = [item]
+            # Coalesce whatever arrives within the flush interval into one transaction
+            try:
+                while len(batch) < self.batch_size:
+                    item = self._writes.get(timeout=self.flush_interval)
+                    if item is None:
+                        self._writes.put(None)
+                        self._writes.task_done()
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            try:
+                with connection:
+                    connection.execute("BEGIN IMMEDIATE")
+                    # REPLACE deletes the old row, so the write gets a fresh seq
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO memories (uri, patient_id, category, timestamp, content, metadata, deleted, "
+                        "deleted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            except sqlite3.Error as e:
+                print(f"Error writing {len(batch)} memories to {self.path}: {e}")
+            finally:
+                with self._pending_lock:
+                    for row in batch:
+                        self._pending[row[0]] -= 1
+                        if not self._pending[row[0]]:
+                            del self._pending[row[0]]
+                for _ in batch:
+                    self._writes.task_done()
+            if time.monotonic() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.monotonic()
+                try:
+                    self.purge(connection)
+                except sqlite3.Error as e:
+                    print(f"Error purging memory tombstones in {self.path}: {e}")
+        connection.close()
+
+    # ------------------------------------------------------------------ reads
+
+    def load(self) -> Tuple[List[Dict[str, Any]], int]:
+        """Every live memory, plus the seq to pass to ``changes`` next."""
+        with self._reader_lock:
+            self._data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            # One read transaction, so the rows and last_seq come from the same snapshot
+            self._reader.execute("BEGIN")
+            try:
+                rows = self._reader.execute(f"SELECT {_COLUMNS} FROM memories WHERE deleted = 0 ORDER BY seq").fetchall()
+                # Purged tombstones may have held the highest seqs; the snapshot covers them too
+                last_seq = self._reader.execute(
+                    "SELECT MAX((SELECT COALESCE(MAX(seq), 0) FROM memories), "
+                    "(SELECT COALESCE(MAX(value), 0) FROM meta WHERE key = 'purged_seq'))").fetchone()[0]
+            finally:
+                self._reader.execute("COMMIT")
+        return [_record(row) for row in rows], last_seq
+
+    def changes(self, since_seq: int) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """Writes and deletes committed after ``since_seq``, by any process.
+
+        Cheap when nothing was committed: SQLite's data_version is compared
+        before any query runs. Rows for URIs with a write still queued here
+        are skipped, since that write will replace them. Returns None for
+        the records if tombstones after ``since_seq`` were already purged:
+        the caller must ``load()`` everything again.
+        """
+        with self._reader_lock:
+            data_version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return [], since_seq
+            self._data_version = data_version
+            self._reader.execute("BEGIN")
+            try:
+                purged_seq = self._reader.execute("SELECT value FROM meta WHERE key = 'purged_seq'").fetchone()
+                if purged_seq is not None and since_seq < purged_seq[0]:
+                    return None, since_seq
+                rows = self._reader.execute(f"SELECT {_COLUMNS} FROM memories WHERE seq > ? ORDER BY seq",
+                                            (since_seq,)).fetchall()
+            finally:
+                self._reader.execute("COMMIT")
+        with self._pending_lock:
+            records = [_record(row) for row in rows if row[1] not in self._pending]
+        return records, rows[-1][0] if rows else since_seq
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
@@ -0,0 +1,192 @@
+"""Sub-resources of a patient: small, filtered views of the linked record.
+
+``patient:{id}`` is the whole Synthea bundle plus MoveMend dossier, often
+megabytes. The URIs below address one slice of it, e.g.
+``patient:{id}/observations?code=8302-2&since=2020-01-01&limit=5``, and are
+answered from a PatientIndex built once per loaded record: entries grouped
+by type, observations grouped by LOINC code and sorted newest first, all
+reduced to the fields a clinician reads.
+"""
+
+import base64
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+RESOURCE_TEMPLATES = [
+    {"uriTemplate": "patient:{id}/conditions{?status}",
+     "name": "Conditions", "description": "Diagnoses with status, onset and abatement dates. status: e.g. active, resolved."},
+    {"uriTemplate": "patient:{id}/vitals",
+     "name": "Latest vitals", "description": "Most recent value of each vital sign."},
+    {"uriTemplate": "patient:{id}/observations{?code,category,since,until,limit}",
+     "name": "Observations", "description": "Observations newest first. code: comma-separated LOINC codes; "
+                                            "category: e.g. vital-signs, laboratory, survey; since/until: ISO dates."},
+    {"uriTemplate": "patient:{id}/medications{?status}",
+     "name": "Medications", "description": "Medication requests with status and date."},
+    {"uriTemplate": "patient:{id}/immunizations",
+     "name": "Immunizations", "description": "Vaccines given, newest first."},
+    {"uriTemplate": "patient:{id}/notes{?since,limit}",
+     "name": "Clinical notes", "description": "Note list (date, type, URI) newest first."},
+    {"uriTemplate": "patient:{id}/notes/{note_id}",
+     "name": "Clinical note", "description": "Decoded text of one note."},
+    {"uriTemplate": "patient:{id}/movemend",
+     "name": "MoveMend overview", "description": "Session count, date range and per-game averages."},
+    {"uriTemplate": "patient:{id}/movemend/sessions{?game,since,limit}",
+     "name": "MoveMend sessions", "description": "Therapy game sessions newest first."},
+]
+
+
+def _coding(concept: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return ((concept or {}).get("coding") or [{}])[0]
+
+def _display(concept: Optional[Dict[str, Any]]) -> Optional[str]:
+    return (concept or {}).get("text") or _coding(concept).get("display")
+
+def _value(item: Dict[str, Any]) -> Dict[str, Any]:
+    if "valueQuantity" in item:
+        quantity = item["valueQuantity"]
+        return {"value": quantity.get("value"), "unit": quantity.get("unit")}
+    if "valueCodeableConcept" in item:
+        return {"value": _display(item["valueCodeableConcept"])}
+    for key in ("valueString", "valueBoolean", "valueInteger"):
+        if key in item:
+            return {"value": item[key]}
+    return {}
+
+def _observation(resource: Dict[str, Any]) -> Dict[str, Any]:
+    code = _coding(resource.get("code"))
+    item = {"code": code.get("code"), "display": _display(resource.get("code")),
+            "category": _coding((resource.get("category") or [{}])[0]).get("code"),
+            "date": resource.get("effectiveDateTime") or resource.get("issued")}
+    item.update(_value(resource))
+    if resource.get("component"):
+        item["components"] = [dict({"code": _coding(c.get("code")).get("code"), "display": _display(c.get("code"))},
+                                   **_value(c)) for c in resource["component"]]
+    return item
+
+def _condition(resource: Dict[str, Any]) -> Dict[str, Any]:
+    return {"code": _coding(resource.get("code")).get("code"), "display": _display(resource.get("code")),
+            "status": _coding(resource.get("clinicalStatus")).get("code"),
+            "onset": resource.get("onsetDateTime"), "abatement": resource.get("abatementDateTime")}
+
+def _medication(resource: Dict[str, Any], medications: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """``medications`` maps bundle fullUrls to Medication resources, for medicationReference."""
+    reference = resource.get("medicationReference") or {}
+    display = _display(resource.get("medicationCodeableConcept")) or reference.get("display") \
+        or _display(medications.get(reference.get("reference"), {}).get("code"))
+    return {"display": display, "status": resource.get("status"), "date": resource.get("authoredOn")}
+
+def _immunization(resource: Dict[str, Any]) -> Dict[str, Any]:
+    return {"display": _display(resource.get("vaccineCode")), "status": resource.get("status"),
+            "date": resource.get("occurrenceDateTime")}
+
+
+class PatientIndex:
+    """Per-patient lookup tables over a linked record, built in one pass."""
+
+    def __init__(self, patient_id: str, record: Dict[str, Any]):
+        self.patient_id = patient_id
+        self.by_type: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        medications: Dict[str, Dict[str, Any]] = {}
+        for entry in (record.get("data") or {}).get("entry", []):
+            resource = entry.get("resource", {})
+            self.by_type[resource.get("resourceType")].append(resource)
+            if resource.get("resourceType") == "Medication":
+                medications[entry.get("fullUrl")] = resource
+
+        newest_first = lambda item: item.get("date") or ""
+        self.observations = sorted((_observation(r) for r in self.by_type["Observation"]), key=newest_first, reverse=True)
+        self.observations_by_code: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for observation in self.observations:
+            self.observations_by_code[observation["code"]].append(observation)
+        self.conditions = sorted((_condition(r) for r in self.by_type["Condition"]),
+                                 key=lambda item: item.get("onset") or "", reverse=True)
+        self.medications = sorted((_medication(r, medications) for r in self.by_type["MedicationRequest"]),
+                                  key=newest_first, reverse=True)
+        self.immunizations = sorted((_immunization(r) for r in self.by_type["Immunization"]), key=newest_first, reverse=True)
+        self.notes = {r.get("id"): r for r in self.by_type["DocumentReference"]}
+
+        dossier = record.get("movemend_data") or {}
+        self.sessions = sorted(dossier.get("sessions", []), key=lambda s: s.get("date", ""), reverse=True)
+
+    def vitals(self) -> List[Dict[str, Any]]:
+        # observations_by_code lists are newest first, so the first vital-sign of each code is the latest
+        return [items[0] for items in self.observations_by_code.values() if items[0]["category"] == "vital-signs"]
+
+    def note(self, note_id: str) -> Optional[Dict[str, Any]]:
+        resource = self.notes.get(note_id)
+        if resource is None:
+            return None
+        attachment = (resource.get("content") or [{}])[0].get("attachment", {})
+        text = base64.b64decode(attachment["data"]).decode("utf-8", errors="replace") if attachment.get("data") else ""
+        return {"date": resource.get("date"), "type": _display(resource.get("type")), "text": text}
+
+    def movemend_overview(self) -> Dict[str, Any]:
+        games: Dict[str, Dict[str, Any]] = {}
+        for session in self.sessions:
+            game = games.setdefault(session.get("gameId"), {"sessions": 0, "score": 0, "quality": 0})
+            game["sessions"] += 1
+            game["score"] += session.get("score") or 0
+            game["quality"] += session.get("quality") or 0
+        return {
+            "sessions": len(self.sessions),
+            "first": self.sessions[-1].get("date") if self.sessions else None,
+            "last": self.sessions[0].get("date") if self.sessions else None,
+            "games": {name: {"sessions": g["sessions"], "avg_score": round(g["score"] / g["sessions"], 1),
+                             "avg_quality": round(g["quality"] / g["sessions"], 1)} for name, g in games.items()}
+        }
+
+
+def _dated(items: List[Dict[str, Any]], since: Optional[str], until: Optional[str], key: str = "date") -> List[Dict[str, Any]]:
+    # ISO timestamps compare correctly as strings; a bare date bounds the whole day
+    return [item for item in items
+            if (since is None or (item.get(key) or "") >= since)
+            and (until is None or (item.get(key) or "")[:len(until)] <= until)]
+
+def _page(items: List[Dict[str, Any]], params: Dict[str, str]) -> Dict[str, Any]:
+    """Truncate to ``limit``, keeping the total so the caller knows there is more."""
+    try:
+        limit = min(max(int(params.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return {"total": len(items), "items": items[:limit]}
+
+def resolve(index: PatientIndex, path: str, params: Dict[str, str]) -> Optional[Any]:
+    """Content of sub-resource ``path`` (e.g. "observations") with query ``params``; None if unknown."""
+    since, until = params.get("since"), params.get("until")
+    if path == "conditions":
+        status = params.get("status")
+        return _page([c for c in index.conditions if status is None or c["status"] == status], params)
+    if path == "vitals":
+        return {"total": len(index.vitals()), "items": index.vitals()}
+    if path == "observations":
+        if params.get("code"):
+            codes = [code.strip() for code in params["code"].split(",")]
+            items = [o for code in codes for o in index.observations_by_code.get(code, [])]
+            if len(codes) > 1:
+                items.sort(key=lambda item: item.get("date") or "", reverse=True)
+        else:
+            items = index.observations
+        if params.get("category"):
+            items = [o for o in items if o["category"] == params["category"]]
+        return _page(_dated(items, since, until), params)
+    if path == "medications":
+        status = params.get("status")
+        return _page([m for m in index.medications if status is None or m["status"] == status], params)
+    if path == "immunizations":
+        return _page(_dated(index.immunizations, since, until), params)
+    if path == "notes":
+        notes = sorted(({"uri": f"patient:{index.patient_id}/notes/{note_id}", "date": r.get("date"),
+                         "type": _display(r.get("type"))} for note_id, r in index.notes.items()),
+                       key=lambda item: item.get("date") or "", reverse=True)
+        return _page(_dated(notes, since, until), params)
+    if path.startswith("notes/"):
+        return index.note(path[len("notes/"):])
+    if path == "movemend":
+        return index.movemend_overview()
+    if path == "movemend/sessions":
+        sessions = [s for s in index.sessions if params.get("game") in (None, s.get("gameId"))]
+        return _page(_dated(sessions, since, until), params)
+    return None
@@ -0,0 +1,86 @@
+"""Incrementally maintained inverted index with BM25 ranking."""
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his in is it its of on or she that the their they "
+    "this to was were which with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class InvertedIndex:
+    """Postings (term -> {uri: term frequency}) plus document lengths for BM25.
+
+    Adding or removing a document touches only its own terms, so the index is
+    kept current on every registry write. ``search`` scores just the
+    documents that contain a query term.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._terms: Dict[str, Counter] = {}  # uri -> term counts, to undo an add
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, uri: str, text: str) -> None:
+        if uri in self._terms:
+            self.remove(uri)
+        terms = Counter(tokenize(text))
+        self._terms[uri] = terms
+        self._lengths[uri] = sum(terms.values())
+        self._total_length += self._lengths[uri]
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[uri] = frequency
+
+    def remove(self, uri: str) -> None:
+        terms = self._terms.pop(uri, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(uri)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[uri]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int = 5, accept: Optional[Callable[[str], bool]] = None,
+               candidates: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """Top ``limit`` (uri, score) pairs for ``query``; ``accept`` filters matching URIs.
+        
+        ``candidates`` optionally restricts the search to those URIs; for a
+        common term it is walked instead of the (longer) posting list.
+        """
+        if not self._terms:
+            return []
+        count = len(self._terms)
+        average_length = self._total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            if candidates is None:
+                matches = postings.items()
+            elif len(candidates) < len(postings):
+                matches = [(uri, postings[uri]) for uri in candidates if uri in postings]
+            else:
+                matches = [(uri, frequency) for uri, frequency in postings.items() if uri in candidates]
+            for uri, frequency in matches:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[uri] / average_length)
+                scores[uri] = scores.get(uri, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        candidates = scores.items() if accept is None else ((uri, s) for uri, s in scores.items() if accept(uri))
+        return heapq.nlargest(limit, candidates, key=lambda item: item[1])
@@ -0,0 +1,214 @@
+"""Offline TF-IDF cosine similarity over short texts, in NumPy.
+
+Documents are sparse vectors stored as three parallel arrays of nonzeros
+(document slot, term id, log-scaled term frequency), plus per-term posting
+arrays of nonzero positions; all of them grow by doubling, so an add is
+amortized O(terms). A query scores every document sharing a term with it in
+a few vectorized passes: gather the query terms' nonzeros, weight them,
+``bincount`` them into per-document dot products and divide by the norms.
+
+IDF changes as the corpus grows, and a document's norm depends on it.
+Norms are computed with the IDF current at insertion and all of them are
+recomputed (one pass over the nonzeros) once the corpus has drifted more
+than ``refresh_ratio`` since the last refresh. Deleted documents are masked
+out and their nonzeros dropped once they are a quarter of the arrays.
+"""
+
+import math
+from collections import Counter
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .search_index import tokenize
+
+
+class TfidfIndex:
+    """Incremental sparse TF-IDF vectors with cosine top-k search."""
+
+    def __init__(self, refresh_ratio: float = 0.1):
+        self.refresh_ratio = refresh_ratio
+        self._vocabulary: Dict[str, int] = {}
+        self._df = np.zeros(1024, dtype=np.int64)
+        self._slots: Dict[str, int] = {}
+        self._uris: List[Optional[str]] = []
+        self._alive = np.zeros(1024, dtype=bool)
+        self._norms = np.zeros(1024, dtype=np.float32)
+        self._doc = np.zeros(4096, dtype=np.int32)
+        self._term = np.zeros(4096, dtype=np.int32)
+        self._tf = np.zeros(4096, dtype=np.float32)
+        self._nnz = 0
+        self._postings: List[np.ndarray] = []  # term id -> positions in the nonzero arrays
+        self._posting_sizes: List[int] = []
+        self._dead_nnz = 0
+        self._idf_count = 0  # live documents when the norms were last recomputed
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # ------------------------------------------------------------------ updates
+
+    def _idf(self, count: Optional[int] = None) -> np.ndarray:
+        count = len(self._slots) if count is None else count
+        df = self._df[:len(self._vocabulary)]
+        # Smoothed, as in scikit-learn: terms in every document still weigh 1
+        return (np.log((1 + count) / (1 + df)) + 1).astype(np.float32)
+
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        if size <= len(array):
+            return array
+        grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def add(self, uri: str, text: str) -> None:
+        if uri in self._slots:
+            self.remove(uri)
+        counts = Counter(tokenize(text))
+        term_ids = []
+        for term in counts:
+            term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+            if term_id == len(self._postings):
+                self._postings.append(np.zeros(4, dtype=np.int32))
+                self._posting_sizes.append(0)
+            term_ids.append(term_id)
+        self._df = self._grow(self._df, len(self._vocabulary))
+        term_ids = np.array(term_ids, dtype=np.int32)
+        self._df[term_ids] += 1
+
+        slot = len(self._uris)
+        self._uris.append(uri)
+        self._slots[uri] = slot
+        self._alive = self._grow(self._alive, slot + 1)
+        self._norms = self._grow(self._norms, slot + 1)
+        self._alive[slot] = True
+
+        tf = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        start, end = self._nnz, self._nnz + len(term_ids)
+        self._doc = self._grow(self._doc, end)
+        self._term = self._grow(self._term, end)
+        self._tf = self._grow(self._tf, end)
+        self._doc[start:end] = slot
+        self._term[start:end] = term_ids
+        self._tf[start:end] = tf
+        self._nnz = end
+        for position, term_id in enumerate(term_ids.tolist(), start):
+            size = self._posting_sizes[term_id]
+            self._postings[term_id] = self._grow(self._postings[term_id], size + 1)
+            self._postings[term_id][size] = position
+            self._posting_sizes[term_id] = size + 1
+
+        if abs(len(self._slots) - self._idf_count) > self.refresh_ratio * max(self._idf_count, 1):
+            self._refresh_norms()
+        else:
+            self._norms[slot] = np.sqrt(np.sum((tf * self._idf(self._idf_count)[term_ids]) ** 2))
+
+    def remove(self, uri: str) -> None:
+        slot = self._slots.pop(uri, None)
+        if slot is None:
+            return
+        self._alive[slot] = False
+        self._uris[slot] = None
+        # Slots are appended in order and compaction keeps that order, so _doc is sorted
+        doc = self._doc[:self._nnz]
+        start, end = np.searchsorted(doc, np.int32(slot), "left"), np.searchsorted(doc, np.int32(slot), "right")
+        self._df[self._term[start:end]] -= 1
+        self._dead_nnz += end - start
+        if self._dead_nnz > self._nnz // 4:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop deleted documents' nonzeros and renumber the live slots densely."""
+        live_slots = np.flatnonzero(self._alive[:len(self._uris)])
+        new_slot = np.full(len(self._uris), -1, dtype=np.int32)
+        new_slot[live_slots] = np.arange(len(live_slots), dtype=np.int32)
+        keep = self._alive[self._doc[:self._nnz]]
+        self._doc = new_slot[self._doc[:self._nnz][keep]]
+        self._term = self._term[:self._nnz][keep]
+        self._tf = self._tf[:self._nnz][keep]
+        self._nnz = len(self._doc)
+        self._dead_nnz = 0
+        self._norms = self._norms[live_slots]
+        self._uris = [self._uris[slot] for slot in live_slots]
+        self._slots = {uri: slot for slot, uri in enumerate(self._uris)}
+        self._alive = np.ones(len(self._uris), dtype=bool)
+        # Positions moved: rebuild the postings from a stable sort by term
+        order = np.argsort(self._term, kind="stable").astype(np.int32)
+        sizes = np.bincount(self._term, minlength=len(self._postings))
+        bounds = np.concatenate(([0], np.cumsum(sizes)))
+        self._postings = [order[bounds[i]:bounds[i + 1]].copy() for i in range(len(sizes))]
+        self._posting_sizes = sizes.tolist()
+
+    def _refresh_norms(self) -> None:
+        self._idf_count = len(self._slots)
+        idf = self._idf(self._idf_count)
+        weights = self._tf[:self._nnz] * idf[self._term[:self._nnz]]
+        norms = np.sqrt(np.bincount(self._doc[:self._nnz], weights=weights * weights, minlength=len(self._uris)))
+        self._norms = self._grow(norms.astype(np.float32), len(self._alive))
+
+    # ------------------------------------------------------------------ queries
+
+    def search(self, text: str, limit: int = 5, accept: Optional[Callable[[str], bool]] = None,
+               candidates: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """Top ``limit`` (uri, cosine similarity) pairs for ``text``.
+        
+        ``candidates`` restricts the result to those URIs (cheap, vectorized);
+        ``accept`` filters URIs one at a time, best first.
+        """
+        counts = Counter(term for term in tokenize(text) if term in self._vocabulary)
+        if not counts or not self._slots:
+            return []
+        idf = self._idf(self._idf_count)
+        term_ids = np.array([self._vocabulary[term] for term in counts], dtype=np.int32)
+        query = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * idf[term_ids]
+        query_norm = math.sqrt(float(np.sum(query * query)))
+        if not query_norm:
+            return []
+
+        # Per-term factor of the dot product: doc tf * idf * query weight
+        factor = np.zeros(len(self._vocabulary), dtype=np.float32)
+        factor[term_ids] = idf[term_ids] * query / query_norm
+        selected = np.concatenate([self._postings[t][:self._posting_sizes[t]] for t in term_ids.tolist()])
+        dots = np.bincount(self._doc[selected], weights=self._tf[selected] * factor[self._term[selected]],
+                           minlength=len(self._uris))
+        norms = self._norms[:len(self._uris)]
+        scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        scores[~self._alive[:len(self._uris)]] = 0
+        if candidates is not None:
+            keep = np.zeros(len(scores), dtype=bool)
+            keep[[self._slots[uri] for uri in candidates if uri in self._slots]] = True
+            scores[~keep] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if accept is None:
+            return [(self._uris[slot], float(scores[slot])) for slot in self._top(scores, candidates, limit)]
+        return self._filtered_top(scores, candidates, limit, accept)
+
+    @staticmethod
+    def _top(scores: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+        """The ``k`` best candidates, best first."""
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def _filtered_top(self, scores: np.ndarray, candidates: np.ndarray, limit: int,
+                      accept: Callable[[str], bool]) -> List[Tuple[str, float]]:
+        """Rank a few times ``limit`` candidates at a time until ``limit`` of them pass ``accept``."""
+        results: List[Tuple[str, float]] = []
+        checked = set()
+        k = 4 * limit
+        while True:
+            # argpartition may order ties differently per k, hence a set rather than an offset
+            for slot in self._top(scores, candidates, k):
+                if slot in checked:
+                    continue
+                checked.add(slot)
+                uri = self._uris[slot]
+                if accept(uri):
+                    results.append((uri, float(scores[slot])))
+                    if len(results) == limit:
+                        return results
+            if k >= len(candidates):
+                return sorted(results, key=lambda item: -item[1])
+            k *= 4
@@ -0,0 +1,113 @@
+"""Retention policies for memories, enforced by a background sweeper.
+
+Policies are per category, with ``*`` for categories not listed, and come
+from ``MCP_RETENTION`` as JSON (unset or empty: every memory is kept and
+no sweeper thread is started):
+
+    {"observation": {"ttl_days": 90, "max_per_patient": 100, "compact": true},
+     "*": {"max_per_patient": 200, "compact": true}}
+
+- ``ttl_days``: memories older than this are expired
+- ``max_per_patient``: only the newest N memories of the category are kept
+  per patient (memories without a patient count as one group)
+- ``compact``: expired memories are rolled into one digest memory per
+  patient and category (``memory:{patient}:{category}:digest``) instead of
+  being deleted, so get_memories stays bounded without losing them outright
+
+The digest holds one dated line per rolled-up memory, oldest first, and
+keeps the newest ``MAX_DIGEST_CHARS`` of them.
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+MAX_DIGEST_CHARS = 8000
+DIGEST_SUFFIX = ":digest"
+
+_OMITTED = re.compile(r"^- \.\.\. (\d+) older entries omitted$")
+
+
+class RetentionPolicy:
+    """How long and how many memories of one category are kept."""
+
+    def __init__(self, ttl_days: Optional[float] = None, max_per_patient: Optional[int] = None, compact: bool = False):
+        self.ttl_days = ttl_days
+        self.max_per_patient = max_per_patient
+        self.compact = compact
+
+    def __repr__(self) -> str:
+        return f"RetentionPolicy(ttl_days={self.ttl_days}, max_per_patient={self.max_per_patient}, compact={self.compact})"
+
+
+def parse_policies(spec: Optional[str]) -> Dict[str, RetentionPolicy]:
+    """Policies by category from the JSON in ``MCP_RETENTION``; empty (keep everything) for an empty spec."""
+    if not spec:
+        return {}
+    try:
+        raw = json.loads(spec)
+        return {category: RetentionPolicy(options.get("ttl_days"), options.get("max_per_patient"),
+                                          bool(options.get("compact")))
+                for category, options in raw.items()}
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid MCP_RETENTION policy JSON: {e}")
+
+
+def digest_uri(patient_id: Optional[str], category: str) -> str:
+    owner = f"{patient_id}:" if patient_id else ""
+    return f"memory:{owner}{category}{DIGEST_SUFFIX}"
+
+
+def is_digest(uri: str) -> bool:
+    return uri.endswith(DIGEST_SUFFIX)
+
+
+def build_digest(category: str, previous: Optional[str], memories: List[Dict[str, Any]]) -> str:
+    """Digest text: the previous digest's lines plus one line per memory (dicts with date and text), oldest first."""
+    omitted = 0
+    lines: List[str] = []
+    for line in (previous or "").splitlines()[1:]:
+        match = _OMITTED.match(line)
+        if match:
+            omitted += int(match.group(1))
+        elif line.startswith("- "):
+            lines.append(line)
+    lines += ["- {}: {}".format(memory["date"][:10], " ".join(memory["text"].split())) for memory in memories]
+
+    # Keep the newest entries that fit
+    size = sum(len(line) + 1 for line in lines)
+    dropped = 0
+    while size > MAX_DIGEST_CHARS and dropped < len(lines) - 1:
+        size -= len(lines[dropped]) + 1
+        dropped += 1
+    omitted += dropped
+    lines = lines[dropped:]
+    header = f"Digest of earlier {category} memories, oldest first:"
+    return "\n".join([header] + ([f"- ... {omitted} older entries omitted"] if omitted else []) + lines)
+
+
+class RetentionSweeper:
+    """Calls ``server.apply_retention()`` every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, server, interval: float):
+        self.server = server
+        self.interval = interval
+        self.last_result: Optional[Dict[str, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="mcp-retention", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = self.server.apply_retention()
+            except Exception as e:
+                print(f"Error applying memory retention: {e}")
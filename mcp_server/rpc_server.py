@@ -0,0 +1,375 @@
+"""MCP protocol server: JSON-RPC 2.0 over stdio or HTTP/SSE.
+
+Exposes the process's MCPServer (tools, resources, resource templates) to
+external MCP clients, so the registry and memories are no longer tied to
+the Streamlit process that imports ``mcp_server.app``.
+
+    python -m mcp_server.rpc_server                  # stdio, for desktop MCP clients
+    python -m mcp_server.rpc_server --http --port 8010
+
+Over HTTP, ``GET /sse`` opens an event stream whose first event names the
+session's POST endpoint (``/messages?session_id=...``); responses come back
+as ``message`` events. ``POST /rpc`` answers a request (or batch) directly.
+
+Requests are pipelined: each one runs as its own task and responses are
+written as they complete, in any order. At most ``max_in_flight`` requests
+run per connection; beyond that the stdio reader stops reading and POSTs
+wait before they are accepted, so a fast client is slowed down instead of
+queueing unbounded work. Tool calls run on a thread pool, off the event loop.
+
+stdio and SSE connections can ``resources/subscribe`` to URIs and receive
+``notifications/resources/updated`` and ``notifications/resources/list_changed``
+on the same stream, coalesced and rate-limited by MCPServer's SubscriptionHub.
+``POST /rpc`` has no stream, so it can't subscribe.
+
+``GET /metrics`` serves per-operation timings, payload sizes, result and
+error counts (see ``mcp_server.metrics``) in the Prometheus text format.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from . import __version__
+from .app import mcp_server
+from .metrics import metrics
+from .resources.content_cache import json_bytes
+from .tools import TOOL_DEFINITIONS, ToolError, call_tool_json
+
+PROTOCOL_VERSION = "2024-11-05"
+MAX_IN_FLIGHT = int(os.getenv("MCP_MAX_IN_FLIGHT", "64"))
+WORKERS = int(os.getenv("MCP_WORKERS", "8"))
+
+# JSON-RPC error codes
+PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND, INVALID_PARAMS, INTERNAL_ERROR = -32700, -32600, -32601, -32602, -32603
+RESOURCE_NOT_FOUND = -32002
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _dumps(message: Any) -> bytes:
+    return json_bytes(message)
+
+
+class Connection:
+    """One client stream; its subscriber receives notifications through ``send``."""
+
+    def __init__(self, server, send: Callable[[List[Dict[str, Any]]], None]):
+        self.server = server
+        self.subscriber_id = server.add_subscriber(send)
+
+    def close(self) -> None:
+        self.server.remove_subscriber(self.subscriber_id)
+
+
+class MCPProtocol:
+    """Transport-independent MCP method dispatch for one MCPServer."""
+
+    def __init__(self, server=mcp_server, workers: int = WORKERS):
+        self.server = server
+        # MCPServer's registry is behind a reader-writer lock, so calls into it run concurrently
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcp-rpc")
+        self._methods = {
+            "initialize": self._initialize,
+            "ping": lambda params: {},
+            "tools/list": lambda params: {"tools": [_mcp_tool(tool) for tool in TOOL_DEFINITIONS]},
+            "tools/call": self._call_tool,
+            "resources/list": self._list_resources,
+            "resources/read": self._read_resource,
+            "resources/templates/list": self._list_templates,
+        }
+        # Cheap and connection-bound, so these run on the event loop
+        self._connection_methods = {
+            "resources/subscribe": self._subscribe,
+            "resources/unsubscribe": self._unsubscribe,
+        }
+
+    async def handle(self, message: Any, connection: Optional[Connection] = None) -> Optional[Any]:
+        """Response for a request, list of responses for a batch, None for notifications."""
+        if isinstance(message, list):
+            if not message:
+                return _error(None, INVALID_REQUEST, "Empty batch")
+            responses = await asyncio.gather(*[self.handle(item, connection) for item in message])
+            return [response for response in responses if response is not None] or None
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or not isinstance(message.get("method"), str):
+            return _error(message.get("id") if isinstance(message, dict) else None, INVALID_REQUEST, "Invalid request")
+
+        request_id = message.get("id")
+        is_notification = "id" not in message
+        method = self._methods.get(message["method"])
+        connection_method = self._connection_methods.get(message["method"])
+        try:
+            if method is None and connection_method is None:
+                if message["method"].startswith("notifications/"):
+                    return None
+                raise RPCError(METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+            params = message.get("params") or {}
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params must be an object")
+            if connection_method is not None:
+                result = connection_method(params, connection)
+            else:
+                result = await self._run(method, params)
+        except RPCError as e:
+            return None if is_notification else _error(request_id, e.code, e.message)
+        except Exception as e:
+            print(f"Error handling {message['method']}: {e}", file=sys.stderr)
+            return None if is_notification else _error(request_id, INTERNAL_ERROR, str(e))
+        return None if is_notification else {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def _run(self, method, params: Dict[str, Any]) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, method, params)
+
+    # ------------------------------------------------------------------ methods (run on the pool)
+
+    def _initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Start loading patients in the background; resources appear as they arrive
+        self.server.initialize(wait_for=0)
+        return {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {"tools": {}, "resources": {"subscribe": True, "listChanged": True}},
+            "serverInfo": {"name": self.server.server_name, "version": __version__},
+        }
+
+    def _call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(params.get("name"), str):
+            raise RPCError(INVALID_PARAMS, "Missing tool name")
+        try:
+            payload = call_tool_json(self.server, params["name"], params.get("arguments") or {})
+        except ToolError as e:
+            # Tool failures are results the model should see, not protocol errors
+            return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        return {"content": [{"type": "text", "text": payload.decode("utf-8")}], "isError": False}
+
+    def _list_resources(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        resources, next_cursor = self.server.list_resources(None, params.get("cursor"))
+        result: Dict[str, Any] = {"resources": [{
+            "uri": resource["uri"],
+            "name": resource["metadata"].get("name") or resource["uri"],
+            "mimeType": "application/json",
+        } for resource in resources]}
+        if next_cursor:
+            result["nextCursor"] = next_cursor
+        return result
+
+    def _read_resource(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        uri = params.get("uri")
+        if not isinstance(uri, str):
+            raise RPCError(INVALID_PARAMS, "Missing uri")
+        payload = self.server.read_resource_json(uri)
+        if payload is None:
+            raise RPCError(RESOURCE_NOT_FOUND, f"Resource not found: {uri}")
+        return {"contents": [{"uri": uri, "mimeType": "application/json", "text": payload.decode("utf-8")}]}
+
+    def _list_templates(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"resourceTemplates": [dict(template, mimeType="application/json")
+                                      for template in self.server.resource_templates()]}
+
+    # ------------------------------------------------------------------ subscriptions (run on the loop)
+
+    def _subscription_uri(self, params: Dict[str, Any], connection: Optional[Connection]) -> str:
+        if connection is None:
+            raise RPCError(INVALID_REQUEST, "Subscriptions need a stream: use stdio or GET /sse")
+        if not isinstance(params.get("uri"), str):
+            raise RPCError(INVALID_PARAMS, "Missing uri")
+        return params["uri"]
+
+    def _subscribe(self, params: Dict[str, Any], connection: Optional[Connection]) -> Dict[str, Any]:
+        uri = self._subscription_uri(params, connection)
+        self.server.subscribe(connection.subscriber_id, uri)
+        return {}
+
+    def _unsubscribe(self, params: Dict[str, Any], connection: Optional[Connection]) -> Dict[str, Any]:
+        uri = self._subscription_uri(params, connection)
+        self.server.unsubscribe(connection.subscriber_id, uri)
+        return {}
+
+
+def _mcp_tool(tool: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": tool["name"], "description": tool["description"], "inputSchema": tool["input_schema"]}
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+async def _handle_raw(protocol: MCPProtocol, raw: bytes, connection: Optional[Connection] = None) -> Optional[Any]:
+    try:
+        message = json.loads(raw)
+    except ValueError as e:
+        return _error(None, PARSE_ERROR, f"Parse error: {e}")
+    return await protocol.handle(message, connection)
+
+
+# ---------------------------------------------------------------------- stdio
+
+async def serve_stdio(protocol: MCPProtocol, max_in_flight: int = MAX_IN_FLIGHT) -> None:
+    """Newline-delimited JSON-RPC on stdin/stdout until stdin closes."""
+    loop = asyncio.get_running_loop()
+    # Keep the real stdout for protocol messages; print() from anywhere goes to stderr instead
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    reader = asyncio.StreamReader(limit=64 * 1024 * 1024)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    transport, stream_protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, protocol_out)
+    writer = asyncio.StreamWriter(transport, stream_protocol, None, loop)
+    write_lock = asyncio.Lock()
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+
+    async def notify(batch: List[Dict[str, Any]]):
+        async with write_lock:
+            writer.write(b"".join(_dumps(message) + b"\n" for message in batch))
+            await writer.drain()
+
+    def send(batch: List[Dict[str, Any]]):
+        # Called on the notification thread
+        asyncio.run_coroutine_threadsafe(notify(batch), loop)
+
+    connection = Connection(protocol.server, send)
+
+    async def respond(line: bytes):
+        try:
+            response = await _handle_raw(protocol, line, connection)
+            if response is not None:
+                async with write_lock:
+                    writer.write(_dumps(response) + b"\n")
+                    # Slow reader on the other end: wait here, holding the in-flight slot
+                    await writer.drain()
+        finally:
+            in_flight.release()
+
+    while True:
+        await in_flight.acquire()
+        line = await reader.readline()
+        if not line:
+            in_flight.release()
+            break
+        if not line.strip():
+            in_flight.release()
+            continue
+        task = asyncio.create_task(respond(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    connection.close()
+    writer.close()
+
+
+# ---------------------------------------------------------------------- HTTP / SSE
+
+class _SSESession:
+    def __init__(self, protocol: MCPProtocol, max_in_flight: int):
+        self.outbox: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=max_in_flight)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.tasks = set()
+        loop = asyncio.get_running_loop()
+        # A batch of notifications is one outbox item, sent as one event per message
+        self.connection = Connection(protocol.server,
+                                     lambda batch: asyncio.run_coroutine_threadsafe(self.outbox.put(tuple(batch)), loop))
+
+
+def create_app(protocol: MCPProtocol, max_in_flight: int = MAX_IN_FLIGHT):
+    from fastapi import FastAPI, HTTPException, Request, Response
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    sessions: Dict[str, _SSESession] = {}
+
+    @app.get("/sse")
+    async def open_stream(request: Request):
+        session_id = uuid.uuid4().hex
+        session = sessions[session_id] = _SSESession(protocol, max_in_flight)
+
+        async def events():
+            try:
+                yield f"event: endpoint\ndata: /messages?session_id={session_id}\n\n"
+                while not await request.is_disconnected():
+                    try:
+                        message = await asyncio.wait_for(session.outbox.get(), timeout=15)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    # Responses are single messages (or a batch, as a JSON array); notifications come as a tuple
+                    for item in (message if isinstance(message, tuple) else (message,)):
+                        yield f"event: message\ndata: {_dumps(item).decode('utf-8')}\n\n"
+            finally:
+                sessions.pop(session_id, None)
+                session.connection.close()
+                for task in session.tasks:
+                    task.cancel()
+
+        return StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.post("/messages", status_code=202)
+    async def post_message(session_id: str, request: Request):
+        session = sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Unknown or closed session")
+        raw = await request.body()
+        # Backpressure: the POST isn't accepted until the session has a free slot
+        await session.in_flight.acquire()
+
+        async def respond():
+            try:
+                response = await _handle_raw(protocol, raw, session.connection)
+                if response is not None:
+                    # Bounded outbox: a stream that isn't being read holds this slot
+                    await session.outbox.put(response)
+            finally:
+                session.in_flight.release()
+
+        task = asyncio.create_task(respond())
+        session.tasks.add(task)
+        task.add_done_callback(session.tasks.discard)
+        return Response(status_code=202)
+
+    rpc_slots = asyncio.Semaphore(max_in_flight)
+
+    @app.post("/rpc")
+    async def rpc(request: Request):
+        raw = await request.body()
+        async with rpc_slots:
+            response = await _handle_raw(protocol, raw)
+        if response is None:
+            return Response(status_code=202)
+        return Response(_dumps(response), media_type="application/json")
+
+    @app.get("/metrics")
+    async def prometheus_metrics():
+        return Response(metrics.prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="MoveMend MCP server (JSON-RPC over stdio or HTTP/SSE)")
+    parser.add_argument("--http", action="store_true", help="Serve HTTP/SSE instead of stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args(argv)
+
+    protocol = MCPProtocol(mcp_server, args.workers)
+    if args.http:
+        import uvicorn
+        uvicorn.run(create_app(protocol, args.max_in_flight), host=args.host, port=args.port, log_level="warning")
+    else:
+        asyncio.run(serve_stdio(protocol, args.max_in_flight))
+
+
+if __name__ == "__main__":
+    main()
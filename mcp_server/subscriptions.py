@@ -0,0 +1,192 @@
+"""Resource change notifications for MCPServer consumers.
+
+The registry reports every add, replace and remove to the SubscriptionHub.
+Each subscriber gets MCP notifications:
+
+- ``notifications/resources/updated`` for each changed URI it subscribed to;
+  a patient sub-resource (``patient:{id}/vitals``) changes with its patient,
+  and a trailing ``*`` makes a prefix, e.g. ``memory:patient-1:*``
+- ``notifications/resources/list_changed`` when resources were added or
+  removed, if it asked for those
+
+Changes are coalesced per subscriber and delivered at most once per
+``min_interval`` seconds: a burst of 500 memory writes becomes one batch,
+and a URI that changed ten times is reported once. A batch with more than
+``max_updates`` URIs is replaced by a single list_changed, which tells the
+subscriber to re-list instead.
+
+Delivery runs on the hub's own thread, so a callback must not block for long
+(hand the batch to a queue or an event loop).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+Notification = Dict[str, Any]
+
+
+def _notification(method: str, params: Optional[Dict[str, Any]] = None) -> Notification:
+    message: Notification = {"jsonrpc": "2.0", "method": method}
+    if params is not None:
+        message["params"] = params
+    return message
+
+
+def _registry_uri(uri: str) -> str:
+    """The registered resource a URI reads from: patient:{id}/vitals?x=1 -> patient:{id}."""
+    if uri.startswith("patient:"):
+        return uri.split("/", 1)[0].split("?", 1)[0]
+    return uri
+
+
+class Subscriber:
+    """One consumer's subscriptions and its pending (not yet delivered) changes."""
+
+    def __init__(self, subscriber_id: int, callback: Callable[[List[Notification]], None],
+                 list_changed: bool, min_interval: float, max_updates: int):
+        self.id = subscriber_id
+        self.callback = callback
+        self.list_changed = list_changed
+        self.min_interval = min_interval
+        self.max_updates = max_updates
+        self.uris: Dict[str, Set[str]] = {}  # registry URI -> subscribed URIs it backs (itself, sub-resources)
+        self.prefixes: Set[str] = set()
+        self.pending_uris: Dict[str, None] = {}  # ordered set
+        self.pending_list_changed = False
+        self.last_delivery = 0.0
+        self.scheduled = False
+        self.delivered = 0
+        self.coalesced = 0
+
+    def matches(self, uri: str) -> List[str]:
+        """Subscribed URIs affected by a change to registry URI ``uri``."""
+        matched = list(self.uris.get(uri, ()))
+        if uri not in matched and any(uri.startswith(prefix) for prefix in self.prefixes):
+            matched.append(uri)
+        return matched
+
+    def take_batch(self) -> List[Notification]:
+        if len(self.pending_uris) > self.max_updates:
+            batch = [_notification("notifications/resources/list_changed")]
+        else:
+            batch = [_notification("notifications/resources/updated", {"uri": uri}) for uri in self.pending_uris]
+            if self.pending_list_changed:
+                batch.append(_notification("notifications/resources/list_changed"))
+        self.pending_uris = {}
+        self.pending_list_changed = False
+        return batch
+
+
+class SubscriptionHub:
+    """Registry change listener that coalesces and rate-limits notifications per subscriber."""
+
+    def __init__(self, min_interval: float = 0.5, max_updates: int = 100):
+        self.min_interval = min_interval
+        self.max_updates = max_updates
+        self._subscribers: Dict[int, Subscriber] = {}
+        self._ids = itertools.count(1)
+        self._due: List = []  # heap of (due time, subscriber id)
+        self._lock = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ subscriber API
+
+    def add_subscriber(self, callback: Callable[[List[Notification]], None], list_changed: bool = True,
+                       min_interval: Optional[float] = None, max_updates: Optional[int] = None) -> int:
+        with self._lock:
+            subscriber = Subscriber(next(self._ids), callback, list_changed,
+                                    self.min_interval if min_interval is None else min_interval,
+                                    self.max_updates if max_updates is None else max_updates)
+            self._subscribers[subscriber.id] = subscriber
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._deliver_loop, name="mcp-notifications", daemon=True)
+                self._thread.start()
+            return subscriber.id
+
+    def remove_subscriber(self, subscriber_id: int) -> None:
+        with self._lock:
+            self._subscribers.pop(subscriber_id, None)
+
+    def subscribe(self, subscriber_id: int, uri: str) -> bool:
+        with self._lock:
+            subscriber = self._subscribers.get(subscriber_id)
+            if subscriber is None:
+                return False
+            if uri.endswith("*"):
+                subscriber.prefixes.add(uri[:-1])
+            else:
+                subscriber.uris.setdefault(_registry_uri(uri), set()).add(uri)
+            return True
+
+    def unsubscribe(self, subscriber_id: int, uri: str) -> bool:
+        with self._lock:
+            subscriber = self._subscribers.get(subscriber_id)
+            if subscriber is None:
+                return False
+            if uri.endswith("*"):
+                if uri[:-1] not in subscriber.prefixes:
+                    return False
+                subscriber.prefixes.discard(uri[:-1])
+                return True
+            backing = subscriber.uris.get(_registry_uri(uri), set())
+            if uri not in backing:
+                return False
+            backing.discard(uri)
+            if not backing:
+                del subscriber.uris[_registry_uri(uri)]
+            return True
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            return {s.id: {"uris": sum(map(len, s.uris.values())) + len(s.prefixes), "pending": len(s.pending_uris),
+                           "delivered": s.delivered, "coalesced": s.coalesced}
+                    for s in self._subscribers.values()}
+
+    # ------------------------------------------------------------------ registry listener
+
+    def resource_changed(self, event: str, uri: str) -> None:
+        """Called by the registry on "added", "updated" and "removed"."""
+        now = time.monotonic()
+        with self._lock:
+            for subscriber in self._subscribers.values():
+                changed = False
+                for matched in subscriber.matches(uri):
+                    if matched in subscriber.pending_uris:
+                        subscriber.coalesced += 1
+                    else:
+                        subscriber.pending_uris[matched] = None
+                        changed = True
+                if subscriber.list_changed and event != "updated":
+                    if subscriber.pending_list_changed:
+                        subscriber.coalesced += 1
+                    else:
+                        subscriber.pending_list_changed = changed = True
+                if changed and not subscriber.scheduled:
+                    subscriber.scheduled = True
+                    heapq.heappush(self._due, (max(now, subscriber.last_delivery + subscriber.min_interval),
+                                               subscriber.id))
+                    self._lock.notify()
+
+    # ------------------------------------------------------------------ delivery
+
+    def _deliver_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._due or self._due[0][0] > time.monotonic():
+                    self._lock.wait(None if not self._due else self._due[0][0] - time.monotonic())
+                _, subscriber_id = heapq.heappop(self._due)
+                subscriber = self._subscribers.get(subscriber_id)
+                if subscriber is None:
+                    continue
+                subscriber.scheduled = False
+                subscriber.last_delivery = time.monotonic()
+                batch = subscriber.take_batch()
+                subscriber.delivered += len(batch)
+                callback = subscriber.callback
+            try:
+                callback(batch)
+            except Exception as e:
+                print(f"Error delivering notifications to subscriber {subscriber_id}: {e}")
@@ -0,0 +1,270 @@
+"""MCP tool definitions and dispatch, shared by the Claude client and the JSON-RPC server."""
+
+import time
+from typing import Any, Callable, Dict, List
+
+from .metrics import metrics
+from .resources.content_cache import json_bytes
+
+TOOL_DEFINITIONS: List[Dict[str, Any]] = [
+    {
+        "name": "list_resources",
+        "description": "Lists the available resources from the MCP server.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "resource_type": {
+                    "type": "string",
+                    "description": "Optional type of resource to filter by (e.g., 'patient', 'memory')."
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "Pagination cursor for getting the next page of results."
+                },
+                "page_size": {
+                    "type": "integer",
+                    "description": "Optional number of resources per page (default 10)."
+                }
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "read_resource",
+        "description": "Reads the content of a specific resource by URI. A whole patient record (patient:{id}) is very large; prefer the sub-resource URIs from list_resources' resource_templates, e.g. patient:{id}/conditions, patient:{id}/vitals, patient:{id}/observations?code=8302-2&since=2020-01-01, patient:{id}/movemend/sessions?limit=10.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "uri": {
+                    "type": "string",
+                    "description": "URI of the resource (or patient sub-resource) to read."
+                }
+            },
+            "required": ["uri"]
+        }
+    },
+    {
+        "name": "generate_voice",
+        "description": "Generates speech audio from text using Hume AI voice synthesis.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "The text to convert to speech."
+                },
+                "voice_id": {
+                    "type": "string",
+                    "description": "Optional voice ID to use (default: samantha)."
+                }
+            },
+            "required": ["text"]
+        }
+    },
+    {
+        "name": "create_memory",
+        "description": "Creates a new memory entry in the MCP server.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "content": {
+                    "type": "string",
+                    "description": "The content of the memory to store."
+                },
+                "category": {
+                    "type": "string",
+                    "description": "Category of the memory (e.g., 'clinical_insight', 'patient_preference', 'observation')."
+                },
+                "patient_id": {
+                    "type": "string",
+                    "description": "Optional patient ID to associate this memory with."
+                }
+            },
+            "required": ["content", "category"]
+        }
+    },
+    {
+        "name": "get_memories",
+        "description": "Retrieves memories from the MCP server with optional filters. Older memories of a patient and category may have been rolled into one digest memory (URI ending in ':digest') listing them by date.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "patient_id": {
+                    "type": "string",
+                    "description": "Optional patient ID to filter memories by."
+                },
+                "category": {
+                    "type": "string",
+                    "description": "Optional category to filter memories by."
+                }
+            },
+            "required": []
+        }
+    },
+    {
+        "name": "search_memories",
+        "description": "Searches memory content by relevance (BM25) and returns the best matches. Prefer this over get_memories when looking for something specific.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Free-text query, e.g. 'knee pain after exercise'."
+                },
+                "patient_id": {
+                    "type": "string",
+                    "description": "Optional patient ID to filter memories by."
+                },
+                "category": {
+                    "type": "string",
+                    "description": "Optional category to filter memories by."
+                },
+                "since": {
+                    "type": "string",
+                    "description": "Optional ISO timestamp; only memories created at or after it."
+                },
+                "until": {
+                    "type": "string",
+                    "description": "Optional ISO timestamp; only memories created at or before it."
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of memories to return (default 5)."
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "find_similar",
+        "description": "Finds the memories, and optionally clinical notes, most similar to a piece of text (TF-IDF cosine similarity). Useful when wording may differ from the stored text.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "Text to compare against, e.g. a symptom description or a draft note."
+                },
+                "patient_id": {
+                    "type": "string",
+                    "description": "Optional patient ID to filter results by."
+                },
+                "include_notes": {
+                    "type": "boolean",
+                    "description": "Also search the patients' clinical notes (default false)."
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of results to return (default 5)."
+                }
+            },
+            "required": ["text"]
+        }
+    },
+    {
+        "name": "delete_memory",
+        "description": "Deletes a memory from the MCP server by URI.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "memory_uri": {
+                    "type": "string",
+                    "description": "URI of the memory to delete."
+                }
+            },
+            "required": ["memory_uri"]
+        }
+    }
+]
+
+
+class ToolError(Exception):
+    """Raised for an unknown tool or missing arguments."""
+
+
+def _require(arguments: Dict[str, Any], name: str) -> Any:
+    if not arguments.get(name):
+        raise ToolError(f"Missing required '{name}' parameter")
+    return arguments[name]
+
+
+def _list_resources(server, arguments):
+    resources, next_cursor = server.list_resources(arguments.get("resource_type"), arguments.get("cursor"),
+                                                   arguments.get("page_size"))
+    result = {"resources": resources, "next_cursor": next_cursor}
+    if not arguments.get("cursor"):
+        result["resource_templates"] = server.resource_templates()
+    return result
+
+
+def _search_memories(server, arguments):
+    try:
+        return server.search_memories(_require(arguments, "query"), arguments.get("patient_id"), arguments.get("category"),
+                                      arguments.get("since"), arguments.get("until"), arguments.get("limit") or 5)
+    except ValueError as e:
+        raise ToolError(f"Invalid since/until timestamp: {e}")
+
+
+def _read_resource(server, arguments):
+    uri = _require(arguments, "uri")
+    resource = server.read_resource(uri)
+    if resource is None:
+        raise ToolError(f"Resource not found: {uri}")
+    return resource
+
+
+_HANDLERS: Dict[str, Callable[[Any, Dict[str, Any]], Any]] = {
+    "list_resources": _list_resources,
+    "read_resource": _read_resource,
+    "generate_voice": lambda server, a: server.generate_voice(_require(a, "text"), a.get("voice_id", "samantha")),
+    "create_memory": lambda server, a: server.create_memory(_require(a, "content"), _require(a, "category"),
+                                                            a.get("patient_id")),
+    "get_memories": lambda server, a: server.get_memories(a.get("patient_id"), a.get("category")),
+    "search_memories": _search_memories,
+    "find_similar": lambda server, a: server.find_similar(_require(a, "text"), a.get("patient_id"),
+                                                          bool(a.get("include_notes")), a.get("limit") or 5),
+    "delete_memory": lambda server, a: {"success": server.delete_memory(_require(a, "memory_uri"))},
+}
+
+
+def _timed(name: str, run: Callable[[], Any], measure_payload: bool) -> Any:
+    """Run one tool call, recorded as ("tool", name); unknown tool names share one series."""
+    operation = name if name in _HANDLERS else "unknown"
+    start = time.perf_counter()
+    try:
+        result = run()
+    except Exception as e:
+        metrics.record("tool", operation, time.perf_counter() - start, error=type(e).__name__)
+        raise
+    metrics.record("tool", operation, time.perf_counter() - start, result, measure_payload=measure_payload)
+    return result
+
+
+def _dispatch(server, name: str, arguments: Dict[str, Any]) -> Any:
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        raise ToolError(f"Unknown tool: {name}")
+    return handler(server, arguments or {})
+
+
+def call_tool(server, name: str, arguments: Dict[str, Any]) -> Any:
+    """Run tool ``name`` against an MCPServer. Raises ToolError for unknown tools or missing arguments."""
+    # A whole patient record would be encoded just to size it
+    return _timed(name, lambda: _dispatch(server, name, arguments), measure_payload=name != "read_resource")
+
+
+def call_tool_json(server, name: str, arguments: Dict[str, Any]) -> bytes:
+    """``call_tool`` with the result as compact JSON bytes.
+    
+    read_resource returns the resource's cached encoding, so reading the
+    same patient record again doesn't rebuild and re-encode its dict.
+    """
+    def run():
+        if name == "read_resource":
+            uri = _require(arguments or {}, "uri")
+            payload = server.read_resource_json(uri)
+            if payload is None:
+                raise ToolError(f"Resource not found: {uri}")
+            return payload
+        return json_bytes(_dispatch(server, name, arguments))
+    return _timed(name, run, measure_payload=True)
@@ -23,18 +23,26 @@ def start_servers():
         python_executable, "-m", "uvicorn", "movemend_record_database.app:app", "--port", "8002"
     ])
     
+    # Start the gateway that joins both sources into one /linked_patients stream
+    db_gateway = subprocess.Popen([
+        python_executable, "-m", "uvicorn", "linked_record_gateway.app:app", "--port", "8003"
+    ])
+    
     print("Servers started successfully!")
     print("Medical Records server running at: http://127.0.0.1:8001")
     print("Movemend Records server running at: http://127.0.0.1:8002")
+    print("Linked records gateway running at: http://127.0.0.1:8003")
     
     try:
         # Keep the servers running until keyboard interrupt
         db_medical_records.wait()
         db_other.wait()
+        db_gateway.wait()
     except KeyboardInterrupt:
         print("Shutting down servers...")
         db_medical_records.terminate()
         db_other.terminate()
+        db_gateway.terminate()
 
 if __name__ == "__main__":
     start_servers()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""ContentCache budget accounting for lazily loaded patient records."""
+
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.resources import ContentCache, PatientResource, ResourceRegistry
+from mcp_server.resources.content_cache import json_size
+
+
+def patient(patient_id, cache, size=1000, preloaded=True):
+    data = {"id": patient_id, "data": "x" * size}
+    return PatientResource(data if preloaded else None, {"patient_id": patient_id}, patient_id,
+                           loader=lambda: dict(data), cache=cache)
+
+
+def test_replacing_a_preloaded_patient_keeps_it_in_the_budget():
+    cache = ContentCache(max_bytes=10_000)
+    registry = ResourceRegistry()
+    registry.add_resource(patient("p1", cache))
+
+    # A retry registers a fresh, preloaded resource under the same URI
+    replacement = patient("p1", cache)
+    registry.add_resource(replacement)
+
+    assert replacement.loaded
+    stats = cache.stats()
+    assert stats["resident"] == 1
+    assert stats["bytes"] == json_size(replacement.content)
+
+    # It can still grow (cached encoding) and be evicted under the budget
+    replacement.to_json()
+    assert cache.stats()["bytes"] > json_size(replacement.content)
+    registry.add_resource(patient("p2", cache, size=9000))
+    assert not replacement.loaded
+
+
+def test_remove_forgets_the_resource():
+    cache = ContentCache(max_bytes=10_000)
+    registry = ResourceRegistry()
+    registry.add_resource(patient("p1", cache))
+    registry.remove_resource("patient:p1")
+    assert cache.stats()["resident"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_lru_eviction_and_reload():
+    cache = ContentCache(max_bytes=2500)
+    first, second = patient("p1", cache, preloaded=False), patient("p2", cache, preloaded=False)
+    assert first.content["id"] == "p1"
+    assert second.content["id"] == "p2"
+    assert first.content["id"] == "p1"  # p1 is now the most recently used
+    third = patient("p3", cache, preloaded=False)
+    assert third.content["id"] == "p3"
+
+    assert first.loaded and not second.loaded and third.loaded
+    assert cache.stats()["evictions"] == 1
+    assert second.content["id"] == "p2"  # reloaded on access
+    assert cache.stats()["bytes"] <= cache.max_bytes
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""MemoryStore persistence, tombstones and cross-process sync, on temporary SQLite files."""
+
+import os
+import sqlite3
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.resources import MemoryStore
+
+
+def open_store(tmp_path, **kwargs):
+    return MemoryStore(str(tmp_path / "memories.db"), **kwargs)
+
+
+def test_round_trip(tmp_path):
+    store = open_store(tmp_path)
+    store.put("memory:a", {"content": "knee pain", "category": "observation"},
+              {"patient_id": "p1", "category": "observation", "created": 1})
+    store.put("memory:b", {"content": "hip plan", "category": "plan"}, {"category": "plan"})
+    store.flush()
+
+    reopened = open_store(tmp_path)
+    records, last_seq = reopened.load()
+    assert [r["uri"] for r in records] == ["memory:a", "memory:b"]
+    assert records[0]["content"] == {"content": "knee pain", "category": "observation"}
+    assert records[0]["metadata"] == {"patient_id": "p1", "category": "observation", "created": 1}
+    assert not records[0]["deleted"]
+    assert last_seq == records[-1]["seq"]
+    store.close()
+    reopened.close()
+
+
+def test_replace_gets_new_seq(tmp_path):
+    store = open_store(tmp_path)
+    store.put("memory:a", {"content": "first"}, {})
+    store.put("memory:b", {"content": "other"}, {})
+    store.put("memory:a", {"content": "second"}, {})
+    store.flush()
+    records, _ = store.load()
+    assert [(r["uri"], r["content"]["content"]) for r in records] == [("memory:b", "other"), ("memory:a", "second")]
+    store.close()
+
+
+def test_changes_and_tombstones(tmp_path):
+    writer, reader = open_store(tmp_path), open_store(tmp_path)
+    _, seq = reader.load()
+    assert reader.changes(seq) == ([], seq)
+
+    writer.put("memory:a", {"content": "a"}, {})
+    writer.put("memory:b", {"content": "b"}, {})
+    writer.flush()
+    records, seq = reader.changes(seq)
+    assert [(r["uri"], r["deleted"]) for r in records] == [("memory:a", False), ("memory:b", False)]
+    # Nothing committed since: answered from data_version without a query
+    assert reader.changes(seq) == ([], seq)
+
+    writer.delete("memory:a")
+    writer.flush()
+    records, seq = reader.changes(seq)
+    assert [(r["uri"], r["deleted"], r["content"]) for r in records] == [("memory:a", True, None)]
+    assert [r["uri"] for r in reader.load()[0]] == ["memory:b"]
+    writer.close()
+    reader.close()
+
+
+def test_changes_skip_own_pending_writes(tmp_path):
+    store = open_store(tmp_path, flush_interval=0.5)
+    other = open_store(tmp_path)
+    _, seq = store.load()
+    other.put("memory:a", {"content": "theirs"}, {})
+    other.flush()
+    store.put("memory:a", {"content": "ours"}, {})  # still queued: it will replace theirs
+    records, _ = store.changes(seq)
+    assert records == []
+    store.flush()
+    assert store.load()[0][0]["content"] == {"content": "ours"}
+    store.close()
+    other.close()
+
+
+def test_purge_old_tombstones(tmp_path):
+    store = open_store(tmp_path, tombstone_days=7)
+    stale_reader = open_store(tmp_path)
+    _, stale_seq = stale_reader.load()
+
+    store.put("memory:a", {"content": "a"}, {})
+    store.put("memory:b", {"content": "b"}, {})
+    store.flush()
+    store.delete("memory:a")
+    store.flush()
+
+    assert store.purge() == 0  # too recent
+    assert store.purge(now=time.time() + 8 * 86400) == 1
+    rows = sqlite3.connect(store.path).execute("SELECT uri, deleted FROM memories").fetchall()
+    assert rows == [("memory:b", 0)]
+
+    # A reader that last synced before the purged tombstone must reload instead
+    records, seq = stale_reader.changes(stale_seq)
+    assert records is None and seq == stale_seq
+    # One that is past it still gets incremental changes
+    _, seq = stale_reader.load()
+    store.put("memory:c", {"content": "c"}, {})
+    store.flush()
+    assert [r["uri"] for r in stale_reader.changes(seq)[0]] == ["memory:c"]
+    store.close()
+    stale_reader.close()
+
+
+def test_servers_share_a_store(tmp_path):
+    path = str(tmp_path / "memories.db")
+    first = MCPServer(memory_db=path, retention="")
+    second = MCPServer(memory_db=path, retention="")
+
+    uri = first.create_memory("knee pain after stairs", "observation", "p1")["memory_uri"]
+    first.memory_store.flush()
+    memories = second.get_memories("p1")
+    assert [m["uri"] for m in memories] == [uri]
+    assert memories[0] == first.read_resource(uri)
+    assert second.search_memories("stairs")[0]["uri"] == uri
+
+    # Own writes come back from the store unchanged and keep their object
+    own = first.registry.get_resource(uri)
+    first.sync_memories()
+    assert first.registry.get_resource(uri) is own
+
+    assert second.delete_memory(uri)
+    second.memory_store.flush()
+    assert first.get_memories("p1") == []
+
+    # A new process warm-starts from the file, with the exact creation time
+    uri = first.create_memory("hip plan", "plan", "p2")["memory_uri"]
+    first.memory_store.flush()
+    third = MCPServer(memory_db=path, retention="")
+    assert third.registry.get_resource(uri).created == first.registry.get_resource(uri).created
+
+
+def test_server_reloads_after_missed_purge(tmp_path):
+    path = str(tmp_path / "memories.db")
+    active = MCPServer(memory_db=path, retention="")
+    idle = MCPServer(memory_db=path, retention="")
+    uris = [active.create_memory(f"note {i}", "observation", "p1")["memory_uri"] for i in range(3)]
+    active.memory_store.flush()
+    assert len(idle.get_memories("p1")) == 3
+
+    active.delete_memory(uris[0])
+    active.memory_store.flush()
+    active.memory_store.purge(now=time.time() + 30 * 86400)
+    assert [m["uri"] for m in idle.get_memories("p1")] == uris[:0:-1]
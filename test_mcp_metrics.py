@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Metrics: histogram buckets, sampling, error counts and the Prometheus text output."""
+
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.metrics import Histogram, Metrics, metrics
+
+
+def parse(text):
+    """Prometheus text -> {"name{labels}": value}, checking every metric has HELP and TYPE."""
+    samples, typed = {}, set()
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            typed.add(line.split()[2])
+        elif line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            base = name.split("{", 1)[0]
+            assert any(base == t or base in (f"{t}_bucket", f"{t}_sum", f"{t}_count") for t in typed), line
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_buckets_are_upper_inclusive():
+    histogram = Histogram((1, 5, 10))
+    for value in (0.5, 1, 1.5, 5, 7, 10, 11, 100):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 2, 2]  # <=1, <=5, <=10, +Inf
+    assert histogram.count == 8 and histogram.sum == 136 and histogram.max == 100
+    assert histogram.quantile(0.25) == 1
+    assert histogram.quantile(0.5) == 5
+    assert histogram.quantile(0.99) == 100  # in the +Inf bucket: the max
+    assert Histogram((1,)).quantile(0.5) == 0.0
+
+
+def test_instrument_records_results_errors_and_sampled_payloads():
+    registry = Metrics(payload_every=2)
+
+    @registry.instrument("tool")
+    def listing(n):
+        return [{"i": i} for i in range(n)]
+
+    @registry.instrument("tool", "raw")
+    def raw():
+        return b"x" * 300
+
+    @registry.instrument("tool")
+    def failing(kind):
+        if kind == "raise":
+            raise KeyError("missing")
+        return {"error": "bad input"}
+
+    for n in range(4):
+        listing(n)
+    raw()
+    raw()
+    failing("report")
+    with pytest.raises(KeyError):
+        failing("raise")
+
+    rows = {row["operation"]: row for row in registry.snapshot()}
+    assert rows["listing"]["calls"] == 4 and rows["listing"]["results"] == 6
+    assert registry._operations[("tool", "listing")].payload.count == 2  # every 2nd call is sized
+    assert registry._operations[("tool", "raw")].payload.count == 2  # bytes are always sized
+    assert rows["raw"]["mean_bytes"] == 300
+    assert rows["failing"]["errors"] == 2
+    assert rows["failing"]["error_types"] == {"ErrorResult": 1, "KeyError": 1}
+
+
+def test_prometheus_output():
+    registry = Metrics(payload_every=1)
+    for duration in (0.0004, 0.002, 0.002, 20.0):
+        registry.record("server", "get_memories", duration, [1, 2])
+    registry.record("tool", 'we"ird\nname', 0.01, error="ValueError")
+
+    text = registry.prometheus()
+    samples = parse(text)
+    labels = 'layer="server",operation="get_memories"'
+    assert samples[f'mcp_operation_duration_seconds_bucket{{{labels},le="0.0005"}}'] == 1
+    assert samples[f'mcp_operation_duration_seconds_bucket{{{labels},le="0.001"}}'] == 1
+    assert samples[f'mcp_operation_duration_seconds_bucket{{{labels},le="0.0025"}}'] == 3
+    assert samples[f'mcp_operation_duration_seconds_bucket{{{labels},le="10"}}'] == 3
+    assert samples[f'mcp_operation_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 4
+    assert samples[f"mcp_operation_duration_seconds_count{{{labels}}}"] == 4
+    assert samples[f"mcp_operation_duration_seconds_sum{{{labels}}}"] == pytest.approx(20.0044)
+    assert samples[f'mcp_operation_payload_bytes_bucket{{{labels},le="256"}}'] == 4
+    assert samples[f"mcp_operation_results_total{{{labels}}}"] == 8
+
+    # Label values are escaped; failed calls have no payload histogram
+    weird = 'layer="tool",operation="we\\"ird\\nname"'
+    assert samples[f'mcp_operation_errors_total{{{weird},error="ValueError"}}'] == 1
+    assert f"mcp_operation_payload_bytes_count{{{weird}}}" not in samples
+
+    # Buckets are cumulative
+    buckets = [v for k, v in samples.items() if k.startswith("mcp_operation_duration_seconds_bucket") and labels in k]
+    assert buckets == sorted(buckets)
+    assert text.endswith("\n")
+
+
+def test_server_operations_are_instrumented():
+    server = MCPServer(memory_db="", retention="")
+    before = {(r["layer"], r["operation"]): r["calls"] for r in metrics.snapshot()}
+    server.create_memory("knee pain", "observation", "p1")
+    server.get_memories("p1")
+    after = {(r["layer"], r["operation"]): r for r in metrics.snapshot()}
+    assert after[("server", "get_memories")]["calls"] == before.get(("server", "get_memories"), 0) + 1
+    assert after[("server", "create_memory")]["calls"] == before.get(("server", "create_memory"), 0) + 1
+    assert 'operation="get_memories"' in metrics.prometheus()
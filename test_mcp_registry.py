@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""Registry indexes, cursor paging and memory search, without the simulators."""
+
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.resources import MemoryResource, ResourceRegistry
+from mcp_server.resources.base import ANY
+
+BASE_US = 1_700_000_000_000_000
+
+
+def make_memory(text, category="observation", patient_id="p1", minute=0, uri=None):
+    return MemoryResource({"content": text, "category": category}, patient_id, uri=uri,
+                          created=BASE_US + minute * 60_000_000)
+
+
+def new_server():
+    return MCPServer(memory_db="", retention="")
+
+
+def assert_consistent(registry):
+    """Every index lists exactly the registered resources."""
+    uris = set(registry.resources)
+    assert set(registry._sort_keys) == uris
+    assert {uri for _, _, uri in registry._indexes.get((ANY, ANY, ANY), [])} == uris
+    assert {uri for _, uri in registry._by_seq.get(ANY, [])} == uris
+    assert len(registry.text_index) == len(uris)
+    assert len(registry.similarity_index) == len(uris)
+
+
+def test_query_after_add_replace_remove():
+    registry = ResourceRegistry()
+    first = make_memory("knee pain", "observation", "p1", minute=1, uri="memory:a")
+    second = make_memory("hip plan", "plan", "p1", minute=2, uri="memory:b")
+    third = make_memory("gait note", "observation", "p2", minute=3, uri="memory:c")
+    for resource in (first, second, third):
+        registry.add_resource(resource)
+
+    assert [r.uri for r in registry.query("memory")] == ["memory:c", "memory:b", "memory:a"]
+    assert [r.uri for r in registry.query("memory", newest_first=False, limit=2)] == ["memory:a", "memory:b"]
+    assert [r.uri for r in registry.query("memory", "p1")] == ["memory:b", "memory:a"]
+    assert [r.uri for r in registry.query("memory", category="observation")] == ["memory:c", "memory:a"]
+    assert [r.uri for r in registry.query("memory", "p1", "observation")] == ["memory:a"]
+    assert registry.count("memory", "p1") == 2
+
+    # Replacing a URI moves it between indexes
+    registry.add_resource(make_memory("knee pain, now a plan", "plan", "p2", minute=4, uri="memory:a"))
+    assert registry.query("memory", "p1", "observation") == []
+    assert [r.uri for r in registry.query("memory", "p2")] == ["memory:a", "memory:c"]
+    assert registry.count("memory") == 3
+    assert_consistent(registry)
+
+    removed = registry.remove_resource("memory:c")
+    assert removed is third
+    assert registry.remove_resource("memory:c") is None
+    assert registry.get_resource("memory:c") is None
+    assert [r.uri for r in registry.query("memory", "p2")] == ["memory:a"]
+    assert registry.query("memory", category="observation") == []
+    assert registry.search("gait", "memory") == []
+    assert_consistent(registry)
+
+
+def test_listener_events():
+    registry = ResourceRegistry()
+    events = []
+    registry.add_listener(lambda event, uri: events.append((event, uri)))
+    registry.add_resource(make_memory("a", uri="memory:a"))
+    registry.add_resource(make_memory("b", uri="memory:a"))
+    registry.remove_resource("memory:a")
+    registry.remove_resource("memory:a")
+    assert events == [("added", "memory:a"), ("updated", "memory:a"), ("removed", "memory:a")]
+
+
+def test_cursor_stable_across_inserts_and_deletes():
+    server = new_server()
+    uris = [server.create_memory(f"note {i}", "observation", "p1")["memory_uri"] for i in range(25)]
+
+    page, cursor = server.list_resources("memory", page_size=10)
+    assert [r["uri"] for r in page] == uris[:10]
+
+    # Between pages: delete one listed and two unlisted memories, add new ones
+    server.delete_memory(uris[3])
+    server.delete_memory(uris[12])
+    server.delete_memory(uris[24])
+    added = [server.create_memory(f"late {i}", "observation", "p1")["memory_uri"] for i in range(5)]
+
+    seen = [r["uri"] for r in page]
+    while cursor:
+        page, cursor = server.list_resources("memory", cursor, page_size=10)
+        seen += [r["uri"] for r in page]
+
+    expected_rest = [uri for uri in uris[10:] if uri not in (uris[12], uris[24])]
+    assert seen == uris[:10] + expected_rest
+    assert not set(added) & set(seen)
+    assert len(seen) == len(set(seen))
+
+    # A new listing includes the additions, in insertion order
+    page, _ = server.list_resources("memory", page_size=100)
+    assert [r["uri"] for r in page][-5:] == added
+
+
+def test_cursor_stable_across_replace():
+    server = new_server()
+    uris = [server.create_memory(f"note {i}", "observation", "p1")["memory_uri"] for i in range(4)]
+
+    page, cursor = server.list_resources("memory", page_size=2)
+    seen = [r["uri"] for r in page]
+    # Replace one memory already listed and one not yet listed
+    server.registry.add_resource(make_memory("note 0, edited", uri=uris[0]))
+    server.registry.add_resource(make_memory("note 3, edited", uri=uris[3]))
+    while cursor:
+        page, cursor = server.list_resources("memory", cursor, page_size=2)
+        seen += [r["uri"] for r in page]
+
+    assert seen == uris
+    assert server.read_resource(uris[3])["content"]["content"] == "note 3, edited"
+    assert_consistent(server.registry)
+
+
+def test_invalid_or_foreign_cursor_restarts():
+    server = new_server()
+    uris = [server.create_memory(f"note {i}", "observation")["memory_uri"] for i in range(5)]
+    _, cursor = server.list_resources("memory", page_size=2)
+    page, _ = server.list_resources("memory", "not-a-cursor", page_size=2)
+    assert [r["uri"] for r in page] == uris[:2]
+    page, _ = server.list_resources("voice", cursor, page_size=2)
+    assert page == []
+
+
+def test_bm25_ranking_with_filters():
+    server = new_server()
+    strong = server.create_memory("knee pain knee swelling after knee exercise", "observation", "p1")["memory_uri"]
+    weak = server.create_memory("knee mentioned once among balance gait sleep notes", "observation", "p1")["memory_uri"]
+    plan = server.create_memory("knee strengthening plan", "plan", "p1")["memory_uri"]
+    other = server.create_memory("knee pain knee swelling knee", "observation", "p2")["memory_uri"]
+    server.create_memory("shoulder mobility", "observation", "p1")
+
+    ranked = [m["uri"] for m in server.search_memories("knee", limit=10)]
+    assert set(ranked) == {strong, weak, plan, other}
+    assert ranked.index(strong) < ranked.index(weak)
+
+    results = server.search_memories("knee", patient_id="p1", limit=10)
+    assert [m["uri"] for m in results][0] == strong
+    assert other not in [m["uri"] for m in results]
+    assert all(m["score"] > 0 for m in results)
+    assert [m["uri"] for m in server.search_memories("knee", category="plan")] == [plan]
+    assert [m["uri"] for m in server.search_memories("knee", "p2", "plan")] == []
+    assert server.search_memories("elbow") == []
+
+
+def test_bm25_time_bounds():
+    registry = ResourceRegistry()
+    for minute in range(5):
+        registry.add_resource(make_memory("knee pain", minute=minute, uri=f"memory:{minute}"))
+    since, until = BASE_US + 60_000_000, BASE_US + 3 * 60_000_000
+    found = {r.uri for r, _ in registry.search("knee", "memory", since=since, until=until, limit=10)}
+    assert found == {"memory:1", "memory:2", "memory:3"}
+
+
+def test_tfidf_similarity_with_filters():
+    server = new_server()
+    close = server.create_memory("left knee pain when climbing stairs", "observation", "p1")["memory_uri"]
+    far = server.create_memory("sleep quality improved this week", "observation", "p1")["memory_uri"]
+    other = server.create_memory("left knee pain when climbing stairs daily", "observation", "p2")["memory_uri"]
+
+    results = server.find_similar("knee pain on stairs", limit=10)
+    assert {m["uri"] for m in results} == {close, other}
+    assert results[0]["score"] >= results[-1]["score"] > 0
+
+    results = server.find_similar("knee pain on stairs", patient_id="p1", limit=10)
+    assert [m["uri"] for m in results] == [close]
+    assert far not in [m["uri"] for m in server.find_similar("knee pain", patient_id="p1")]
+
+    # Deleted memories drop out of both indexes
+    server.delete_memory(close)
+    assert server.find_similar("knee pain on stairs", patient_id="p1") == []
+    assert server.search_memories("stairs", patient_id="p1") == []
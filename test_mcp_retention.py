@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Memory retention: TTL expiry, per-patient caps, digests, and the sweep's fast path."""
+
+import json
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.resources import MemoryResource
+from mcp_server.retention import MAX_DIGEST_CHARS, build_digest, digest_uri
+
+DAY_US = 86400 * 1_000_000
+NOW = 1_700_000_000_000_000
+
+
+def new_server(policies):
+    server = MCPServer(memory_db="", retention=json.dumps(policies))
+    server.retention.stop()
+    return server
+
+
+def add(server, text, days_ago, category="observation", patient_id="p1"):
+    memory = MemoryResource({"content": text, "category": category}, patient_id, created=NOW - days_ago * DAY_US)
+    server.registry.add_resource(memory)
+    return memory.uri
+
+
+def texts(server, patient_id="p1", category=None):
+    return [m["content"]["content"] for m in server.get_memories(patient_id, category)]
+
+
+def test_ttl_expiry():
+    server = new_server({"observation": {"ttl_days": 30}})
+    add(server, "old", 45)
+    add(server, "recent", 10)
+    add(server, "old plan", 45, category="plan")  # no policy for plans
+
+    assert server.apply_retention(now=NOW) == {"deleted": 1, "compacted": 0, "digests": 0}
+    assert texts(server, category="observation") == ["recent"]
+    assert texts(server, category="plan") == ["old plan"]
+    assert server.apply_retention(now=NOW + 25 * DAY_US)["deleted"] == 1
+    assert texts(server, category="observation") == []
+
+
+def test_max_per_patient_without_compact():
+    server = new_server({"*": {"max_per_patient": 2}})
+    for day in range(5, 0, -1):
+        add(server, f"note {day}", day)
+    add(server, "other patient", 9, patient_id="p2")
+
+    assert server.apply_retention(now=NOW) == {"deleted": 3, "compacted": 0, "digests": 0}
+    assert texts(server) == ["note 1", "note 2"]
+    assert texts(server, "p2") == ["other patient"]
+    assert server.registry.get_resource(digest_uri("p1", "observation")) is None
+
+
+def test_max_per_patient_with_compact():
+    server = new_server({"observation": {"max_per_patient": 2, "compact": True}})
+    for day in range(5, 0, -1):
+        add(server, f"note {day}", day)
+
+    assert server.apply_retention(now=NOW) == {"deleted": 0, "compacted": 3, "digests": 1}
+    digest = server.registry.get_resource(digest_uri("p1", "observation"))
+    lines = digest.text.splitlines()
+    assert lines[0].startswith("Digest of earlier observation memories")
+    assert [line.split(": ", 1)[1] for line in lines[1:]] == ["note 5", "note 4", "note 3"]
+    # The digest sorts with the newest memory it holds, behind the kept ones
+    assert texts(server) == ["note 1", "note 2", digest.text]
+
+    # Later expiries append to the same digest
+    add(server, "note 0", 0)
+    assert server.apply_retention(now=NOW)["compacted"] == 1
+    digest = server.registry.get_resource(digest_uri("p1", "observation"))
+    assert digest.text.splitlines()[-1].endswith("note 2")
+    assert texts(server)[:2] == ["note 0", "note 1"]
+
+
+def test_sweep_skips_groups_within_policy():
+    server = new_server({"observation": {"ttl_days": 30, "max_per_patient": 2, "compact": True}})
+    for day in range(50, 47, -1):
+        add(server, f"note {day}", day)
+    add(server, "recent 1", 2)
+    add(server, "recent 2", 1)
+    assert server.apply_retention(now=NOW)["compacted"] == 3
+
+    # Two memories within their TTL plus an old digest: nothing to copy or rewrite
+    full_scans = []
+    query = server.registry.query
+    def counting_query(*args, **kwargs):
+        if kwargs.get("limit") is None:
+            full_scans.append(args)
+        return query(*args, **kwargs)
+    server.registry.query = counting_query
+    assert server.apply_retention(now=NOW) == {"deleted": 0, "compacted": 0, "digests": 0}
+    assert full_scans == []
+
+
+def test_digest_truncation_carries_omitted_count():
+    entry = "x" * 95  # each line is "- 2024-01-01: " plus the text
+    memories = [{"date": "2024-01-01T00:00:00", "text": f"{i:04d} {entry}"} for i in range(150)]
+    first = build_digest("observation", None, memories)
+    lines = first.splitlines()
+    assert len(first) <= MAX_DIGEST_CHARS + 200
+    omitted = int(lines[1].split()[2])
+    assert lines[1] == f"- ... {omitted} older entries omitted"
+    assert omitted + len(lines) - 2 == 150
+    assert lines[-1].startswith("- 2024-01-01: 0149")
+
+    more = [{"date": "2024-02-01T00:00:00", "text": f"{i:04d} {entry}"} for i in range(150, 200)]
+    second = build_digest("observation", first, more)
+    lines = second.splitlines()
+    total_omitted = int(lines[1].split()[2])
+    assert total_omitted > omitted
+    assert total_omitted + len(lines) - 2 == 200
+    assert lines[-1].startswith("- 2024-02-01: 0199")
+    assert sum(line.startswith("- ...") for line in lines) == 1
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""ReadWriteLock: shared reads, exclusive writes, and writers ahead of new readers."""
+
+import os
+import sys
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.resources.rwlock import ReadWriteLock
+
+
+def start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=2)
+
+    def reader():
+        with lock.read():
+            inside.wait()  # only passes if all three readers hold the lock at once
+
+    threads = [start(reader) for _ in range(3)]
+    for thread in threads:
+        thread.join(2)
+        assert not thread.is_alive()
+
+
+def test_writer_excludes_readers_and_writers():
+    lock = ReadWriteLock()
+    events = []
+    release = threading.Event()
+
+    def writer():
+        with lock.write():
+            events.append("write start")
+            release.wait(2)
+            events.append("write end")
+
+    def other(kind):
+        with getattr(lock, kind)():
+            events.append(kind)
+
+    first = start(writer)
+    wait_until(lambda: events)
+    blocked = [start(lambda: other("read")), start(lambda: other("write"))]
+    time.sleep(0.05)
+    assert events == ["write start"]
+    release.set()
+    for thread in [first] + blocked:
+        thread.join(2)
+    assert events[:2] == ["write start", "write end"]
+    assert sorted(events[2:]) == ["read", "write"]
+
+
+def test_waiting_writer_goes_before_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    release_reader = threading.Event()
+
+    def first_reader():
+        with lock.read():
+            events.append("reader 1")
+            release_reader.wait(2)
+
+    def writer():
+        with lock.write():
+            events.append("writer")
+
+    def late_reader():
+        with lock.read():
+            events.append("reader 2")
+
+    reader_thread = start(first_reader)
+    wait_until(lambda: "reader 1" in events)
+    writer_thread = start(writer)
+    wait_until(lambda: lock._writers_waiting == 1)
+    # The lock is only read-held, but a writer is waiting: a new reader must queue behind it
+    late_thread = start(late_reader)
+    time.sleep(0.05)
+    assert events == ["reader 1"]
+
+    release_reader.set()
+    for thread in (reader_thread, writer_thread, late_thread):
+        thread.join(2)
+        assert not thread.is_alive()
+    assert events == ["reader 1", "writer", "reader 2"]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Resource subscriptions: coalescing, rate limiting and the list_changed fallback."""
+
+import os
+import queue
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from mcp_server.app import MCPServer
+from mcp_server.subscriptions import SubscriptionHub
+
+
+def subscribe(hub, uris, **kwargs):
+    batches = queue.Queue()
+    subscriber_id = hub.add_subscriber(lambda batch: batches.put((time.monotonic(), batch)), **kwargs)
+    for uri in uris:
+        hub.subscribe(subscriber_id, uri)
+    return subscriber_id, batches
+
+
+def summary(batch):
+    return [message["params"]["uri"] if "params" in message else message["method"].rsplit("/", 1)[1]
+            for message in batch]
+
+
+def test_changes_are_coalesced_and_rate_limited():
+    hub = SubscriptionHub(min_interval=0.2)
+    subscriber_id, batches = subscribe(hub, ["memory:p1:*"])
+
+    hub.resource_changed("added", "memory:p1:a")
+    first_at, batch = batches.get(timeout=2)
+    assert summary(batch) == ["memory:p1:a", "list_changed"]
+
+    # A burst within the interval: one batch, each URI once
+    for _ in range(10):
+        hub.resource_changed("updated", "memory:p1:b")
+    for _ in range(5):
+        hub.resource_changed("updated", "memory:p1:c")
+    hub.resource_changed("added", "memory:p1:d")
+    hub.resource_changed("removed", "memory:p1:d")
+    hub.resource_changed("added", "memory:p2:x")  # outside the prefix: only list_changed
+    second_at, batch = batches.get(timeout=2)
+    assert summary(batch) == ["memory:p1:b", "memory:p1:c", "memory:p1:d", "list_changed"]
+    assert second_at - first_at >= 0.19
+    assert batches.empty()
+    stats = hub.stats()[subscriber_id]
+    assert stats["delivered"] == 6 and stats["coalesced"] == 16 and stats["pending"] == 0
+
+
+def test_large_batch_collapses_to_list_changed():
+    hub = SubscriptionHub(min_interval=0.1, max_updates=3)
+    _, batches = subscribe(hub, ["memory:*"], list_changed=False)
+    hub.resource_changed("updated", "memory:warmup")
+    batches.get(timeout=2)
+
+    for i in range(5):
+        hub.resource_changed("updated", f"memory:{i}")
+    _, batch = batches.get(timeout=2)
+    assert summary(batch) == ["list_changed"]
+
+    # Back under the limit, URIs are reported again
+    for i in range(3):
+        hub.resource_changed("updated", f"memory:{i}")
+    _, batch = batches.get(timeout=2)
+    assert summary(batch) == ["memory:0", "memory:1", "memory:2"]
+
+
+def test_sub_resources_and_unsubscribe():
+    hub = SubscriptionHub(min_interval=0.05)
+    subscriber_id, batches = subscribe(hub, ["patient:p1/vitals", "patient:p1"], list_changed=False)
+    hub.resource_changed("updated", "patient:p2")
+    hub.resource_changed("updated", "patient:p1")
+    _, batch = batches.get(timeout=2)
+    assert sorted(summary(batch)) == ["patient:p1", "patient:p1/vitals"]
+
+    assert hub.unsubscribe(subscriber_id, "patient:p1/vitals")
+    assert not hub.unsubscribe(subscriber_id, "patient:p1/vitals")
+    hub.resource_changed("updated", "patient:p1")
+    _, batch = batches.get(timeout=2)
+    assert summary(batch) == ["patient:p1"]
+
+    hub.remove_subscriber(subscriber_id)
+    hub.resource_changed("updated", "patient:p1")
+    time.sleep(0.15)
+    assert batches.empty()
+
+
+def test_server_notifies_memory_writes():
+    server = MCPServer(memory_db="", retention="")
+    batches = queue.Queue()
+    server.add_subscriber(batches.put, ["memory:p1:*"], min_interval=0.05)
+    uri = server.create_memory("knee pain", "observation", "p1")["memory_uri"]
+    server.create_memory("other patient", "observation", "p2")
+    messages = []
+    while "list_changed" not in summary(messages) or uri not in summary(messages):
+        messages += batches.get(timeout=2)
+    assert summary(messages).count(uri) == 1
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""MoveMend session log: reads, compaction and recovery, on temporary directories."""
+
+import os
+import sys
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "Database Simulation", "Database Simulator"))
+
+from movemend_record_database import db_services
+from movemend_record_database.session_log import SessionLog
+
+
+def make_session(day, game="rowing"):
+    return {"gameId": game, "date": f"2025-01-{day:02d}T00:00:00.000000+00:00Z",
+            "score": 10, "duration_minutes": 5, "quality": 80, "notes": ""}
+
+
+def open_log(tmp_path, **kwargs):
+    records_dir = tmp_path / "records"
+    records_dir.mkdir(exist_ok=True)
+    kwargs.setdefault("compact_interval", 3600)
+    return SessionLog(str(records_dir), str(tmp_path / "log"), **kwargs)
+
+
+def by_date(record):
+    return dict(record, sessions=sorted(record["sessions"], key=lambda s: (s["date"], s["gameId"])))
+
+
+def test_reads_unchanged_by_compaction(tmp_path, monkeypatch):
+    log = open_log(tmp_path)
+    monkeypatch.setattr(db_services, "database_path", log.records_dir)
+    monkeypatch.setattr(db_services, "session_log", log)
+    monkeypatch.setattr(db_services, "_generated", {})
+    with open(os.path.join(log.records_dir, "stored.json"), "w") as f:
+        f.write('{"resourceType": "MovemendRecord", "id": "stored", "primary_provider": "Dr. A", "sessions": []}')
+
+    for patient_id in ("stored", "simulated"):
+        log.append_many(patient_id, [make_session(2), make_session(1, "boxing")])
+    before = {pid: db_services.get_from_patient_id(pid) for pid in ("stored", "simulated")}
+    assert len(before["simulated"]["sessions"]) > 2  # appended on top of the simulated ones
+
+    assert log.compact() == 2
+    for patient_id, record in before.items():
+        assert by_date(db_services.get_from_patient_id(patient_id)) == by_date(record)
+    # Only appended sessions are written for a patient without a record file
+    assert len(log.stored_record("simulated")["sessions"]) == 2
+
+    # Sessions appended after compaction merge the same way
+    log.append("simulated", make_session(3))
+    after = db_services.get_from_patient_id("simulated")
+    assert len(after["sessions"]) == len(before["simulated"]["sessions"]) + 1
+    log.close()
+
+
+def sessions_of(log, patient_id):
+    return [s["date"][:10] for s in log.read_record(patient_id, log.stored_record)["sessions"]]
+
+
+def test_recover_after_crash_with_torn_tail(tmp_path):
+    log = open_log(tmp_path)
+    log.append_many("p1", [make_session(1), make_session(2)])
+    log.append("p2", make_session(3))
+    log.flush()
+    with open(log._log_path, "a") as f:
+        f.write('{"seq": 4, "patient_id": "p1", "sess')  # write cut short by the crash
+
+    # A new process over the same directories, without close()
+    recovered = open_log(tmp_path)
+    assert sessions_of(recovered, "p1") == ["2025-01-02", "2025-01-01"]
+    assert sessions_of(recovered, "p2") == ["2025-01-03"]
+    with open(recovered._log_path) as f:
+        assert all(line.endswith("\n") for line in f)
+    assert recovered.append("p1", make_session(4)) == 4
+    recovered.close()
+
+
+def test_recover_finishes_interrupted_compaction(tmp_path):
+    log = open_log(tmp_path)
+    log.append_many("p1", [make_session(1), make_session(2)])
+    log.flush()
+    with open(log._log_path) as f:
+        logged = f.read()
+    assert log.compact() == 1
+    log.close()
+
+    # Crash after p1's record was rewritten but before the compacting log was removed
+    with open(log._compacting_path, "w") as f:
+        f.write(logged)
+    recovered = open_log(tmp_path)
+    assert not os.path.exists(recovered._compacting_path)
+    assert sessions_of(recovered, "p1") == ["2025-01-02", "2025-01-01"]  # merged once, not twice
+    assert recovered.append("p1", make_session(3)) == 3
+    recovered.close()
+
+
+def test_durable_appends_share_fsyncs(tmp_path):
+    log = open_log(tmp_path, fsync_interval=5.0)
+    failures = []
+
+    def writer(patient_id):
+        for day in range(1, 21):
+            seq = log.append(patient_id, make_session(day), durable=True)
+            if log._durable_seq < seq:
+                failures.append(seq)
+
+    threads = [threading.Thread(target=writer, args=(f"p{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert failures == []
+    assert log.stats["appended"] == 160
+    # Each fsync covers every writer waiting at the time (group commit)
+    assert log.stats["fsyncs"] < 160
+
+    # Without durable=True an append returns before its fsync
+    log.append("p0", make_session(21))
+    assert log._durable_seq == 160
+    log.close()
+
+
+def test_reads_during_compaction_see_each_session_once(tmp_path):
+    log = open_log(tmp_path)
+    log.append_many("p1", [make_session(1), make_session(2)])
+
+    # Compaction completes between capturing the overlay and loading the record
+    def load_after_compaction(patient_id):
+        assert log.compact() == 1
+        return log.stored_record(patient_id)
+
+    record = log.read_record("p1", load_after_compaction)
+    assert [s["date"][:10] for s in record["sessions"]] == ["2025-01-02", "2025-01-01"]
+
+    # Appends made while a compaction is merging are visible and land in the next one
+    merge = log._merge_into_record
+    def merge_with_concurrent_append(patient_id, entries):
+        log.append("p1", make_session(9))
+        assert sessions_of(log, "p1")[0] == "2025-01-09"
+        merge(patient_id, entries)
+    log.append("p1", make_session(3))
+    log._merge_into_record = merge_with_concurrent_append
+    log.compact()
+    log._merge_into_record = merge
+    assert sessions_of(log, "p1") == ["2025-01-09", "2025-01-03", "2025-01-02", "2025-01-01"]
+    assert log.compact() == 1
+    assert [s["date"][:10] for s in log.stored_record("p1")["sessions"]] == sessions_of(log, "p1")
+    log.close()
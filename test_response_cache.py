@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""On-disk response cache: hits, misses, LRU eviction and revalidation through the client."""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "Database Simulation"))
+
+from client_medicaldataretrieval import SimulatorClient
+from response_cache import ResponseCache
+
+
+def store(cache, name, body, **kwargs):
+    key = ResponseCache.key(f"http://sim/{name}", "application/json")
+    cache.store(key, f"http://sim/{name}", body, "application/json", **kwargs)
+    return key
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.lookup(ResponseCache.key("http://sim/a")) is None
+
+    key = store(cache, "a", b'{"id": "a"}', etag='"v1"')
+    entry = cache.lookup(key)
+    assert entry["etag"] == '"v1"' and entry["content_type"] == "application/json"
+    assert cache.read(key, entry) == b'{"id": "a"}'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Same URL with another Accept header is another entry
+    assert cache.lookup(ResponseCache.key("http://sim/a", "application/msgpack")) is None
+
+    # Another process evicted the blob: the entry no longer counts
+    os.remove(cache._blob_path(entry["blob"]))
+    assert cache.lookup(key) is None
+    assert cache.read(key, entry) is None
+    assert cache.misses == 2
+
+
+def test_identical_bodies_share_a_blob(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    first = store(cache, "a", b"x" * 100)
+    second = store(cache, "b", b"x" * 100)
+    assert cache.lookup(first)["blob"] == cache.lookup(second)["blob"]
+    assert cache.stats()["bytes"] == 100
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+    keys = {name: store(cache, name, name.encode() * 100) for name in "ab"}
+    # Entry mtimes are the LRU order: make "a" the most recently used
+    os.utime(cache._entry_path(keys["b"]), (1, 1))
+    cache.read(keys["a"], cache.lookup(keys["a"]))
+
+    keys["c"] = store(cache, "c", b"c" * 100)
+    assert cache.lookup(keys["b"]) is None
+    assert cache.lookup(keys["a"]) is not None and cache.lookup(keys["c"]) is not None
+    assert cache.stats()["bytes"] <= 250
+
+    # Bodies larger than the whole cache are not stored
+    store(cache, "huge", b"h" * 1000)
+    assert cache.lookup(ResponseCache.key("http://sim/huge", "application/json")) is None
+
+
+class PatientHandler(BaseHTTPRequestHandler):
+    version = "v1"
+    full_bodies = 0
+
+    def do_GET(self):
+        etag = f'"{PatientHandler.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        PatientHandler.full_bodies += 1
+        body = json.dumps({"id": self.path.rsplit("/", 1)[-1], "version": PatientHandler.version}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_revalidates_and_serves_stale(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PatientHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = SimulatorClient(url, url, cache=ResponseCache(str(tmp_path)), gateway_url=None, max_retries=0)
+
+    assert client.patient("p1") == {"id": "p1", "version": "v1"}
+    assert client.patient("p1") == {"id": "p1", "version": "v1"}
+    assert PatientHandler.full_bodies == 1  # the second GET was a 304 served from disk
+    assert client.cache.hits == 1
+
+    PatientHandler.version = "v2"
+    assert client.patient("p1")["version"] == "v2"
+    assert PatientHandler.full_bodies == 2
+
+    server.shutdown()
+    server.server_close()
+    assert client.patient("p1")["version"] == "v2"  # stale copy while the simulator is down
+    assert client.stats()["endpoints"][f"{url}/patient"]["stale_served"] == 1
+    client.close()